@@ -0,0 +1,138 @@
+# detection_buffer.py
+"""Columnar in-memory store for per-detection report rows.
+
+A long video produces millions of detection rows.  Keeping each one as a
+dict of ten string keys costs hundreds of bytes per row and makes pandas
+convert every object again at report time.  DetectionBuffer keeps one
+preallocated NumPy array per column instead (doubling when full), stores
+class names as small integer codes plus a class dictionary, and turns into
+a DataFrame/CSV without creating any per-row Python objects.
+
+Used by process_frame_range / process_video_job and by
+metrics_inference.run_yolo9_metrics.
+"""
+import numpy as np
+import pandas as pd
+
+# Column kinds: "int", "float" (None is stored as NaN), "bool", "class" (string dictionary)
+_DTYPES = {"int": np.int64, "float": np.float64, "bool": np.bool_, "class": np.int32}
+
+METRICS_COLUMNS = [
+    ("id", "int"), ("class", "class"), ("frame", "int"), ("time_s", "float"),
+    ("distance_from_start_m", "float"), ("area_m2", "float"), ("bridge_length_m", "float"),
+    ("dist_from_riverbank_m", "float"), ("inside_buffer", "bool"), ("confidence", "float"),
+    ("interpolated", "bool"), ("reused", "bool"), ("tracked", "bool"),
+]
+
+TRACK_COLUMNS = [
+    ("id", "int"), ("class", "class"), ("frame", "int"), ("time_s", "float"),
+    ("x1", "int"), ("y1", "int"), ("x2", "int"), ("y2", "int"), ("class_count", "int"),
+]
+
+
+class DetectionBuffer:
+    """Growable struct-of-arrays table of detection rows."""
+
+    def __init__(self, columns=METRICS_COLUMNS, capacity=1024):
+        self.schema = list(columns)
+        self.classes = []
+        self._class_codes = {}
+        self._size = 0
+        self._data = {name: np.zeros(capacity, dtype=_DTYPES[kind]) for name, kind in self.schema}
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, needed):
+        capacity = len(next(iter(self._data.values())))
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name, arr in self._data.items():
+            grown = np.zeros(capacity, dtype=arr.dtype)
+            grown[:self._size] = arr[:self._size]
+            self._data[name] = grown
+
+    def class_code(self, name):
+        code = self._class_codes.get(name)
+        if code is None:
+            code = self._class_codes[name] = len(self.classes)
+            self.classes.append(name)
+        return code
+
+    def append(self, **values):
+        """Add one row; missing or None float values become NaN."""
+        self._grow(self._size + 1)
+        i = self._size
+        for name, kind in self.schema:
+            value = values.get(name)
+            if kind == "class":
+                self._data[name][i] = self.class_code(value)
+            elif kind == "float":
+                self._data[name][i] = np.nan if value is None else value
+            else:
+                self._data[name][i] = bool(value) if kind == "bool" else (value or 0)
+        self._size += 1
+
+    def column(self, name):
+        """Writable view of a column's filled part (class columns hold codes)."""
+        return self._data[name][:self._size]
+
+    def to_dataframe(self):
+        data = {}
+        for name, kind in self.schema:
+            col = self.column(name)
+            if kind == "class":
+                data[name] = pd.Categorical.from_codes(col, categories=self.classes)
+            else:
+                data[name] = col
+        return pd.DataFrame(data)
+
+    def to_csv(self, path):
+        self.to_dataframe().to_csv(path, index=False)
+        return path
+
+    def iter_rows(self):
+        """Rows as dicts (NaN back to None); for consumers that fold rows one at a time."""
+        cols = [(name, kind, self.column(name)) for name, kind in self.schema]
+        for i in range(self._size):
+            row = {}
+            for name, kind, col in cols:
+                value = col[i].item()
+                if kind == "class":
+                    value = self.classes[value]
+                elif kind == "float" and value != value:
+                    value = None
+                row[name] = value
+            yield row
+
+    def save(self, path):
+        """Write the filled part to an .npz file."""
+        np.savez(path, __classes__=np.array(self.classes, dtype=str),
+                 **{name: self.column(name) for name, _ in self.schema})
+
+    @classmethod
+    def load(cls, path, columns=METRICS_COLUMNS):
+        with np.load(path) as saved:
+            buf = cls(columns, capacity=max(1, len(saved[columns[0][0]])))
+            buf.classes = [str(c) for c in saved["__classes__"]]
+            buf._class_codes = {name: i for i, name in enumerate(buf.classes)}
+            for name, _ in buf.schema:
+                buf._data[name][:len(saved[name])] = saved[name]
+            buf._size = len(saved[columns[0][0]])
+        return buf
+
+    @classmethod
+    def concat(cls, buffers, columns=METRICS_COLUMNS):
+        """One buffer holding the rows of `buffers` in order (class codes are remapped)."""
+        out = cls(columns, capacity=max(1, sum(len(b) for b in buffers)))
+        for buf in buffers:
+            n, start = len(buf), out._size
+            for name, kind in out.schema:
+                col = buf.column(name)
+                if kind == "class":
+                    remap = np.array([out.class_code(c) for c in buf.classes], dtype=np.int32)
+                    col = remap[col] if len(remap) else col
+                out._data[name][start:start + n] = col
+            out._size += n
+        return out
@@ -0,0 +1,50 @@
+# frame_dedup.py
+"""Near-duplicate frame detection for process_video_job.
+
+Hovering drones produce long runs of almost identical frames.  Each frame
+is reduced to a small blurred grayscale thumbnail and compared with the
+thumbnail of the last frame that was actually processed; when the mean
+absolute difference stays under the threshold the frame is reported as a
+duplicate and the caller reuses the previous result and metrics.
+Comparing against the last processed frame (not the previous frame) keeps
+slow drift from being skipped forever.
+"""
+import os
+
+import cv2
+import numpy as np
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0"))  # mean abs diff (0-255); 0 disables skipping
+SIGNATURE_SIZE = 32
+
+
+def frame_signature(frame, size=SIGNATURE_SIZE):
+    """Downsampled grayscale signature of a BGR frame."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(small, (3, 3), 0).astype(np.int16)
+
+
+class DuplicateFrameFilter:
+    """Flags frames that barely differ from the last processed frame."""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = float(threshold or 0)
+        self.skipped = 0
+        self._reference = None
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def is_duplicate(self, frame):
+        if not self.enabled:
+            return False
+        signature = frame_signature(frame)
+        if self._reference is not None:
+            difference = float(np.mean(np.abs(signature - self._reference)))
+            if difference < self.threshold:
+                self.skipped += 1
+                return True
+        self._reference = signature
+        return False
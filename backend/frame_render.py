@@ -0,0 +1,341 @@
+# frame_render.py
+"""Drawing of YOLO9 metrics records onto video frames.
+
+inference.compute_metrics_for_yolo9 measures a frame and returns a plain
+record; the functions here only draw.  Jobs that want numbers alone
+(metrics-only jobs) never call into this module.
+
+Render detail:
+  "full" - filled river/drainage masks, metric boxes, ID labels,
+           riverbank distance lines and the per-frame summary bar
+  "fast" - bounding boxes and one line of metric text per object
+
+Filled masks go through MaskCompositor: all masks of a frame are painted
+into one label map at mask resolution, upsampled once, coloured through a
+class -> colour lookup table and added to the frame in a single blend,
+instead of one full-frame colour image and addWeighted per mask.
+
+Labels and metric boxes repeat from frame to frame (same class, track ID,
+confidence, metric value), so each distinct one is rasterised once with its
+background box into a small BGRA sprite and then only copied onto frames;
+the sprites live in an LRU of LABEL_SPRITE_CACHE_SIZE entries.
+"""
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+BUFFER_COLOR = (0, 255, 255)
+FILLED_CLASSES = ['river', 'Natural-drinage', 'Manmade-drinage']
+MASK_ALPHA = float(os.getenv("MASK_ALPHA", "0.4"))  # weight of the class colour added under filled masks
+LABEL_SPRITE_CACHE_SIZE = int(os.getenv("LABEL_SPRITE_CACHE_SIZE", "512"))  # rasterised labels kept per process
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class MaskCompositor:
+    """Single-pass mask fill for one class -> BGR colour palette.
+
+    Label 0 is background; the class at position k of `colors` is label
+    k + 1.  Where masks overlap the later one wins, as with drawContours."""
+
+    def __init__(self, colors, alpha=MASK_ALPHA):
+        if len(colors) > 255:
+            raise ValueError("MaskCompositor supports at most 255 classes")
+        self.colors = colors
+        self._labels = {key: k + 1 for k, key in enumerate(colors)}
+        lut = np.zeros((len(colors) + 1, 3), dtype=np.float64)
+        lut[1:] = list(colors.values())
+        # Pre-multiplied by alpha: blending is then a saturating add, like addWeighted(frame, 1.0, fill, alpha)
+        self._lut = np.round(lut * alpha).astype(np.uint8)
+
+    def label_map(self, masks, keys):
+        """uint8 label map at mask resolution from N masks (N x h x w) and their class keys.
+           Masks of classes outside the palette are ignored."""
+        labels = np.array([self._labels.get(k, 0) for k in keys], dtype=np.uint8)
+        masks = np.asarray(masks)
+        if not len(masks):
+            return None
+        hit = masks > 0.5
+        # Index of the last mask covering each pixel
+        last = len(hit) - 1 - np.argmax(hit[::-1], axis=0)
+        return np.where(hit.any(axis=0), labels[last], 0).astype(np.uint8)
+
+    def composite(self, frame, masks, keys):
+        """`frame` with every mask filled in its class colour (new array; frame is left as is)."""
+        label_map = self.label_map(masks, keys)
+        if label_map is None or not label_map.any():
+            return frame.copy()
+        H, W = frame.shape[:2]
+        if label_map.shape != (H, W):
+            label_map = cv2.resize(label_map, (W, H), interpolation=cv2.INTER_NEAREST)
+        return cv2.add(frame, self._lut[label_map])
+
+
+_compositors = {}
+
+
+def get_compositor(colors):
+    """MaskCompositor for a palette dict, built once per palette."""
+    compositor = _compositors.get(id(colors))
+    if compositor is None or compositor.colors is not colors:
+        compositor = _compositors[id(colors)] = MaskCompositor(colors)
+    return compositor
+
+
+# Label layouts.  Each returns draw(img, cX, cY, paint), which draws the label
+# anchored at (cX, cY) with colours passed through paint(), and how far the
+# drawing reaches (left, top, right, bottom) from the anchor.
+
+def _metric_box_layout(text, color, scale, thickness):
+    """White metric text centred on the anchor, on a black box with a class-coloured border."""
+    (metric_w, metric_h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+
+    def draw(img, cX, cY, paint):
+        cv2.rectangle(img,
+                      (cX - metric_w//2 - 5, cY - metric_h//2 - 5),
+                      (cX + metric_w//2 + 5, cY + metric_h//2 + 5),
+                      paint((0, 0, 0)), -1)
+        cv2.rectangle(img,
+                      (cX - metric_w//2 - 5, cY - metric_h//2 - 5),
+                      (cX + metric_w//2 + 5, cY + metric_h//2 + 5),
+                      paint(color), 2)
+        cv2.putText(img, text,
+                    (cX - metric_w//2, cY + metric_h//2),
+                    FONT, scale, paint((255, 255, 255)), thickness)
+    reach_x, reach_y = metric_w//2 + 5 + thickness, metric_h//2 + 5 + thickness
+    return draw, (reach_x, reach_y, reach_x, reach_y + baseline)
+
+
+def _id_label_layout(text, color, scale, thickness):
+    """Black text on a class-coloured box whose bottom-left corner is the anchor."""
+    (text_w, text_h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+
+    def draw(img, x1, y1, paint):
+        cv2.rectangle(img, (x1, y1-text_h-10), (x1+text_w, y1), paint(color), -1)
+        cv2.putText(img, text, (x1, y1-5), FONT, scale, paint((0, 0, 0)), thickness)
+    return draw, (thickness, text_h + 10 + thickness, text_w + thickness, baseline + thickness)
+
+
+def _text_layout(text, color, scale, thickness):
+    """Plain coloured text with its baseline origin at the anchor."""
+    (text_w, text_h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+
+    def draw(img, x, y, paint):
+        cv2.putText(img, text, (x, y), FONT, scale, paint(color), thickness)
+    return draw, (thickness, text_h + thickness, text_w + thickness, baseline + thickness)
+
+
+_LAYOUTS = {"metric_box": _metric_box_layout, "id_label": _id_label_layout, "text": _text_layout}
+
+
+class LabelSprite:
+    """One rasterised label: a BGRA image and the anchor's position inside it.
+
+    The colour is drawn over black, so where OpenCV antialiases (LINE_AA, or
+    putText in OpenCV 5) it is already multiplied by the coverage held in
+    alpha: blit composites it as premultiplied colour, which reproduces
+    drawing the label straight onto the frame."""
+
+    def __init__(self, kind, text, color, scale, thickness):
+        draw, (left, top, right, bottom) = _LAYOUTS[kind](text, color, scale, thickness)
+        h, w = top + bottom + 1, left + right + 1
+        bgr = np.zeros((h, w, 3), dtype=np.uint8)
+        alpha = np.zeros((h, w), dtype=np.uint8)
+        draw(bgr, left, top, lambda c: c)
+        draw(alpha, left, top, lambda c: 255)
+        self.bgra = np.dstack([bgr, alpha])
+        self.anchor = (left, top)
+        self._opaque = alpha > 0
+        self._binary = bool(np.isin(alpha, (0, 255)).all())
+
+    def blit(self, img, anchor):
+        """Copy the label onto `img` (in place) with its anchor at `anchor`, clipped to the image."""
+        x, y = anchor[0] - self.anchor[0], anchor[1] - self.anchor[1]
+        h, w = self.bgra.shape[:2]
+        H, W = img.shape[:2]
+        x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, W), min(y + h, H)
+        if x0 >= x1 or y0 >= y1:
+            return
+        roi = img[y0:y1, x0:x1]
+        sprite = self.bgra[y0 - y:y1 - y, x0 - x:x1 - x]
+        if self._binary:
+            np.copyto(roi, sprite[..., :3], where=self._opaque[y0 - y:y1 - y, x0 - x:x1 - x, None])
+        else:
+            a = sprite[..., 3:].astype(np.float32) / 255.0
+            roi[:] = np.clip(roi * (1.0 - a) + sprite[..., :3] + 0.5, 0, 255).astype(np.uint8)
+
+
+class LabelSpriteCache:
+    """LRU of LabelSprites keyed by everything that affects their pixels."""
+
+    def __init__(self, max_items=LABEL_SPRITE_CACHE_SIZE):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()
+
+    def get(self, kind, text, color, scale, thickness):
+        key = (kind, text, tuple(int(c) for c in color), scale, thickness)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = self._sprites[key] = LabelSprite(kind, text, color, scale, thickness)
+        if len(self._sprites) > self.max_items:
+            self._sprites.popitem(last=False)
+        return sprite
+
+
+_label_sprites = LabelSpriteCache()
+
+
+def label_sprite_stats(since=None):
+    """Hits/misses of this process's label sprite cache, minus an earlier snapshot `since`."""
+    stats = {"label_sprite_hits": _label_sprites.hits, "label_sprite_misses": _label_sprites.misses}
+    if since:
+        stats = {k: v - since.get(k, 0) for k, v in stats.items()}
+    return stats
+
+
+def _draw_label(img, kind, text, anchor, color, scale, thickness):
+    _label_sprites.get(kind, text, color, scale, thickness).blit(img, anchor)
+
+
+def _draw_id_label(img, det_id, cls_name, confidence, anchor, color, scale=0.6, thickness=2):
+    """'ID:<id> | <class> | <conf>' on top of a box.  The confidence changes every frame while
+       the rest only changes per track, so they are two sprites drawn side by side."""
+    prefix = f"ID:{det_id} | {cls_name} | "
+    _draw_label(img, "id_label", prefix, anchor, color, scale, thickness)
+    (prefix_w, _), _ = cv2.getTextSize(prefix, FONT, scale, thickness)
+    _draw_label(img, "id_label", f"{confidence:.2f}", (anchor[0] + prefix_w, anchor[1]), color, scale, thickness)
+
+
+def _draw_metric_box(img, text, center, color):
+    """White metric text centred on `center`, on a black box with a class-coloured border."""
+    _draw_label(img, "metric_box", text, center, color, 1.0, 3)
+
+
+def render_yolo9_frame(frame, record, colors, detail="full"):
+    """Draw a compute_metrics_for_yolo9 record onto `frame`; returns the annotated frame."""
+    render = record.get('render')
+    if render is None:
+        return frame
+    if detail == "fast":
+        return _render_fast(frame, record, colors)
+
+    H, W = frame.shape[:2]
+    overlay = frame.copy()
+    fill_masks, fill_classes = [], []
+
+    for coords in render['buffer_outlines']:
+        cv2.polylines(overlay, [coords], isClosed=True, color=BUFFER_COLOR, thickness=2)
+
+    for det in record['detections']:
+        cls_name = det['class']
+        x1, y1, x2, y2 = det['bbox']
+        extra = det['render']
+        color = colors.get(cls_name, (255, 255, 255))
+        bridge_length_m = det['bridge_length_m']
+        area_m2 = det['area_m2']
+        dist_from_riverbank_m = det['dist_from_riverbank_m']
+
+        # Distance line if close enough
+        if extra['bank_line'] is not None and dist_from_riverbank_m < 30:
+            (px1, py1), (px2, py2) = extra['bank_line']
+            cv2.line(overlay, (px1, py1), (px2, py2), BUFFER_COLOR, 2)
+            mid = ((px1 + px2) // 2, (py1 + py2) // 2)
+            _draw_label(overlay, "text", f"{dist_from_riverbank_m}m", mid, BUFFER_COLOR, 0.5, 2)
+
+        # Filled mask for river, Natural-drinage, Manmade-drinage only
+        if cls_name in FILLED_CLASSES:
+            if extra['geometry'] is not None:
+                fill_masks.append(extra['geometry'].mask)
+                fill_classes.append(cls_name)
+
+            metric_text = ""
+            if cls_name == 'bridge' and bridge_length_m:
+                metric_text = f"{bridge_length_m}m"
+            elif area_m2 > 0 and cls_name in ['Natural-drinage', 'Manmade-drinage']:
+                metric_text = f"{area_m2}m²"
+
+            if metric_text:
+                # Place text at the centroid of the mask
+                if extra['centroid'] is not None:
+                    center = extra['centroid']
+                else:
+                    center = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
+                _draw_metric_box(overlay, metric_text, center, color)
+            # No bounding box for these classes
+            continue
+
+        # For all other classes, bounding box only
+        cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
+
+        metric_text = ""
+        if bridge_length_m:
+            metric_text = f"{bridge_length_m}m"
+        elif area_m2 > 0 and cls_name in ['silts', 'vegitation inside the river']:
+            metric_text = f"{area_m2}m²"
+        elif dist_from_riverbank_m and cls_name == 'Building':
+            metric_text = f"d:{dist_from_riverbank_m}m"
+        elif cls_name == 'potholes' and area_m2 > 0:
+            metric_text = f"{area_m2}m²"
+        if metric_text:
+            _draw_metric_box(overlay, metric_text, ((x1 + x2) // 2, (y1 + y2) // 2), color)
+
+        # Label on top of the bounding box
+        _draw_id_label(overlay, det['id'], cls_name, det['confidence'], (x1, y1), color)
+
+    final_frame = get_compositor(colors).composite(overlay, fill_masks, fill_classes)
+
+    summary_counts = {}
+    for det in record['detections']:
+        summary_counts[det['class']] = summary_counts.get(det['class'], 0) + 1
+
+    frame_info = f"Frame: {record['frame']} | Time: {record['time_s']}s | Distance: {record['distance_from_start_m']}m"
+    cv2.rectangle(final_frame, (0, 0), (W, 30), (0, 0, 0), -1)
+    cv2.putText(final_frame, frame_info, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    if summary_counts:
+        summary_text = " | ".join([f"{k}: {v}" for k, v in summary_counts.items()])
+        cv2.rectangle(final_frame, (0, H-60), (W, H), (0, 0, 128), -1)
+        cv2.putText(final_frame, summary_text, (10, H-35), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    return final_frame
+
+
+def _render_fast(frame, record, colors):
+    """Boxes and one line of metric text per object; no masks or labels."""
+    W = frame.shape[1]
+    overlay = frame.copy()
+
+    for coords in record['render']['buffer_outlines']:
+        cv2.polylines(overlay, [coords], isClosed=True, color=BUFFER_COLOR, thickness=2)
+
+    for det in record['detections']:
+        cls_name = det['class']
+        x1, y1, x2, y2 = det['bbox']
+        bank_line = det['render']['bank_line']
+        if bank_line is not None and det['dist_from_riverbank_m'] < 30:
+            cv2.line(overlay, bank_line[0], bank_line[1], BUFFER_COLOR, 2)
+
+        color = colors.get(cls_name, (255, 255, 255))
+        cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
+
+        metric_text = ""
+        if det['bridge_length_m']:
+            metric_text = f"{det['bridge_length_m']}m"
+        elif det['area_m2'] > 0 and cls_name in ["Natural-drinage", "Manmade-drinage", "silts"]:
+            metric_text = f"{det['area_m2']}m²"
+        elif det['dist_from_riverbank_m'] and cls_name == "Building":
+            metric_text = f"d:{det['dist_from_riverbank_m']}m"
+        if metric_text:
+            _draw_label(overlay, "text", metric_text, (x1, y1 - 10), color, 0.6, 2)
+
+    frame_info = f"Frame {record['frame']} | Time {record['time_s']}s | Dist {record['distance_from_start_m']}m"
+    cv2.rectangle(overlay, (0, 0), (W, 30), (0, 0, 0), -1)
+    cv2.putText(overlay, frame_info, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return overlay
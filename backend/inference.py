@@ -9,8 +9,9 @@ from metrics_inference import run_yolo9_metrics
 os.environ['FORCE_TORCHVISION_CPU'] = '1'
 os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from auth_utils import get_current_user 
 import threading
 import uuid
@@ -18,16 +19,41 @@ import shutil
 import sqlite3
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import pysrt
-import subprocess
 from typing import Optional
 import pandas as pd
 from shapely.geometry import Polygon, Point
-from shapely.ops import nearest_points, unary_union
+from shapely.ops import unary_union
 from metrics_inference import run_yolo9_metrics
+from video_pipeline import run_pipeline, PipelineCancelled
+from video_encoding import (open_video_writer, open_proxy_writer, open_hls_writer, finalize_hls_playlist,
+                            proxy_size, probe_keyframe_times, concat_videos)
+import job_queue
+import result_cache
+# Modules whose env settings are part of the result cache key (see _result_cache_settings)
+import frame_render
+import metrics_geometry
+import model_registry
+import overlay_track
+import video_encoding
+import video_previews
+import keyframe_stride
+from model_registry import get_model, select_device, DEFAULT_MODEL_PATH
+from job_checkpoint import JobCheckpoint, CHECKPOINT_INTERVAL_FRAMES
+from keyframe_stride import KeyframeScheduler, KeyframePropagator, INFERENCE_STRIDE
+from frame_dedup import DuplicateFrameFilter, DEDUP_THRESHOLD
+from metrics_geometry import (frame_geometries, frame_spatial_relations, BufferZoneCache,
+                              RiverDistanceField, RIVER_DISTANCE_ENGINE)
+from frame_render import render_yolo9_frame, get_compositor, label_sprite_stats, FILLED_CLASSES
+from processing_profiles import get_profile
+from track_aggregator import TrackAggregator, merge_segments, reset_tracker, VIDEO_TRACKER
+from detection_buffer import DetectionBuffer
+from video_previews import PreviewSampler, build_sprite_sheet, sprite_interval_frames
+from overlay_track import (OverlayPartWriter, build_overlay, hex_color, result_frame_entry,
+                           yolo9_frame_entry)
 
 import json
+import hashlib
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -84,16 +110,25 @@ async def get_location_name(lat, lon):
 # --- Configuration ---
 UPLOAD_DIR = "static/uploads"
 PROCESSED_DIR = "static/processed"
+HLS_DIR = "static/hls"
 REPORTS_DIR = "static/reports"
 DB_PATH = "users.db"
 
+# Per-video outputs named <name><suffix>, next to <name>.mp4 (removed with it)
+VIDEO_ARTIFACTS = [
+    (PROCESSED_DIR, "_overlay.json.gz"), (PROCESSED_DIR, "_proxy.mp4"), (PROCESSED_DIR, "_poster.jpg"),
+    (PROCESSED_DIR, "_sprite.jpg"), (PROCESSED_DIR, "_sprite.vtt"), (PROCESSED_DIR, "_tiles"),
+    (REPORTS_DIR, "_metrics.csv"), (REPORTS_DIR, "_objects.csv"), (REPORTS_DIR, "_metrics.json"),
+    (REPORTS_DIR, "_metrics.pdf"),
+    (HLS_DIR, ""),  # live/VOD HLS stream directory, a 720p copy of the video
+]
+
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
+os.makedirs(HLS_DIR, exist_ok=True)
 os.makedirs(REPORTS_DIR, exist_ok=True)
-
-# Force model to use CPU to avoid CUDA compatibility issues
-model = YOLO("models/best.pt")
-model.to('cpu')  # Explicitly set to CPU mode
+job_queue.init_db()
+result_cache.init_db()
 
 MASK_CLASSES = {
     3: (0, 0, 255), 4: (0, 255, 0), 8: (255, 0, 0),
@@ -119,6 +154,10 @@ YOLO9_CLASSES = {
 DEFAULT_GSD = 0.05  # 5cm per pixel (can be made configurable)
 DRONE_SPEED_M_S = 2  # Default drone speed in m/s
 BUFFER_DISTANCE_M = 30  # Buffer distance around river in meters
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "8"))  # Frames per model call
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))  # Batches buffered between pipeline stages
+VIDEO_SEGMENTS = int(os.getenv("VIDEO_SEGMENTS", "1"))  # Parallel segments per video (1 = no splitting)
+SEGMENT_MIN_FRAMES = int(os.getenv("SEGMENT_MIN_FRAMES", "900"))  # Shortest segment worth its own process
 
 def sanitize_filename(filename: str) -> str:
     """Sanitizes a filename to be URL-safe."""
@@ -139,353 +178,159 @@ def mask_to_polygon(mask):
     except:
         return None
 
-def calculate_metrics_for_yolo9(result, frame, frame_idx, fps, gsd=DEFAULT_GSD):
-    """Calculate detailed metrics for Yolo9.pt model."""
+def compute_metrics_for_yolo9(result, frame_size, frame_idx, fps, gsd=DEFAULT_GSD, scale_factor=1.0,
+                              geometry=None, distance_engine=None, buffer_cache=None, render=True):
+    """Measure one frame for the Yolo9.pt model, without drawing anything.
+
+    Returns the per-frame record: frame/time/distance plus one dict per
+    detection (area, bridge length, riverbank distance, buffer membership).
+    With `render` the record also carries what frame_render needs to draw
+    it (fill mask geometry, label points, distance lines, buffer outline) under
+    'render' keys. `frame_size` is (W, H) of the original frame; boxes
+    from a frame downscaled by `scale_factor` are mapped back to it.
+
+    `geometry` picks the mask geometry engine ("mask" or "full") and
+    `distance_engine` the riverbank distance engine ("shapely" or "raster"),
+    see metrics_geometry. A job-wide `buffer_cache` (BufferZoneCache) reuses
+    the river buffer zone across frames."""
     metrics = {
         'frame': frame_idx,
         'time_s': round(frame_idx / fps, 3),
         'distance_from_start_m': round((frame_idx / fps) * DRONE_SPEED_M_S, 2),
         'detections': []
     }
-    
+
     if result.masks is None or result.boxes is None:
-        return metrics, frame
-    
-    # Get detection data
-    if hasattr(result.boxes, 'id') and result.boxes.id is not None:
+        return metrics
+
+    # Get detection data (track IDs when the frame went through the tracker)
+    metrics['tracked'] = hasattr(result.boxes, 'id') and result.boxes.id is not None
+    if metrics['tracked']:
         ids = result.boxes.id.cpu().numpy().astype(int)
     else:
         ids = list(range(len(result.boxes.cls)))
-    
+
     cls_ids = result.boxes.cls.cpu().numpy().astype(int)
-    boxes = result.boxes.xyxy.cpu().numpy()
+    boxes = result.boxes.xyxy.cpu().numpy() / scale_factor
     masks = result.masks.data.cpu().numpy()
     confidences = result.boxes.conf.cpu().numpy()
-    
-    H, W = frame.shape[:2]
-    
-    # Create overlays for visualization
-    overlay = frame.copy()
-    mask_overlay = np.zeros_like(frame)
-    
+    names = [result.names.get(c, f"class_{c}") for c in cls_ids]
+
+    W, H = frame_size
+
+    # Mask outlines/areas once per detection, in frame coordinates
+    geometries = frame_geometries(masks, (W, H), geometry)
+
     # Find river polygons first for distance calculations
     river_polygons = []
-    for i, cls_id in enumerate(cls_ids):
-        cls_name = result.names.get(cls_id, f"class_{cls_id}")
+    river_geometries = []
+    for i, cls_name in enumerate(names):
         if cls_name == 'river':
-            mask = masks[i].astype(np.uint8)
-            full_mask = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
-            poly = mask_to_polygon(full_mask)
+            poly = geometries[i].polygon
             if poly:
                 river_polygons.append(poly)
-    
+                river_geometries.append(geometries[i])
+
+    # Raster engine: one distance transform per frame instead of per-object polygon distances
+    river_field = None
+    if river_geometries and (distance_engine or RIVER_DISTANCE_ENGINE) == 'raster':
+        river_field = RiverDistanceField(river_geometries)
+
     # Create buffer zone around rivers
     buffer_zone = None
     if river_polygons:
         buffer_dist_px = BUFFER_DISTANCE_M / gsd
-        buffer_zone = unary_union([r.buffer(buffer_dist_px) for r in river_polygons])
-        
-        # Draw buffer zone
-        if hasattr(buffer_zone, 'geoms'):
-            polys = buffer_zone.geoms
+        if buffer_cache is not None:
+            buffer_zone = buffer_cache.buffer_zone(river_geometries, river_polygons, buffer_dist_px)
         else:
-            polys = [buffer_zone]
-            
-        for poly in polys:
-            if hasattr(poly, 'exterior'):
-                coords = np.array(poly.exterior.coords).round().astype(np.int32)
-                cv2.polylines(overlay, [coords], isClosed=True, color=(0, 255, 255), thickness=2)
-    
+            buffer_zone = unary_union([r.buffer(buffer_dist_px) for r in river_polygons])
+
+    # Buffer-zone membership and nearest riverbank points for all detections at once
+    int_boxes = boxes.astype(int)
+    centers = [Point((b[0] + b[2]) // 2, (b[1] + b[3]) // 2) for b in int_boxes]
+    want_distance = [
+        river_field is None and cls_name not in ['river', 'vegitation inside the river']
+        for cls_name in names
+    ]
+    inside_flags, nearest = frame_spatial_relations(
+        [g.polygon for g in geometries], centers, river_polygons, buffer_zone, want_distance)
+
     # Process each detection
     for i, obj_id in enumerate(ids):
-        cls_name = result.names.get(cls_ids[i], f"class_{cls_ids[i]}")
-        x1, y1, x2, y2 = boxes[i].astype(int)
+        cls_name = names[i]
+        x1, y1, x2, y2 = int_boxes[i]
         w, h = x2 - x1, y2 - y1
-        confidence = confidences[i]
 
         # Calculate mask area
-        mask = masks[i].astype(np.uint8)
-        full_mask = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
-        mask_area_px = np.count_nonzero(full_mask)
-        area_m2 = round(mask_area_px * (gsd ** 2), 2)
-
-        # Calculate center point and polygon
-        obj_center = Point((x1 + x2) // 2, (y1 + y2) // 2)
-        obj_poly = mask_to_polygon(full_mask)
-
-        # Check if object is in buffer zone
-        inside_buffer = True
-        if buffer_zone:
-            inside_buffer = (
-                (obj_poly and buffer_zone.intersects(obj_poly)) or
-                (not obj_poly and buffer_zone.contains(obj_center))
-            )
+        geom = geometries[i]
+        area_m2 = round(geom.area_px * (gsd ** 2), 2)
+        obj_poly = geom.polygon
 
         # Calculate distance from riverbank
         dist_from_riverbank_m = None
+        bank_line = None
         if river_polygons and cls_name not in ['river', 'vegitation inside the river']:
-            if obj_poly:
-                min_poly = min(river_polygons, key=lambda r: obj_poly.distance(r))
-                p1, p2 = nearest_points(obj_poly, min_poly)
+            if river_field is not None:
+                obj_center = centers[i]
+                _, p1, p2 = river_field.nearest(geom if obj_poly else None, point=(obj_center.x, obj_center.y))
+                p1, p2 = Point(p1), Point(p2)
             else:
-                min_poly = min(river_polygons, key=lambda r: r.distance(obj_center))
-                p1, p2 = nearest_points(obj_center, min_poly)
-
-            dist_px = p1.distance(p2)
-            dist_from_riverbank_m = round(dist_px * gsd, 2)
-
-            # Draw distance line if close enough
-            if dist_from_riverbank_m < 30:
-                cv2.line(overlay, (int(p1.x), int(p1.y)), (int(p2.x), int(p2.y)), (0, 255, 255), 2)
-                mid = ((int(p1.x + p2.x) // 2), (int(p1.y + p2.y) // 2))
-                cv2.putText(overlay, f"{dist_from_riverbank_m}m", mid, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+                p1, p2 = nearest[i]
+            dist_from_riverbank_m = round(p1.distance(p2) * gsd, 2)
+            bank_line = ((int(p1.x), int(p1.y)), (int(p2.x), int(p2.y)))
 
         # Calculate specific metrics based on class
         bridge_length_m = None
         if cls_name == 'bridge':
             bridge_length_m = round(max(w, h) * gsd, 2)
 
-        # Store detection data
         detection = {
-            'id': obj_id,
+            'id': int(obj_id),
             'class': cls_name,
-            'confidence': round(confidence, 3),
-            'bbox': [x1, y1, x2, y2],
+            'confidence': round(float(confidences[i]), 3),
+            'bbox': [int(x1), int(y1), int(x2), int(y2)],
             'area_m2': area_m2,
             'bridge_length_m': bridge_length_m,
             'dist_from_riverbank_m': dist_from_riverbank_m,
-            'inside_buffer': inside_buffer
+            'inside_buffer': bool(inside_flags[i])
         }
+        if render:
+            filled = cls_name in FILLED_CLASSES
+            centroid = geom.centroid if filled else None
+            detection['render'] = {
+                'geometry': geom if filled else None,
+                'centroid': (int(centroid[0]), int(centroid[1])) if centroid is not None else None,
+                'bank_line': bank_line,
+            }
         metrics['detections'].append(detection)
 
-        color = YOLO9_CLASSES.get(cls_name, (255, 255, 255))
-
+    if render:
+        outlines = []
+        if buffer_zone is not None:
+            polys = buffer_zone.geoms if hasattr(buffer_zone, 'geoms') else [buffer_zone]
+            for poly in polys:
+                if hasattr(poly, 'exterior'):
+                    outlines.append(np.array(poly.exterior.coords).round().astype(np.int32))
+        metrics['render'] = {'buffer_outlines': outlines}
 
-        # Draw filled mask for river, Natural-drinage, Manmade-drinage only
-        if cls_name in ['river', 'Natural-drinage', 'Manmade-drinage']:
-            contours, _ = cv2.findContours(full_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            cv2.drawContours(mask_overlay, contours, -1, color, thickness=cv2.FILLED)
+    return metrics
 
-            # Draw metric text (area for drainages, length for bridge if ever masked)
-            metric_text = ""
-            if cls_name == 'bridge' and bridge_length_m:
-                metric_text = f"{bridge_length_m}m"
-            elif area_m2 > 0 and cls_name in ['Natural-drinage', 'Manmade-drinage']:
-                metric_text = f"{area_m2}m²"
-
-            if metric_text:
-                # Place text at the centroid of the mask
-                M = cv2.moments(full_mask)
-                if M["m00"] != 0:
-                    cX = int(M["m10"] / M["m00"])
-                    cY = int(M["m01"] / M["m00"])
-                else:
-                    cX, cY = x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2
-                (metric_w, metric_h), _ = cv2.getTextSize(metric_text, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 3)
-                cv2.rectangle(overlay,
-                              (cX - metric_w//2 - 5, cY - metric_h//2 - 5),
-                              (cX + metric_w//2 + 5, cY + metric_h//2 + 5),
-                              (0, 0, 0), -1)
-                cv2.rectangle(overlay,
-                              (cX - metric_w//2 - 5, cY - metric_h//2 - 5),
-                              (cX + metric_w//2 + 5, cY + metric_h//2 + 5),
-                              color, 2)
-                cv2.putText(overlay, metric_text,
-                            (cX - metric_w//2, cY + metric_h//2),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 3)
-            # Do NOT draw bounding box for these classes
-            continue
-
-        # For all other classes, draw bounding box only
-        cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
-
-        # Calculate center point for metric display
-        center_x = (x1 + x2) // 2
-        center_y = (y1 + y2) // 2
-
-        # Display metrics inside bounding box
-        metric_text = ""
-        if bridge_length_m:
-            metric_text = f"{bridge_length_m}m"
-        elif area_m2 > 0 and cls_name in ['silts', 'vegitation inside the river']:
-            metric_text = f"{area_m2}m²"
-        elif dist_from_riverbank_m and cls_name == 'Building':
-            metric_text = f"d:{dist_from_riverbank_m}m"
-        elif cls_name == 'potholes' and area_m2 > 0:
-            metric_text = f"{area_m2}m²"
-
-        # Draw metric text in center of bounding box with background
-        if metric_text:
-            (metric_w, metric_h), _ = cv2.getTextSize(metric_text, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 3)
-            # Create background rectangle for better visibility
-            cv2.rectangle(overlay, 
-                         (center_x - metric_w//2 - 5, center_y - metric_h//2 - 5), 
-                         (center_x + metric_w//2 + 5, center_y + metric_h//2 + 5), 
-                         (0, 0, 0), -1)
-            cv2.rectangle(overlay, 
-                         (center_x - metric_w//2 - 5, center_y - metric_h//2 - 5), 
-                         (center_x + metric_w//2 + 5, center_y + metric_h//2 + 5), 
-                         color, 2)
-            # Draw the metric text in white
-            cv2.putText(overlay, metric_text, 
-                       (center_x - metric_w//2, center_y + metric_h//2), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 3)
-
-        # Create label for top of bounding box (simplified)
-        label_parts = [f"ID:{obj_id}", cls_name, f"{confidence:.2f}"]
-        label = " | ".join(label_parts)
-
-        # Draw label with background
-        (text_w, text_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-        cv2.rectangle(overlay, (x1, y1-text_h-10), (x1+text_w, y1), color, -1)
-        cv2.putText(overlay, label, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-    
-    # Combine overlays
-    final_frame = cv2.addWeighted(mask_overlay, 0.4, overlay, 1.0, 0)
-    
-    # Add frame info and summary
-    summary_counts = {}
-    for det in metrics['detections']:
-        cls = det['class']
-        summary_counts[cls] = summary_counts.get(cls, 0) + 1
-    
-    # Draw frame info
-    frame_info = f"Frame: {frame_idx} | Time: {metrics['time_s']}s | Distance: {metrics['distance_from_start_m']}m"
-    cv2.rectangle(final_frame, (0, 0), (W, 30), (0, 0, 0), -1)
-    cv2.putText(final_frame, frame_info, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-    
-    # Draw summary counts
-    if summary_counts:
-        summary_text = " | ".join([f"{k}: {v}" for k, v in summary_counts.items()])
-        cv2.rectangle(final_frame, (0, H-60), (W, H), (0, 0, 128), -1)
-        cv2.putText(final_frame, summary_text, (10, H-35), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    
-    return metrics, final_frame
+def calculate_metrics_for_yolo9(result, frame, frame_idx, fps, gsd=DEFAULT_GSD, geometry=None, distance_engine=None,
+                                buffer_cache=None):
+    """Calculate detailed metrics for Yolo9.pt model and draw them (full render detail)."""
+    H, W = frame.shape[:2]
+    metrics = compute_metrics_for_yolo9(result, (W, H), frame_idx, fps, gsd, geometry=geometry,
+                                        distance_engine=distance_engine, buffer_cache=buffer_cache)
+    return metrics, render_yolo9_frame(frame, metrics, YOLO9_CLASSES, detail="full")
 
-def calculate_metrics_for_yolo9_fast(result, frame, frame_idx, fps, scale_factor=1.0):
+def calculate_metrics_for_yolo9_fast(result, frame, frame_idx, fps, scale_factor=1.0, geometry=None,
+                                     distance_engine=None, buffer_cache=None):
     """Calculate metrics and annotate frame for YOLO9 model."""
     H, W = frame.shape[:2]
-
-    metrics = {
-        'frame': frame_idx,
-        'time_s': round(frame_idx / fps, 3),
-        'distance_from_start_m': round((frame_idx / fps) * DRONE_SPEED_M_S, 2),
-        'detections': []
-    }
-
-    if result.masks is None or result.boxes is None:
-        return metrics, frame
-
-    # Get detections
-    cls_ids = result.boxes.cls.cpu().numpy().astype(int)
-    ids = (
-        result.boxes.id.cpu().numpy().astype(int)
-        if hasattr(result.boxes, "id") and result.boxes.id is not None
-        else list(range(len(cls_ids)))
-    )
-    boxes = result.boxes.xyxy.cpu().numpy()
-    masks = result.masks.data.cpu().numpy()
-    confidences = result.boxes.conf.cpu().numpy()
-
-    overlay = frame.copy()
-    mask_overlay = np.zeros_like(frame)
-
-    # Detect rivers first
-    river_polygons = []
-    for i, cls_id in enumerate(cls_ids):
-        cls_name = result.names.get(cls_id, f"class_{cls_id}")
-        if cls_name == "river":
-            mask = masks[i].astype(np.uint8)
-            full_mask = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
-            poly = mask_to_polygon(full_mask)
-            if poly:
-                river_polygons.append(poly)
-
-    buffer_zone = None
-    if river_polygons:
-        buffer_dist_px = BUFFER_DISTANCE_M / DEFAULT_GSD
-        buffer_zone = unary_union([r.buffer(buffer_dist_px) for r in river_polygons])
-        polys = buffer_zone.geoms if hasattr(buffer_zone, "geoms") else [buffer_zone]
-        for poly in polys:
-            if hasattr(poly, "exterior"):
-                coords = np.array(poly.exterior.coords).round().astype(np.int32)
-                cv2.polylines(overlay, [coords], isClosed=True, color=(0, 255, 255), thickness=2)
-
-    # Process detections
-    for i, obj_id in enumerate(ids):
-        cls_name = result.names.get(cls_ids[i], f"class_{cls_ids[i]}")
-        x1, y1, x2, y2 = (boxes[i] / scale_factor).astype(int)
-        w, h = x2 - x1, y2 - y1
-        conf = confidences[i]
-
-        mask = masks[i].astype(np.uint8)
-        full_mask = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
-        mask_area_px = np.count_nonzero(full_mask)
-        area_m2 = round(mask_area_px * (DEFAULT_GSD ** 2), 2)
-
-        obj_center = Point((x1 + x2) // 2, (y1 + y2) // 2)
-        obj_poly = mask_to_polygon(full_mask)
-
-        inside_buffer = True
-        if buffer_zone:
-            inside_buffer = (
-                (obj_poly and buffer_zone.intersects(obj_poly))
-                or (not obj_poly and buffer_zone.contains(obj_center))
-            )
-
-        dist_from_riverbank_m = None
-        if river_polygons and cls_name not in ["river", "vegitation inside the river"]:
-            if obj_poly:
-                min_poly = min(river_polygons, key=lambda r: obj_poly.distance(r))
-                p1, p2 = nearest_points(obj_poly, min_poly)
-            else:
-                min_poly = min(river_polygons, key=lambda r: r.distance(obj_center))
-                p1, p2 = nearest_points(obj_center, min_poly)
-            dist_px = p1.distance(p2)
-            dist_from_riverbank_m = round(dist_px * DEFAULT_GSD, 2)
-            if dist_from_riverbank_m < 30:
-                cv2.line(overlay, (int(p1.x), int(p1.y)), (int(p2.x), int(p2.y)), (0, 255, 255), 2)
-
-        bridge_length_m = None
-        if cls_name == "bridge":
-            bridge_length_m = round(max(w, h) * DEFAULT_GSD, 2)
-
-        # Save detection metrics
-        detection = {
-            "id": int(obj_id),
-            "class": cls_name,
-            "confidence": round(float(conf), 3),
-            "bbox": [int(x1), int(y1), int(x2), int(y2)],
-            "area_m2": area_m2,
-            "bridge_length_m": bridge_length_m,
-            "dist_from_riverbank_m": dist_from_riverbank_m,
-            "inside_buffer": inside_buffer,
-        }
-        metrics["detections"].append(detection)
-
-        # Draw
-        color = YOLO9_CLASSES.get(cls_name, (255, 255, 255))
-        cv2.rectangle(overlay, (x1, y1), (x2, y2), color, 2)
-
-        metric_text = ""
-        if bridge_length_m:
-            metric_text = f"{bridge_length_m}m"
-        elif area_m2 > 0 and cls_name in ["Natural-drinage", "Manmade-drinage", "silts"]:
-            metric_text = f"{area_m2}m²"
-        elif dist_from_riverbank_m and cls_name == "Building":
-            metric_text = f"d:{dist_from_riverbank_m}m"
-
-        if metric_text:
-            cv2.putText(overlay, metric_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-    final_frame = cv2.addWeighted(mask_overlay, 0.4, overlay, 1.0, 0)
-
-    # Add frame info at top
-    frame_info = f"Frame {frame_idx} | Time {metrics['time_s']}s | Dist {metrics['distance_from_start_m']}m"
-    cv2.rectangle(final_frame, (0, 0), (W, 30), (0, 0, 0), -1)
-    cv2.putText(final_frame, frame_info, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-    return metrics, final_frame
+    metrics = compute_metrics_for_yolo9(result, (W, H), frame_idx, fps, scale_factor=scale_factor,
+                                        geometry=geometry, distance_engine=distance_engine,
+                                        buffer_cache=buffer_cache)
+    return metrics, render_yolo9_frame(frame, metrics, YOLO9_CLASSES, detail="fast")
 
 
 def process_result_frame_fast(result, frame, scale_factor=1.0):
@@ -518,28 +363,24 @@ def process_result_frame_fast(result, frame, scale_factor=1.0):
 
 # Original functions remain for compatibility
 
+def _box_color(cls_id, num_classes):
+    """Hue-spread BGR colour of a box class for non-YOLO9 models."""
+    hue = int(180 * cls_id / num_classes)
+    return tuple(int(c) for c in cv2.cvtColor(np.uint8([[[hue, 255, 255]]]), cv2.COLOR_HSV2BGR)[0][0])
+
 def process_result_frame(result, img):
     """Helper function to draw masks and bounding boxes on a single frame."""
     if result.masks is not None:
-        for mask, cls in zip(result.masks.data.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int)):
-            if cls in MASK_CLASSES:
-                color = MASK_CLASSES[cls]
-                binary = (mask * 255).astype("uint8")
-                binary_resized = cv2.resize(binary, (img.shape[1], img.shape[0]))
-                colored_mask = np.zeros_like(img, dtype=np.uint8)
-                for j in range(3):
-                    colored_mask[..., j] = binary_resized * (color[j] / 255.0)
-                img = cv2.addWeighted(img, 1.0, colored_mask, 0.4, 0)
+        img = get_compositor(MASK_CLASSES).composite(
+            img, result.masks.data.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int))
 
     if result.boxes is not None:
         for box, cls_id in zip(result.boxes.data, result.boxes.cls):
             if int(cls_id) not in MASK_CLASSES:
                 xyxy = box[:4].cpu().numpy().astype(int)
                 conf = box[4].cpu().item()
-                label = f"{model.names[int(cls_id)]} {conf:.2f}"
-                hue = int(180 * int(cls_id) / len(model.names))
-                color = tuple(int(c) for c in cv2.cvtColor(
-                    np.uint8([[[hue, 255, 255]]]), cv2.COLOR_HSV2BGR)[0][0])
+                label = f"{result.names[int(cls_id)]} {conf:.2f}"
+                color = _box_color(int(cls_id), len(result.names))
                 cv2.rectangle(img, (xyxy[0], xyxy[1]), (xyxy[2], xyxy[3]), color, 2)
                 cv2.putText(img, label, (xyxy[0], xyxy[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
     return img
@@ -808,58 +649,647 @@ def generate_pdf_report(rows, summary_totals, timeline_data, report_path, origin
         return False
 
 
+def generate_objects_pdf_report(objects, class_totals, timeline_data, report_path, original_filename):
+    """PDF report with one line per tracked object, plus the per-class summaries of
+       untracked detections (see track_aggregator.py)."""
+    try:
+        doc = SimpleDocTemplate(report_path, pagesize=A4)
+        styles = getSampleStyleSheet()
+        story = []
+
+        def table(data, header_size, body_size=None):
+            t = Table(data)
+            style = [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), header_size),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]
+            if body_size:
+                style.append(('FONTSIZE', (0, 1), (-1, -1), body_size))
+            t.setStyle(TableStyle(style))
+            return t
+
+        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=16,
+                                     spaceAfter=30, alignment=1)
+        story.append(Paragraph(f"Video Analysis Report: {original_filename}", title_style))
+        story.append(Spacer(1, 20))
+
+        # Summary: distinct objects per class
+        story.append(Paragraph("Summary Statistics", styles['Heading2']))
+        summary_data = [['Class', 'Objects']]
+        summary_data += [[cls, count] for cls, count in sorted(class_totals.items())]
+        summary_data.append(['Total Objects', sum(class_totals.values())])
+        untracked = sum(obj['frames_seen'] for obj in objects if not obj['tracked'])
+        if untracked:
+            summary_data.append(['Untracked Detections', untracked])
+        story.append(table(summary_data, 14))
+        if untracked:
+            story.append(Spacer(1, 10))
+            story.append(Paragraph(
+                "Some detections had no track ID, so they cannot be counted as distinct objects; "
+                "they are listed per class as 'untracked' below.", styles['Normal']))
+        story.append(Spacer(1, 20))
+
+        if timeline_data:
+            story.append(Paragraph("Location Data Summary", styles['Heading2']))
+            location_data = [['Start Time (s)', 'End Time (s)', 'Latitude', 'Longitude']]
+            for loc in timeline_data[:10]:  # Show first 10 locations
+                location_data.append([f"{loc['start']:.1f}", f"{loc['end']:.1f}",
+                                      f"{loc['lat']:.6f}", f"{loc['lon']:.6f}"])
+            story.append(table(location_data, 12))
+            story.append(Spacer(1, 20))
+
+        def fmt(value, spec=".2f"):
+            return format(value, spec) if value is not None else '-'
+
+        story.append(Paragraph("Detected Objects", styles['Heading2']))
+        if objects:
+            detail_data = [['ID', 'Class', 'First Seen(s)', 'Last Seen(s)', 'Max Area(m²)',
+                            'Bridge Length(m)', 'Min Dist. River(m)', 'Latitude', 'Longitude']]
+            for obj in objects[:200]:
+                detail_data.append([
+                    str(obj['id']) if obj['tracked'] else 'untracked', obj['class'],
+                    f"{obj['first_time_s']:.1f}", f"{obj['last_time_s']:.1f}",
+                    fmt(obj['max_area_m2']), fmt(obj['max_bridge_length_m']),
+                    fmt(obj['min_dist_from_riverbank_m']),
+                    fmt(obj['first_latitude'], ".6f"), fmt(obj['first_longitude'], ".6f"),
+                ])
+            story.append(table(detail_data, 8, 7))
+        else:
+            story.append(Paragraph("No objects were detected in this video.", styles['Normal']))
+
+        doc.build(story)
+        return True
+    except Exception as e:
+        print(f"Error generating PDF: {e}")
+        return False
+
+
 # --- Job Status Store ---
 
 job_status = {}
 job_cancel_flags = {}
 job_cancel_lock = threading.Lock()
 
-def process_video_job(job_id, filename, upload_path, processed_path, current_user,
-                      timeline_data=None, model_file=None):
-    """Background task to process uploaded video with YOLO models.
-       Always generates an MP4 + CSV + PDF metrics report."""
+def process_frame_range(cap, out, current_model, device, fps, model_file,
+                        start_frame=0, end_frame=None, batch_size=None,
+                        stride=None, adaptive_stride=False, dedup_threshold=None,
+                        buffer_cache=None, metrics_only=False, profile=None, aggregator=None,
+                        id_offset=0, report=None, should_cancel=None, overlay=None, previews=(),
+                        thumbnails=None, frame_rows=False):
+    """Run frames [start_frame, end_frame) of `cap` through the
+       decode → infer → annotate → encode pipeline (see video_pipeline.py),
+       writing annotated frames to `out`.
+       Frames are sent through the model in batches of `batch_size`
+       (defaults to INFERENCE_BATCH_SIZE). With `stride` > 1 (or
+       `adaptive_stride`) only keyframes are inferred and the frames in
+       between are interpolated (see keyframe_stride.py). With a
+       `dedup_threshold` near-duplicate frames reuse the previous frame's
+       output and metrics (see frame_dedup.py). `buffer_cache` carries the
+       river buffer zone across calls for the same job (see metrics_geometry.py).
+       With `metrics_only` nothing is drawn or encoded (`out` may be None);
+       frames_written then counts the frames that were analysed.
+       `overlay` (an OverlayPartWriter, see overlay_track.py) receives each
+       frame's detections and outlines for client-side drawing. Each writer
+       in `previews` (proxy MP4, live HLS; see video_encoding.py) gets a copy
+       of every frame written to `out`, resized to its `size`; a preview
+       writer that fails is marked `broken` and dropped, never failing the job.
+       `thumbnails` (a video_previews.PreviewSampler) is offered every written
+       frame for the poster and seek sprites.
+       `profile` (see processing_profiles.py) sets the inference size,
+       pre-inference downscale, metric engines, render detail and default stride.
+       Keyframes go through the model's tracker (VIDEO_TRACKER) so row IDs are
+       track IDs, shifted by `id_offset`; tracked rows are folded into
+       `aggregator` (see track_aggregator.py), which is what the reports are
+       built from. Only with `frame_rows` are the per-frame detection rows
+       kept too, returned as "rows" (a DetectionBuffer, frame indices absolute;
+       None otherwise).
+       `report(updates)` receives progress counters. Raises PipelineCancelled when
+       `should_cancel()` turns true."""
+    import gc
+
+    report = report or (lambda updates: None)
+    rows = DetectionBuffer() if frame_rows else None
+    sprites_before = label_sprite_stats()
+    frames_written = 0
+    batch_size = max(1, int(batch_size or INFERENCE_BATCH_SIZE))
+    is_yolo9 = bool(model_file and 'yolo9' in model_file.lower())
+    profile = profile if isinstance(profile, dict) else get_profile(profile)
+    scale_factor = profile["scale_factor"]
+    render_detail = profile["render_detail"]
+
+    frames_read = 0
+    if start_frame and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+
+    def run_model(frames):
+        kwargs = dict(conf=profile["conf"], iou=0.45, verbose=False, device=device, imgsz=profile["imgsz"])
+        if VIDEO_TRACKER:
+            # Frames of a batch are fed to the tracker in order; tracks persist across batches
+            return current_model.track(frames, persist=True, tracker=VIDEO_TRACKER, **kwargs)
+        return current_model.predict(frames, **kwargs)
+
+    def predict_batch(frames):
+        """Run the model once over a list of frames, falling back to per-frame calls."""
+        try:
+            return run_model(frames)
+        except Exception as batch_error:
+            print(f"⚠️ Batched inference failed ({batch_error}), retrying frame by frame")
+        results = []
+        for single in frames:
+            try:
+                results.append(run_model(single)[0])
+            except Exception as frame_error:
+                print(f"⚠️ Inference failed on single frame: {frame_error}")
+                results.append(None)
+        return results
+
+    # --- Pipeline stages: each works on a batch of frame packets, in order ---
+
+    def decode_batches():
+        nonlocal frames_read
+        frame_idx = start_frame
+        while True:
+            batch = []
+            while len(batch) < batch_size and (end_frame is None or frame_idx < end_frame):
+                ret, frame = cap.read()
+                if not ret:
+                    print(f"[DEBUG] Frame read failed at frame_idx={frame_idx}")
+                    break
+                batch.append({"idx": frame_idx, "frame": frame})
+                frame_idx += 1
+                frames_read += 1
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+
+    scheduler = KeyframeScheduler(stride or profile["stride"], adaptive=adaptive_stride)
+    propagator = KeyframePropagator()
+    stride_counts = {"keyframes": 0, "interpolated_frames": 0}
+
+    dedup = DuplicateFrameFilter(DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold)
+    buffer_cache = buffer_cache or BufferZoneCache()
+
+    def infer_stage(batch):
+        # Near-duplicates of the last processed frame skip inference entirely
+        for packet in batch:
+            packet["duplicate"] = dedup.is_duplicate(packet["frame"])
+        fresh = [packet for packet in batch if not packet["duplicate"]]
+
+        # Results (and interpolation) live in the downscaled frame's coordinates;
+        # the metrics map them back to full resolution via scale_factor
+        for packet in fresh:
+            packet["small"] = packet["frame"] if scale_factor == 1 else cv2.resize(
+                packet["frame"], None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_AREA)
+
+        keyframes = [packet for packet in fresh if scheduler.is_keyframe(packet["frame"])]
+        results = predict_batch([packet["small"] for packet in keyframes]) if keyframes else []
+        for packet, result in zip(keyframes, results):
+            packet["result"] = result
+            packet["keyframe"] = True
+
+        # Walk in frame order so in-between frames follow the latest keyframe
+        for packet in fresh:
+            small = packet.pop("small")
+            if packet.get("keyframe"):
+                propagator.set_keyframe(small, packet["result"])
+                stride_counts["keyframes"] += 1
+            else:
+                packet["result"] = propagator.propagate(small)
+                packet["interpolated"] = True
+                stride_counts["interpolated_frames"] += 1
+        report({**stride_counts, "frames_skipped": dedup.skipped})
+        return batch
+
+    last = {"metrics": None, "output": None, "overlay": None}
+
+    def add_rows(frame_metrics, interpolated=False, reused=False):
+        tracked = frame_metrics.get('tracked', False)
+        for det in frame_metrics['detections']:
+            det_row = {
+                "id": det['id'] + id_offset if tracked else det['id'],
+                "class": det['class'],
+                "frame": frame_metrics['frame'],
+                "time_s": frame_metrics['time_s'],
+                "distance_from_start_m": frame_metrics['distance_from_start_m'],
+                "area_m2": det.get('area_m2'),
+                "bridge_length_m": det.get('bridge_length_m'),
+                "dist_from_riverbank_m": det.get('dist_from_riverbank_m'),
+                "inside_buffer": det.get('inside_buffer'),
+                "confidence": det.get('confidence'),
+                "interpolated": interpolated,
+                "reused": reused,
+                "tracked": tracked
+            }
+            if rows is not None:
+                rows.append(**det_row)
+            if aggregator is not None:
+                aggregator.add(det_row)
+
+    def annotate_stage(batch):
+        for packet in batch:
+            frame_idx, frame, result = packet["idx"], packet.pop("frame"), packet.pop("result", None)
+            interpolated = packet.get("interpolated", False)
+            packet["output"] = None
+
+            if packet["duplicate"]:
+                # Reuse the previous frame's annotated output and metrics
+                if last["metrics"] is not None:
+                    time_s = round(frame_idx / fps, 3)
+                    add_rows({
+                        "frame": frame_idx,
+                        "time_s": time_s,
+                        "distance_from_start_m": round(time_s * DRONE_SPEED_M_S, 2),
+                        "detections": last["metrics"]["detections"],
+                        "tracked": last["metrics"].get("tracked", False),
+                    }, reused=True)
+                if overlay is not None and last["overlay"] is not None:
+                    overlay.add({**last["overlay"], "f": frame_idx, "t": round(frame_idx / fps, 3)})
+                packet["output"] = last["output"]
+                packet["analyzed"] = True
+                continue
+
+            try:
+                if result is None:
+                    raise RuntimeError("no inference result")
+
+                # Measure, then draw masks and bboxes unless this is a metrics-only job
+                processed_frame = None
+                H, W = frame.shape[:2]
+                if is_yolo9:
+                    frame_metrics = compute_metrics_for_yolo9(
+                        result, (W, H), frame_idx, fps, scale_factor=scale_factor,
+                        geometry=profile["geometry"], distance_engine=profile["distance_engine"],
+                        buffer_cache=buffer_cache, render=not metrics_only or overlay is not None)
+                    # Only add to report if there is at least one detection
+                    if frame_metrics['detections']:
+                        add_rows(frame_metrics, interpolated=interpolated)
+                    else:
+                        print(f"[REPORT] Frame {frame_idx} has NO detections for report.")
+                    last["metrics"] = frame_metrics
+                    if overlay is not None:
+                        last["overlay"] = yolo9_frame_entry(frame_metrics, id_offset)
+                    if not metrics_only:
+                        processed_frame = render_yolo9_frame(frame, frame_metrics, YOLO9_CLASSES, render_detail)
+                elif overlay is not None:
+                    last["overlay"] = result_frame_entry(result, frame_idx, fps, (W, H), scale_factor, MASK_CLASSES)
+                elif not metrics_only:
+                    if render_detail == "fast" or scale_factor != 1:
+                        processed_frame = process_result_frame_fast(result, frame, scale_factor)
+                    else:
+                        processed_frame = process_result_frame(result, frame)
+
+                # Debug print for detected classes per frame
+                if result.boxes is not None:
+                    detected_classes = [result.names.get(int(cls_id), str(cls_id)) for cls_id in result.boxes.cls.cpu().numpy()]
+                    print(f"Frame {frame_idx}: Detected classes: {detected_classes}")
+
+                if overlay is not None:
+                    overlay.add(last["overlay"])
+                packet["output"] = processed_frame
+                packet["analyzed"] = True
+                last["output"] = processed_frame
+            except Exception as frame_error:
+                print(f"⚠️ Error processing frame {frame_idx}: {frame_error}")
+        if is_yolo9:
+            report({**buffer_cache.stats(), **label_sprite_stats(sprites_before)})
+        if aggregator is not None:
+            report({"objects_tracked": len(aggregator)})
+        return batch
+
+    live_previews = [writer for writer in previews if writer is not None]
+
+    def write_previews(frame):
+        resized = {}
+        for writer in list(live_previews):
+            if writer.size not in resized:
+                resized[writer.size] = cv2.resize(frame, writer.size, interpolation=cv2.INTER_AREA)
+            try:
+                writer.write(resized[writer.size])
+            except Exception as preview_error:
+                print(f"⚠️ Preview encoder {writer.path} failed, dropping it: {preview_error}")
+                writer.broken = True
+                live_previews.remove(writer)
+
+    def encode_stage(batch):
+        nonlocal frames_written
+        for packet in batch:
+            frame_idx = packet["idx"]
+            if out is None:
+                frames_written += packet.get("analyzed", False)
+            elif packet["output"] is not None:
+                out.write(packet["output"])
+                write_previews(packet["output"])
+                if thumbnails is not None:
+                    try:
+                        thumbnails.offer(frame_idx, packet["output"])
+                    except Exception as thumb_error:
+                        print(f"⚠️ Thumbnail sampling failed at frame {frame_idx}: {thumb_error}")
+                frames_written += 1
+                print(f"[DEBUG] Frame {frame_idx} written. Total frames_written={frames_written}")
+
+            if (frame_idx + 1) % 100 == 0:
+                gc.collect()
+
+        # Always update progress
+        report({"frames_processed": batch[-1]["idx"] + 1 - start_frame})
+
+    stage_stats = run_pipeline(
+        ("decode", decode_batches()),
+        [("infer", infer_stage), ("annotate", annotate_stage)],
+        ("encode", encode_stage),
+        queue_size=PIPELINE_QUEUE_SIZE,
+        on_progress=lambda stats: report({"stages": stats}),
+        should_cancel=should_cancel,
+    )
+    report({"stages": stage_stats})
+    return {"rows": rows, "frames_written": frames_written, "frames_read": frames_read,
+            "frames_skipped": dedup.skipped, "stages": stage_stats, **stride_counts,
+            **buffer_cache.stats(), **label_sprite_stats(sprites_before)}
+
+
+def plan_segments(upload_path, total_frames, fps, count):
+    """Split [0, total_frames) into up to `count` ranges cut at keyframes.
+       Falls back to even splits when the keyframes cannot be probed."""
+    count = max(1, int(count or 1))
+    if count == 1 or total_frames < count * SEGMENT_MIN_FRAMES:
+        return [(0, total_frames)]
+
+    keyframes = sorted({int(round(t * fps)) for t in probe_keyframe_times(upload_path)})
+    keyframes = [k for k in keyframes if 0 < k < total_frames]
+    cuts = []
+    for i in range(1, count):
+        target = total_frames * i // count
+        cut = min(keyframes, key=lambda k: abs(k - target)) if keyframes else target
+        if (not cuts or cut - cuts[-1] >= SEGMENT_MIN_FRAMES) and total_frames - cut >= SEGMENT_MIN_FRAMES:
+            cuts.append(cut)
+    bounds = [0] + cuts + [total_frames]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def _process_segment(task):
+    """Worker-process entry point for one segment of a segment-parallel job."""
+    index = task["index"]
+    progress, cancel_event = task["progress"], task["cancel_event"]
+    current_model = get_model(task["model_path"], task["device"])
+    reset_tracker(current_model)
+    cap = cv2.VideoCapture(task["upload_path"])
+    out = None if task["metrics_only"] else open_video_writer(task["output_path"], task["fps"], task["size"])
+    overlay = OverlayPartWriter(task["overlay_path"]) if task["overlay_path"] else None
+    proxy = open_proxy_writer(task["proxy_path"], task["fps"], task["size"]) if task["proxy_path"] else None
+    thumbnails = PreviewSampler(**task["thumbnails"]) if task["thumbnails"] else None
+    aggregator = TrackAggregator()
+
+    def report(updates):
+        if "frames_processed" in updates:
+            progress[index] = updates["frames_processed"]
 
-    # --- Load model ---
     try:
-        if model_file:
-            model_path = os.path.join("models", model_file)
-            current_model = YOLO(model_path) if os.path.exists(model_path) else YOLO("models/best.pt")
-        else:
-            current_model = YOLO("models/best.pt")
+        result = process_frame_range(
+            cap, out, current_model, task["device"], task["fps"], task["model_file"],
+            start_frame=task["start"], end_frame=task["end"], batch_size=task["batch_size"],
+            stride=task["stride"], adaptive_stride=task["adaptive_stride"],
+            dedup_threshold=task["dedup_threshold"], metrics_only=task["metrics_only"], profile=task["profile"],
+            aggregator=aggregator, report=report, should_cancel=cancel_event.is_set, overlay=overlay,
+            previews=[proxy], thumbnails=thumbnails, frame_rows=task["frame_rows"],
+        )
+    finally:
+        cap.release()
+        if not _close_proxy(proxy) and task["proxy_path"]:
+            _discard_writer(None, task["proxy_path"])
+        if out is not None:
+            out.release()
+        if overlay is not None:
+            overlay.close()
+    result.pop("stages", None)
+    return {"index": index, "output_path": task["output_path"], "tracks": aggregator.state(), **result}
+
+
+def process_segments_parallel(job_id, segments, upload_path, final_path, model_path, device,
+                              fps, size, model_file, batch_size=None, stride=None,
+                              adaptive_stride=False, dedup_threshold=None, metrics_only=False, profile=None,
+                              overlay_path=None, overlay_header=None, proxy_path=None, thumbnails=None,
+                              frame_rows=False):
+    """Process `segments` of one video in parallel worker processes, each with its own
+       model, then join the encoded parts with ffmpeg's concat demuxer and merge the
+       segments' track summaries ("tracks", see TrackAggregator.state) and, with
+       `frame_rows`, their metrics rows (frame indices are absolute; object IDs are
+       offset per segment).
+       With `overlay_path` each segment also writes overlay frames, joined into
+       that overlay file with `overlay_header` (see overlay_track.py). With
+       `proxy_path` the segments' proxy parts are joined and published there
+       before the full-resolution parts are joined. `thumbnails` holds the
+       PreviewSampler arguments; every segment samples its own frames."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+
+    base = os.path.splitext(final_path)[0]
+    ctx = multiprocessing.get_context("spawn")
+    manager = ctx.Manager()
+    progress = manager.dict()
+    cancel_event = manager.Event()
+    tasks = [{
+        "index": i, "start": start, "end": end,
+        "upload_path": upload_path, "output_path": f"{base}_seg{i:03d}.mp4",
+        "overlay_path": f"{base}_seg{i:03d}_overlay.jsonl.gz" if overlay_path else None,
+        "proxy_path": f"{base}_seg{i:03d}_proxy.mp4" if proxy_path else None,
+        "thumbnails": thumbnails,
+        "model_path": model_path, "device": device, "model_file": model_file,
+        "fps": fps, "size": size, "batch_size": batch_size,
+        "stride": stride, "adaptive_stride": adaptive_stride, "dedup_threshold": dedup_threshold,
+        "metrics_only": metrics_only, "profile": profile, "frame_rows": frame_rows,
+        "progress": progress, "cancel_event": cancel_event,
+    } for i, (start, end) in enumerate(segments)]
+    total = max(1, segments[-1][1] - segments[0][0])
 
-        device = "cpu"
-        if torch and torch.cuda.is_available():
-            try:
-                _ = torch.tensor([1.0]).cuda() + 1
-                device = "cuda"
-                print("✅ CUDA available, using GPU")
-            except Exception as e:
-                print(f"⚠️ CUDA test failed, fallback to CPU: {e}")
-                device = "cpu"
+    try:
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=ctx) as pool:
+            futures = [pool.submit(_process_segment, task) for task in tasks]
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_EXCEPTION)
+                if any(f.exception() for f in done):
+                    cancel_event.set()
+                if job_cancel_flags.get(job_id):
+                    cancel_event.set()
+                processed = sum(progress.values())
+                job_status[job_id].update({
+                    "frames_processed": processed,
+                    "progress_percent": min(int(processed / total * 100), 100),
+                    "segments_done": sum(1 for f in futures if f.done()),
+                })
+            results = sorted((f.result() for f in futures), key=lambda r: r["index"])
+
+        if proxy_path:
+            _publish_proxy(job_id, proxy_path, [t["proxy_path"] for t in tasks])
+        if not metrics_only:
+            concat_videos([r["output_path"] for r in results], final_path)
+
+        merged, id_offsets = merge_segments([r["tracks"] for r in results])
+        for r, id_offset in zip(results, id_offsets):
+            if r["rows"] is not None:
+                # Untracked rows keep their per-frame detection index
+                r["rows"].column("id")[r["rows"].column("tracked")] += id_offset
+        if overlay_path:
+            build_overlay([t["overlay_path"] for t in tasks], overlay_path, overlay_header, id_offsets)
+    finally:
+        manager.shutdown()
+        for task in tasks:
+            for path in (task["output_path"], task["overlay_path"], task["proxy_path"]):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    return {
+        "tracks": merged.state(),
+        "rows": DetectionBuffer.concat([r["rows"] for r in results]) if frame_rows else None,
+        "frames_written": sum(r["frames_written"] for r in results),
+        "keyframes": sum(r["keyframes"] for r in results),
+        "interpolated_frames": sum(r["interpolated_frames"] for r in results),
+        "frames_skipped": sum(r["frames_skipped"] for r in results),
+        "buffer_cache_hits": sum(r["buffer_cache_hits"] for r in results),
+        "buffer_cache_misses": sum(r["buffer_cache_misses"] for r in results),
+        "label_sprite_hits": sum(r["label_sprite_hits"] for r in results),
+        "label_sprite_misses": sum(r["label_sprite_misses"] for r in results),
+    }
 
-        current_model.to(device)
-        if device == "cuda":
-            try:
-                current_model.model.half()  # mixed precision for speed
-                print("⚡ Half precision enabled for GPU inference")
-            except Exception:
-                pass
+
+def _discard_writer(out, path):
+    """Close a writer whose output is not wanted and remove the partial file."""
+    if out is not None:
+        try:
+            out.release()
+        except Exception:
+            pass
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _close_proxy(proxy):
+    """Finish a proxy (or other preview) encoder; returns False (after logging) when there
+       was none or it failed."""
+    if proxy is None:
+        return False
+    try:
+        proxy.release()
+        return not getattr(proxy, "broken", False)
+    except Exception as e:
+        print(f"⚠️ Proxy encoder failed: {e}")
+        return False
+
+
+def _publish_proxy(job_id, proxy_path, parts=None, partial=False):
+    """Join proxy `parts` into `proxy_path` (if given) and publish it as the job's
+       proxy_video_url. With `partial` the parts only cover the video so far; the URL
+       then carries the part count, so players pick up each longer version.
+       A broken proxy never fails the job."""
+    try:
+        if parts:
+            if not all(os.path.exists(p) for p in parts):
+                raise RuntimeError("missing proxy parts")
+            # Players may be reading the previous version; swap the file in whole
+            tmp_path = f"{os.path.splitext(proxy_path)[0]}.tmp.mp4"
+            concat_videos(parts, tmp_path)
+            os.replace(tmp_path, proxy_path)
+        if os.path.exists(proxy_path):
+            url = f"/video/processed/{os.path.basename(proxy_path)}"
+            job_status[job_id]["proxy_video_url"] = f"{url}?v={len(parts)}" if partial else url
+            print(f"[PROXY] Published {proxy_path}{' (partial)' if partial else ''}")
+    except Exception as e:
+        print(f"⚠️ Proxy video unavailable: {e}")
+
+
+def _record_video(current_user, final_filename, timeline_data, model_file, share_id, profile_name,
+                  has_video=True):
+    """Add a finished video to the user's history (videos table).  Metrics-only jobs
+       pass has_video=False: `final_filename` then only names the reports."""
+    with sqlite3.connect(DB_PATH) as conn:
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(videos)")
+        columns = [c[1] for c in cur.fetchall()]
+        if "share_id" not in columns:
+            cur.execute("ALTER TABLE videos ADD COLUMN share_id TEXT")
+        if "processing_profile" not in columns:
+            cur.execute("ALTER TABLE videos ADD COLUMN processing_profile TEXT")
+        if "has_video" not in columns:
+            cur.execute("ALTER TABLE videos ADD COLUMN has_video BOOLEAN")
+        cur.execute(
+            "INSERT INTO videos (email, filename, timeline_data, upload_date, model_used, has_metrics, share_id, "
+            "processing_profile, has_video) VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?)",
+            (current_user, final_filename, json.dumps(timeline_data) if timeline_data else None, model_file, True,
+             share_id, profile_name, has_video)
+        )
+        conn.commit()
+
+
+def process_video_job(job_id, filename, upload_path, processed_path, current_user,
+                      timeline_data=None, model_file=None, batch_size=None,
+                      stride=None, adaptive_stride=False, segments=None,
+                      dedup_threshold=None, metrics_only=False, profile=None, overlay=False,
+                      cache_key=None, frame_rows=False):
+    """Background task to process uploaded video with YOLO models.
+       Generates an MP4 plus reports with one line per tracked object (CSV,
+       PDF, JSON; see track_aggregator.py); with `frame_rows` the per-frame
+       detection rows are kept as well and added as a CSV and to the JSON.
+       With `metrics_only` no video is rendered or encoded, only the reports.
+       With `overlay` nothing is rendered or encoded either: the uploaded video
+       is published unchanged next to a gzipped overlay file holding the
+       detections, for drawing in the browser (see overlay_track.py).
+       Encoded jobs also get a low-resolution proxy MP4, published as
+       proxy_video_url before the full-resolution video is finalised, and
+       (without segments) a live HLS stream at live_playlist_url that becomes
+       the VOD hls_playlist_url when the job is done.
+       `profile` names a processing profile (see processing_profiles.py).
+       With `cache_key` the finished outputs are stored in the result cache
+       (see result_cache.py) once the reports are written.
+       Frames go through process_frame_range; with `segments` > 1 the video
+       is split at keyframes and the parts are processed in parallel
+       (see process_segments_parallel)."""
+
+    profile = get_profile(profile)
+    skip_encode = metrics_only or overlay
+
+    # --- Load model (cached process-wide, see model_registry.py) ---
+    try:
+        model_path = os.path.join("models", model_file) if model_file else DEFAULT_MODEL_PATH
+        if not os.path.exists(model_path):
+            model_path = DEFAULT_MODEL_PATH
+        device = select_device()
+        current_model = get_model(model_path, device)
     except Exception as e:
         print(f"⚠️ Error loading model: {e}, falling back to default")
-        current_model = YOLO("models/best.pt")
+        model_path = DEFAULT_MODEL_PATH
         device = "cpu"
-        current_model.to(device)
+        current_model = get_model(DEFAULT_MODEL_PATH, device)
+    # The cached model may still hold tracks from this worker's previous job
+    reset_tracker(current_model)
+    aggregator = TrackAggregator(timeline_data)
 
 
-    # --- Prepare output paths and temp file ---
+    # --- Prepare output paths ---
 
-    import time as time_module, gc
     import uuid as uuid_mod
     base_name = os.path.splitext(filename)[0]
-    final_filename = f"{base_name}.mp4"
+    # Overlay jobs publish the upload itself, in its own container
+    final_filename = f"{base_name}{os.path.splitext(upload_path)[1]}" if overlay else f"{base_name}.mp4"
     final_path = os.path.join("static/processed", final_filename)
-    timestamp = str(int(time_module.time() * 1000))
-    temp_processed_path = os.path.join("static/processed", f"{base_name}_temp_{timestamp}.avi")
+    overlay_filename = f"{base_name}_overlay.json.gz"
+    overlay_path = os.path.join(PROCESSED_DIR, overlay_filename) if overlay else None
+    hls_dir = os.path.join(HLS_DIR, base_name)
+    hls_playlist = os.path.join(hls_dir, "index.m3u8")
+    hls_url = f"/video/live/{base_name}/index.m3u8"
+    hls_vod = False
+    poster_path = os.path.join(PROCESSED_DIR, f"{base_name}_poster.jpg")
+    sprite_path = os.path.join(PROCESSED_DIR, f"{base_name}_sprite.jpg")
+    sprite_vtt_path = os.path.join(PROCESSED_DIR, f"{base_name}_sprite.vtt")
+    tiles_dir = os.path.join(PROCESSED_DIR, f"{base_name}_tiles")
     share_id = str(uuid_mod.uuid4())
 
     cap = cv2.VideoCapture(upload_path)
@@ -877,125 +1307,292 @@ def process_video_job(job_id, filename, upload_path, processed_path, current_use
         "frames_processed": 0,
         "total_frames": total_frames,
         "progress_percent": 0,
-        "csv_progress_percent": 0
+        "csv_progress_percent": 0,
+        "processing_profile": profile["name"]
     }
 
+    proxy_path = None
+    if not skip_encode and proxy_size((width, height)):
+        proxy_path = os.path.join(PROCESSED_DIR, f"{base_name}_proxy.mp4")
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(temp_processed_path, fourcc, fps, (width, height))
-    frame_idx = 0
-    rows = []
-    frames_written = 0
-
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print(f"[DEBUG] Frame read failed at frame_idx={frame_idx}")
-            break
+    overlay_header = None
+    if overlay:
+        if model_file and 'yolo9' in model_file.lower():
+            colors = YOLO9_CLASSES
+        else:
+            names = current_model.names
+            colors = {names[i]: MASK_CLASSES.get(i) or _box_color(i, len(names)) for i in names}
+        overlay_header = {
+            "video": f"/video/processed/{final_filename}", "fps": fps, "width": width, "height": height,
+            "frame_count": total_frames, "colors": {name: hex_color(c) for name, c in colors.items()},
+        }
 
+    # Poster and seek sprites are sampled from the annotated frames (see video_previews.py)
+    thumbnail_args = None
+    if not skip_encode:
+        thumbnail_args = {"poster_path": poster_path, "tiles_dir": tiles_dir, "fps": fps, "total_frames": total_frames}
 
+    segment_plan = plan_segments(upload_path, total_frames, fps, segments or VIDEO_SEGMENTS)
+    if len(segment_plan) > 1:
+        cap.release()
+        shutil.rmtree(tiles_dir, ignore_errors=True)
+        job_status[job_id]["segments"] = len(segment_plan)
         try:
-            result = current_model.predict(frame, conf=0.1, iou=0.45,
-                                           verbose=False, device=device, imgsz=640)[0]
-
-            # Draw masks and bboxes for all models
-            if model_file and 'yolo9' in model_file.lower():
-                frame_metrics, processed_frame = calculate_metrics_for_yolo9(result, frame, frame_idx, fps)
-                # Only add to report if there is at least one detection
-                if frame_metrics['detections']:
-                    for det in frame_metrics['detections']:
-                        det_row = {
-                            "id": det['id'],
-                            "class": det['class'],
-                            "frame": frame_metrics['frame'],
-                            "time_s": frame_metrics['time_s'],
-                            "distance_from_start_m": frame_metrics['distance_from_start_m'],
-                            "area_m2": det.get('area_m2'),
-                            "bridge_length_m": det.get('bridge_length_m'),
-                            "dist_from_riverbank_m": det.get('dist_from_riverbank_m'),
-                            "inside_buffer": det.get('inside_buffer'),
-                            "confidence": det.get('confidence')
-                        }
-                        rows.append(det_row)
-
-                else:
-                    print(f"[REPORT] Frame {frame_idx} has NO detections for report.")
-                out.write(processed_frame)
-            else:
-                processed_frame = process_result_frame(result, frame)
-                out.write(processed_frame)
-
-            # Debug print for detected classes per frame
-            if result.boxes is not None:
-                detected_classes = [result.names.get(int(cls_id), str(cls_id)) for cls_id in result.boxes.cls.cpu().numpy()]
-                print(f"Frame {frame_idx}: Detected classes: {detected_classes}")
-
-            frames_written += 1
-            print(f"[DEBUG] Frame {frame_idx} written. Total frames_written={frames_written}")
-        except Exception as frame_error:
-            print(f"⚠️ Error processing frame {frame_idx}: {frame_error}")
-
-        # Always update progress
-        if frame_idx % 3 == 0 or frame_idx == total_frames - 1:
-            job_status[job_id].update({
-                "frames_processed": frame_idx + 1,
-                "progress_percent": min(int((frame_idx + 1) / total_frames * 100), 100)
+            result = process_segments_parallel(
+                job_id, segment_plan, upload_path, final_path, model_path, device,
+                fps, (width, height), model_file, batch_size=batch_size,
+                stride=stride, adaptive_stride=adaptive_stride,
+                dedup_threshold=dedup_threshold, metrics_only=skip_encode, profile=profile,
+                overlay_path=overlay_path, overlay_header=overlay_header, proxy_path=proxy_path,
+                thumbnails=thumbnail_args, frame_rows=frame_rows)
+            job_status[job_id]["frames_skipped"] = result["frames_skipped"]
+            # Segments are tracked independently; a track crossing a cut counts once per segment
+            aggregator.merge(result["tracks"])
+            cache_stats = {k: result[k] for k in ("buffer_cache_hits", "buffer_cache_misses",
+                                                   "label_sprite_hits", "label_sprite_misses")}
+        except Exception as segment_error:
+            shutil.rmtree(tiles_dir, ignore_errors=True)
+            if job_cancel_flags.get(job_id):
+                print(f"[INFO] Job {job_id} cancelled")
+                return
+            print(f"❌ Segment-parallel processing failed: {segment_error}")
+            job_status[job_id]["error"] = f"Segment-parallel processing failed: {segment_error}"
+            return
+    else:
+        # Annotated frames go straight to H.264 MP4 (see video_encoding.py). With
+        # checkpointing on, the video is encoded in chunks that survive a restart
+        # (see job_checkpoint.py) and joined once the last chunk is done.
+        checkpoint = None
+        start_frame = 0
+        id_offset = 0
+        if CHECKPOINT_INTERVAL_FRAMES > 0:
+            checkpoint = JobCheckpoint(job_id, {
+                "upload_path": upload_path, "model_path": model_path, "total_frames": total_frames,
+                "stride": stride, "adaptive_stride": adaptive_stride, "metrics_only": metrics_only,
+                "profile": profile["name"], "overlay": overlay, "frame_rows": frame_rows,
             })
+            start_frame = checkpoint.load()
+            if start_frame:
+                job_status[job_id]["resumed_from_frame"] = start_frame
+                # Restore the object summaries; this process's tracker starts over,
+                # so its track IDs are shifted past the ones already used
+                aggregator.merge(checkpoint.tracks)
+                id_offset = aggregator.next_id()
+
+        # Live HLS of the whole run; a resumed job appends to the stream it already has
+        hls = None
+        thumbnails = None
+        if not skip_encode:
+            if not start_frame:
+                shutil.rmtree(hls_dir, ignore_errors=True)
+                shutil.rmtree(tiles_dir, ignore_errors=True)
+            thumbnails = PreviewSampler(**thumbnail_args)
+            hls = open_hls_writer(hls_playlist, fps, (width, height),
+                                  resume=bool(start_frame) and os.path.exists(hls_playlist))
+
+        def report_from(offset):
+            def report(updates):
+                if "frames_processed" in updates:
+                    updates["frames_processed"] += offset
+                    if total_frames:
+                        updates["progress_percent"] = min(int(updates["frames_processed"] / total_frames * 100), 100)
+                if hls is not None and "live_playlist_url" not in job_status[job_id] and hls.ready:
+                    updates["live_playlist_url"] = hls_url
+                job_status[job_id].update(updates)
+            return report
+
+        # One buffer-zone cache for the whole job, shared by all chunks
+        buffer_cache = BufferZoneCache()
+        sprites_before = label_sprite_stats()
+        result = {"rows": DetectionBuffer() if frame_rows else None, "frames_written": 0}
+        overlay_part = None
+        while not (checkpoint and total_frames and start_frame >= total_frames):
+            end_frame = start_frame + CHECKPOINT_INTERVAL_FRAMES if checkpoint else None
+            chunk_path = None
+            out = None
+            part_writer = None
+            proxy, proxy_chunk = None, None
+            if not skip_encode:
+                chunk_path = checkpoint.next_chunk_path() if checkpoint else final_path
+                out = open_video_writer(chunk_path, fps, (width, height))
+            if proxy_path:
+                proxy_chunk = checkpoint.next_part_path("proxy", ".mp4") if checkpoint else proxy_path
+                proxy = open_proxy_writer(proxy_chunk, fps, (width, height))
+            if overlay:
+                overlay_part = checkpoint.next_overlay_path() if checkpoint else f"{overlay_path}.part"
+                part_writer = OverlayPartWriter(overlay_part)
+            try:
+                chunk = process_frame_range(
+                    cap, out, current_model, device, fps, model_file,
+                    start_frame=start_frame, end_frame=end_frame,
+                    batch_size=batch_size, stride=stride, adaptive_stride=adaptive_stride,
+                    dedup_threshold=dedup_threshold, buffer_cache=buffer_cache,
+                    metrics_only=skip_encode, profile=profile, aggregator=aggregator,
+                    id_offset=id_offset, report=report_from(start_frame),
+                    should_cancel=lambda: job_cancel_flags.get(job_id, False), overlay=part_writer,
+                    previews=[proxy, hls], thumbnails=thumbnails, frame_rows=frame_rows)
+                if part_writer is not None:
+                    part_writer.close()
+                if checkpoint and chunk["frames_read"] == 0:
+                    # Ran past the real end of the video: nothing to encode
+                    _discard_writer(out, chunk_path)
+                    _discard_writer(None, overlay_part)
+                    _discard_writer(proxy, proxy_chunk)
+                    break
+                # The proxy is finished first, so it can be watched while the full video is finalised
+                if not _close_proxy(proxy):
+                    proxy_chunk = None
+                elif not checkpoint:
+                    _publish_proxy(job_id, proxy_path)
+                if out is not None:
+                    out.release()
+            except PipelineCancelled:
+                print(f"[INFO] Job {job_id} cancelled")
+                cap.release()
+                _discard_writer(out, chunk_path)
+                _discard_writer(proxy, proxy_chunk)
+                _discard_writer(hls, None)
+                shutil.rmtree(hls_dir, ignore_errors=True)
+                shutil.rmtree(tiles_dir, ignore_errors=True)
+                if part_writer is not None:
+                    part_writer.close()
+                    _discard_writer(None, overlay_part)
+                if checkpoint:
+                    checkpoint.clear()
+                return
+            except Exception as pipeline_error:
+                # Finished chunks stay checkpointed for the retry
+                print(f"❌ Processing pipeline failed: {pipeline_error}")
+                job_status[job_id]["error"] = f"Processing pipeline failed: {pipeline_error}"
+                cap.release()
+                if part_writer is not None:
+                    part_writer.close()
+                _close_proxy(proxy)
+                _close_proxy(hls)
+                if out is not None:
+                    try:
+                        out.release()
+                    except Exception:
+                        pass
+                if not checkpoint:
+                    # Checkpointed jobs keep their tiles and overlay parts; the retry resumes into them
+                    shutil.rmtree(tiles_dir, ignore_errors=True)
+                    if part_writer is not None:
+                        _discard_writer(None, overlay_part)
+                return
+
+            if not checkpoint:
+                result = chunk
+                break
+            start_frame += chunk["frames_read"]
+            checkpoint.commit(start_frame, chunk_path, aggregator.state(), {
+                "frames_written": chunk["frames_written"],
+                "keyframes": chunk["keyframes"],
+                "interpolated_frames": chunk["interpolated_frames"],
+                "frames_skipped": chunk["frames_skipped"],
+            }, parts={"overlay": overlay_part, "proxy": proxy_chunk}, rows=chunk["rows"])
+            job_status[job_id]["checkpoint_frame"] = start_frame
+            # Reviewers can watch the proxy of everything up to this checkpoint
+            proxy_parts = checkpoint.chunk_parts("proxy")
+            if proxy_path and proxy_parts and len(proxy_parts) == len(checkpoint.chunk_videos):
+                _publish_proxy(job_id, proxy_path, proxy_parts, partial=True)
+            if chunk["frames_read"] < CHECKPOINT_INTERVAL_FRAMES:
+                break
+
+        cap.release()
+        cache_stats = {**buffer_cache.stats(), **label_sprite_stats(sprites_before)}
+        hls_done = _close_proxy(hls)
+
+        if checkpoint:
+            counts = checkpoint.counts
+            result = {"rows": checkpoint.rows(), **counts}
+            result.setdefault("frames_written", 0)
+            job_status[job_id].update({k: v for k, v in counts.items() if k != "frames_written"})
+            proxy_parts = checkpoint.chunk_parts("proxy")
+            if proxy_path and proxy_parts and len(proxy_parts) == len(checkpoint.chunk_videos):
+                _publish_proxy(job_id, proxy_path, proxy_parts)
+            if result["frames_written"] and not skip_encode:
+                try:
+                    concat_videos(checkpoint.chunk_videos, final_path)
+                except Exception as concat_error:
+                    print(f"❌ Joining checkpointed chunks failed: {concat_error}")
+                    job_status[job_id]["error"] = f"Joining checkpointed chunks failed: {concat_error}"
+                    return
+            if overlay:
+                build_overlay(checkpoint.chunk_parts("overlay"), overlay_path, overlay_header)
+            checkpoint.clear()
+        elif overlay:
+            build_overlay([overlay_part], overlay_path, overlay_header)
+            os.remove(overlay_part)
+
+        if hls_done and os.path.exists(hls_playlist):
+            try:
+                finalize_hls_playlist(hls_playlist)
+                hls_vod = True
+            except OSError as e:
+                print(f"⚠️ Could not finalise HLS playlist: {e}")
+
+    if overlay:
+        # The original video is the playback source; no re-encode
+        if os.path.exists(final_path):
+            os.remove(final_path)
+        try:
+            os.link(upload_path, final_path)
+        except OSError:
+            shutil.copyfile(upload_path, final_path)
 
-        frame_idx += 1
-        if frame_idx % 100 == 0:
-            gc.collect()
+    rows = result["rows"]
+    frames_written = result["frames_written"]
 
-    cap.release()
-    out.release()
+    has_sprites = False
+    if thumbnail_args:
+        try:
+            has_sprites = build_sprite_sheet(tiles_dir, sprite_path, sprite_vtt_path, fps,
+                                             sprite_interval_frames(fps, total_frames),
+                                             total_frames / fps if fps else None)
+        except Exception as sprite_error:
+            print(f"⚠️ Building the seek sprite sheet failed: {sprite_error}")
 
     # Log for debugging
-    print(f"[DEBUG] frames_written: {frames_written}, temp_exists: {os.path.exists(temp_processed_path)}, temp_path: {temp_processed_path}")
-    if frames_written == 0 or not os.path.exists(temp_processed_path):
-        print(f"❌ No frames written or temp file missing: {temp_processed_path}")
-        job_status[job_id]["error"] = f"No frames written or temp file missing: {temp_processed_path} (frames_written={frames_written})"
+    print(f"[DEBUG] frames_written: {frames_written}, output_exists: {os.path.exists(final_path)}, output_path: {final_path}")
+    if frames_written == 0 or not (skip_encode or os.path.exists(final_path)):
+        print(f"❌ No frames written or output file missing: {final_path}")
+        job_status[job_id]["error"] = f"No frames written or output file missing: {final_path} (frames_written={frames_written})"
         return
 
-    # Convert AVI → MP4
-    try:
-        subprocess.run(
-            ["ffmpeg", "-i", temp_processed_path, "-c:v", "libx264", "-y", final_path],
-            check=True
-        )
-    except subprocess.CalledProcessError as ffmpeg_error:
-        print(f"❌ ffmpeg failed: {ffmpeg_error}")
-        job_status[job_id]["error"] = f"ffmpeg failed: {ffmpeg_error}"
-        return
-    if os.path.exists(temp_processed_path):
-        os.remove(temp_processed_path)
+    objects_warning = None
+    if aggregator.untracked_detections:
+        reason = "tracking is disabled" if not VIDEO_TRACKER else "the tracker gave them no ID"
+        objects_warning = (f"{aggregator.untracked_detections} detections have no track ID ({reason}); "
+                           f"they are reported per class, not per object")
+        print(f"⚠️ {objects_warning}")
 
     # Save DB record (video is ready)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(videos)")
-        columns = [c[1] for c in cur.fetchall()]
-        if "share_id" not in columns:
-            cur.execute("ALTER TABLE videos ADD COLUMN share_id TEXT")
-        cur.execute(
-            "INSERT INTO videos (email, filename, timeline_data, upload_date, model_used, has_metrics, share_id) "
-            "VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?)",
-            (current_user, final_filename, json.dumps(timeline_data) if timeline_data else None, model_file, True, share_id)
-        )
-        conn.commit()
+    _record_video(current_user, final_filename, timeline_data, model_file, share_id, profile["name"],
+                  has_video=not metrics_only or overlay)
 
     # Immediately update job_status so frontend can show video and map
     job_status[job_id] = {
         "status": "done",
-        "processed_video_url": f"/video/processed/{final_filename}",
+        "processed_video_url": None if metrics_only and not overlay else f"/video/processed/{final_filename}",
+        "metrics_only": metrics_only,
+        "overlay_url": f"/video/processed/{overlay_filename}" if overlay else None,
+        "proxy_video_url": job_status[job_id].get("proxy_video_url"),
+        "hls_playlist_url": hls_url if hls_vod else None,
+        "poster_url": f"/video/processed/{os.path.basename(poster_path)}" if os.path.exists(poster_path) else None,
+        "thumbnails_vtt_url": f"/video/processed/{os.path.basename(sprite_vtt_path)}" if has_sprites else None,
         "share_url": f"/video/share/{share_id}",
         "share_id": share_id,
         "timeline": timeline_data,
         "model_used": model_file,
+        "processing_profile": profile["name"],
+        "objects_tracked": len(aggregator),
+        "objects_warning": objects_warning,
         "has_metrics": False,  # report not ready yet
         "progress_percent": 100,
         "csv_progress_percent": 0,
-        "report_status": "processing"
+        "report_status": "processing",
+        **cache_stats,
     }
 
     # Generate report in background (simulate steps)
@@ -1004,33 +1601,52 @@ def process_video_job(job_id, filename, upload_path, processed_path, current_use
         try:
             job_status[job_id]["report_status"] = "processing"
             job_status[job_id]["report_steps_completed"] = 0
-            job_status[job_id]["report_total_steps"] = 2
+            job_status[job_id]["report_total_steps"] = 4
             job_status[job_id]["report_progress_percent"] = 0
 
-            # Step 1: CSV
-            output_csv = os.path.join(REPORTS_DIR, f"{base_name}_metrics.csv")
-            pd.DataFrame(rows).to_csv(output_csv, index=False)
-            job_status[job_id]["report_steps_completed"] = 1
-            job_status[job_id]["report_progress_percent"] = 50
-
-            # Step 2: PDF (fix for missing distance_from_start_m)
-
-            def safe_generate_metrics_report(rows, timeline_data, filename, fmt):
-                # Patch: if 'distance_from_start_m' missing, use 'dist_from_starting_m' or set to 0
-                for r in rows:
-                    if 'distance_from_start_m' not in r:
-                        if 'dist_from_starting_m' in r:
-                            r['distance_from_start_m'] = r['dist_from_starting_m']
-                        else:
-                            r['distance_from_start_m'] = 0
-                return generate_metrics_report(rows, timeline_data, filename, fmt)
-
-            output_pdf = safe_generate_metrics_report(rows, timeline_data, final_filename, "pdf")
-            job_status[job_id]["report_steps_completed"] = 2
-            job_status[job_id]["report_progress_percent"] = 100
+            def step_done(step):
+                job_status[job_id]["report_steps_completed"] = step
+                job_status[job_id]["report_progress_percent"] = step * 100 // 4
+
+            # Step 1: CSV, one row per tracked object
+            objects = aggregator.objects()
+            output_objects_csv = os.path.join(REPORTS_DIR, f"{base_name}_objects.csv")
+            pd.DataFrame(objects).to_csv(output_objects_csv, index=False)
+            step_done(1)
+
+            # Step 2: CSV, one row per detection per frame (opt-in)
+            output_csv = None
+            if rows is not None:
+                output_csv = os.path.join(REPORTS_DIR, f"{base_name}_metrics.csv")
+                rows.to_csv(output_csv)
+            step_done(2)
+
+            # Step 3: JSON (the objects, plus the rows when kept, for API consumers)
+            output_json = os.path.join(REPORTS_DIR, f"{base_name}_metrics.json")
+            header = json.dumps({"filename": final_filename, "model_used": model_file, "objects": objects},
+                                default=lambda v: v.item() if hasattr(v, "item") else str(v))
+            with open(output_json, "w") as f:
+                if rows is None:
+                    f.write(header)
+                else:
+                    # Rows are serialised column-wise by pandas, not as per-row dicts
+                    f.write(header[:-1] + ', "rows": ' + rows.to_dataframe().to_json(orient="records") + "}")
+            step_done(3)
+
+            # Step 4: PDF, built from the object summaries
+            output_pdf = os.path.join(REPORTS_DIR, f"{base_name}_metrics.pdf")
+            if not generate_objects_pdf_report(objects, aggregator.class_totals(), timeline_data,
+                                               output_pdf, final_filename):
+                output_pdf = None
+            step_done(4)
             job_status[job_id]["report_status"] = "done"
 
-            reports = {"csv": f"/video/reports/{os.path.basename(output_csv)}"}
+            reports = {
+                "objects_csv": f"/video/reports/{os.path.basename(output_objects_csv)}",
+                "json": f"/video/reports/{os.path.basename(output_json)}",
+            }
+            if output_csv:
+                reports["csv"] = f"/video/reports/{os.path.basename(output_csv)}"
             if output_pdf:
                 reports["pdf"] = f"/video/reports/{os.path.basename(output_pdf)}"
             job_status[job_id]["reports"] = reports
@@ -1038,46 +1654,31 @@ def process_video_job(job_id, filename, upload_path, processed_path, current_use
         except Exception as e:
             job_status[job_id]["report_status"] = "error"
             job_status[job_id]["report_error"] = str(e)
+            return
+
+        if cache_key:
+            # Only what this job published; older files of the same name are left out
+            status = dict(job_status[job_id])
+            outputs = [output_csv, output_objects_csv, output_json, output_pdf]
+            if status.get("processed_video_url"):
+                outputs.append(final_path)
+            if status.get("proxy_video_url"):
+                outputs.append(proxy_path)
+            if status.get("overlay_url"):
+                outputs.append(overlay_path)
+            if status.get("poster_url"):
+                outputs.append(poster_path)
+            if status.get("thumbnails_vtt_url"):
+                outputs += [sprite_path, sprite_vtt_path]
+            if status.get("hls_playlist_url"):
+                outputs.append(hls_dir)
+            try:
+                result_cache.store(cache_key, base_name, status, outputs)
+            except Exception as cache_error:
+                print(f"⚠️ Storing the job in the result cache failed: {cache_error}")
 
     threading.Thread(target=generate_report_bg, daemon=True).start()
 
-    cap.release()
-    out.release()
-
-    # Convert AVI → MP4
-    subprocess.run(
-        ["ffmpeg", "-i", temp_processed_path, "-c:v", "libx264", "-y", final_path],
-        check=True
-    )
-    if os.path.exists(temp_processed_path):
-        os.remove(temp_processed_path)
-
-    # Reports
-    output_csv = os.path.join(REPORTS_DIR, f"{base_name}_metrics.csv")
-    pd.DataFrame(rows).to_csv(output_csv, index=False)
-
-    output_pdf = generate_metrics_report(rows, timeline_data, final_filename, "pdf")
-
-    reports = {"csv": f"/video/reports/{os.path.basename(output_csv)}"}
-    if output_pdf:
-        reports["pdf"] = f"/video/reports/{os.path.basename(output_pdf)}"
-
-    # Save DB record
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(videos)")
-        columns = [c[1] for c in cur.fetchall()]
-        if "share_id" not in columns:
-            cur.execute("ALTER TABLE videos ADD COLUMN share_id TEXT")
-        cur.execute(
-            "INSERT INTO videos (email, filename, timeline_data, upload_date, model_used, has_metrics, share_id) "
-            "VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?)",
-            (current_user, final_filename, json.dumps(timeline_data) if timeline_data else None, model_file, True, share_id)
-        )
-        conn.commit()
-
-
-
 
 
 
@@ -1088,6 +1689,8 @@ def cancel_video_job(job_id: str):
     with job_cancel_lock:
         job_cancel_flags[job_id] = True
         job_status[job_id] = {"status": "cancelled"}
+    # Workers pick the cancellation up from the queue
+    job_queue.cancel(job_id)
     return {"status": "cancelled"}
 
 def parse_srt(srt_content: bytes):
@@ -1115,14 +1718,88 @@ def parse_srt(srt_content: bytes):
         return [] # Return empty list on parsing error
 
 
+def _result_cache_settings():
+    """Server-side settings that change what a job produces, for the result cache key.
+       Workers are assumed to run with the same environment as the API."""
+    return {
+        "inference_backend": model_registry.INFERENCE_BACKEND,
+        "tracker": VIDEO_TRACKER,
+        "default_stride": INFERENCE_STRIDE,
+        "stride_motion_threshold": keyframe_stride.STRIDE_MOTION_THRESHOLD,
+        "default_dedup_threshold": DEDUP_THRESHOLD,
+        "default_segments": VIDEO_SEGMENTS,
+        "metrics_geometry": metrics_geometry.METRICS_GEOMETRY,
+        "river_distance_engine": metrics_geometry.RIVER_DISTANCE_ENGINE,
+        "buffer_reuse_iou": metrics_geometry.BUFFER_REUSE_IOU,
+        "buffer_simplify_px": metrics_geometry.BUFFER_SIMPLIFY_PX,
+        "mask_alpha": frame_render.MASK_ALPHA,
+        "overlay_simplify_px": overlay_track.OVERLAY_SIMPLIFY_PX,
+        "video_encoder": video_encoding.VIDEO_ENCODER,
+        "x264": (video_encoding.X264_PRESET, video_encoding.X264_CRF),
+        "proxy": (video_encoding.PROXY_VIDEO_HEIGHT, video_encoding.PROXY_X264_PRESET, video_encoding.PROXY_X264_CRF),
+        "hls": (video_encoding.HLS_VIDEO_HEIGHT, video_encoding.HLS_SEGMENT_SECONDS),
+        "poster": (video_previews.POSTER_POSITION, video_previews.POSTER_WIDTH),
+        "sprites": (video_previews.SPRITE_INTERVAL_S, video_previews.SPRITE_MAX_TILES,
+                    video_previews.SPRITE_TILE_WIDTH, video_previews.SPRITE_COLUMNS),
+    }
+
+
+def _lookup_result_cache(job_id, payload, content_hash):
+    """Answer a video upload from the result cache (see result_cache.py) when possible.
+       On a hit the cached outputs are published under the upload's name, the job is
+       recorded as done and (key, True) is returned; otherwise (key or None, False)."""
+    if not result_cache.enabled():
+        return None, False
+    filename, model_file = payload["filename"], payload["model_file"]
+    model_path = os.path.join("models", model_file) if model_file else DEFAULT_MODEL_PATH
+    if not os.path.exists(model_path):
+        model_path = DEFAULT_MODEL_PATH
+    try:
+        params = {k: payload[k] for k in ("timeline_data", "model_file", "stride", "adaptive_stride",
+                                          "segments", "dedup_threshold", "metrics_only", "profile",
+                                          "overlay", "frame_rows")}
+        params["settings"] = _result_cache_settings()
+        cache_key = result_cache.cache_key(content_hash, result_cache.file_sha256(model_path), params)
+        cached = result_cache.restore(cache_key, os.path.splitext(filename)[0])
+    except Exception as cache_error:
+        print(f"⚠️ Result cache lookup failed: {cache_error}")
+        return None, False
+    if not cached:
+        return cache_key, False
+
+    print(f"♻️ Result cache hit for {filename}, skipping processing")
+    timeline = payload["timeline_data"]
+    share_id = str(uuid.uuid4())
+    cached.update(share_id=share_id, share_url=f"/video/share/{share_id}", timeline=timeline, cache_hit=True)
+    final_filename = (cached.get("processed_video_url") or "").split("/")[-1] or \
+        f"{os.path.splitext(filename)[0]}.mp4"
+    _record_video(payload["current_user"], final_filename, timeline, model_file, share_id, payload["profile"],
+                  has_video=bool(cached.get("processed_video_url")))
+    job_status[job_id] = cached
+    job_queue.record_done(job_id, payload, cached)
+    return cache_key, True
+
+
 @router.post("/upload/")
 async def upload_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     srt: Optional[UploadFile] = None,
     current_user: str = Depends(get_current_user),
-    model_file: Optional[str] = None
+    model_file: Optional[str] = None,
+    stride: Optional[int] = None,
+    adaptive_stride: bool = False,
+    segments: Optional[int] = None,
+    dedup_threshold: Optional[float] = None,
+    metrics_only: bool = False,
+    profile: Optional[str] = None,
+    overlay: bool = False,
+    frame_rows: bool = False
 ):
+    try:
+        profile = get_profile(profile)["name"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     filename = sanitize_filename(file.filename)
     upload_path = os.path.join(UPLOAD_DIR, filename)
     processed_path = os.path.join(PROCESSED_DIR, filename)
@@ -1138,13 +1815,39 @@ async def upload_file(
 
     # --- VIDEO HANDLING ---
     if is_video(file.filename):
+        # Hash while streaming to disk, for the result cache (see result_cache.py)
+        content_hash = hashlib.sha256()
         with open(upload_path, "wb") as f:
-            f.write(await file.read())
+            while chunk := await file.read(result_cache.HASH_CHUNK_BYTES):
+                f.write(chunk)
+                content_hash.update(chunk)
 
-        # ✅ Pass timeline instead of None
-        background_tasks.add_task(
-            process_video_job, job_id, filename, upload_path, processed_path, current_user, timeline, model_file
-        )
+        payload = {
+            "filename": filename,
+            "upload_path": upload_path,
+            "processed_path": processed_path,
+            "current_user": current_user,
+            "timeline_data": timeline,
+            "model_file": model_file,
+            "stride": stride,
+            "adaptive_stride": adaptive_stride,
+            "segments": segments,
+            "dedup_threshold": dedup_threshold,
+            "metrics_only": metrics_only,
+            "profile": profile,
+            "overlay": overlay,
+            "frame_rows": frame_rows,
+        }
+
+        # Hashing the model and linking cached files block; keep them off the event loop
+        cache_key, hit = await run_in_threadpool(_lookup_result_cache, job_id, payload,
+                                                 content_hash.hexdigest())
+        if hit:
+            return {"status": "done", "job_id": job_id, "cache_hit": True}
+        payload["cache_key"] = cache_key
+
+        # ✅ Pass timeline instead of None; a worker process picks the job up (see worker.py)
+        job_queue.enqueue(job_id, payload)
         return {"status": "processing", "job_id": job_id}
 
     # --- IMAGE HANDLING ---
@@ -1157,9 +1860,9 @@ async def upload_file(
         if timeline and len(timeline) > 0:
             location = {"lat": timeline[0]["lat"], "lon": timeline[0]["lon"]}
 
-        # Run YOLO detection on image
+        # Run YOLO detection on image (CPU, shared cached model)
         try:
-            results = model(processed_path)
+            results = get_model(DEFAULT_MODEL_PATH, device="cpu")(processed_path)
             objects = []
             for r in results:
                 for box in r.boxes:
@@ -1184,13 +1887,14 @@ async def upload_file(
 
 @router.get("/status/{job_id}")
 def get_job_status(job_id: str):
-    status = job_status.get(job_id)
+    # Workers publish status to the job queue; fall back to this process's store
+    status = job_queue.load_status(job_id) or job_status.get(job_id)
     if not status:
         return {"status": "not_found"}
 
     # ✅ Ensure reports field is included if available
     if status.get("status") == "done":
-        if "reports" not in status:
+        if "reports" not in status and status.get("processed_video_url"):
             base_filename = os.path.splitext(status["processed_video_url"].split("/")[-1])[0]
             reports = {}
             csv_path = os.path.join(REPORTS_DIR, f"{base_filename}_metrics.csv")
@@ -1211,6 +1915,13 @@ def get_processed_video(filename: str):
     if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Processed video not found.")
 
+    if filename.endswith(".json.gz"):
+        # Overlay file: the browser inflates it transparently
+        return FileResponse(path, media_type="application/json", headers={"Content-Encoding": "gzip"})
+    if filename.endswith((".jpg", ".vtt")):
+        # Poster, seek sprite sheet and its WebVTT index
+        return FileResponse(path, media_type="image/jpeg" if filename.endswith(".jpg") else "text/vtt")
+
     ext = os.path.splitext(filename)[1].lower()
     if ext == ".mp4":
         media_type = "video/mp4"
@@ -1224,9 +1935,27 @@ def get_processed_video(filename: str):
     return FileResponse(path, media_type=media_type, filename=filename)
 
 
+@router.get("/live/{name}/{filename}")
+def get_live_stream_file(name: str, filename: str):
+    """Playlist, init segment and fMP4 segments of a job's HLS stream (live while
+       processing, VOD afterwards)."""
+    if name.startswith(".") or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Stream file not found.")
+    path = os.path.join(HLS_DIR, name, filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Stream file not found.")
+
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".m3u8":
+        # The live playlist changes with every new segment
+        return FileResponse(path, media_type="application/vnd.apple.mpegurl", headers={"Cache-Control": "no-cache"})
+    media_type = "video/iso.segment" if ext == ".m4s" else "video/mp4"
+    return FileResponse(path, media_type=media_type)
+
+
 @router.get("/reports/{filename}")
 def get_report_file(filename: str):
-    """Serve report files (CSV/PDF)."""
+    """Serve report files (CSV/PDF/JSON)."""
     path = os.path.join(REPORTS_DIR, filename)
     if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Report file not found.")
@@ -1235,6 +1964,8 @@ def get_report_file(filename: str):
         return FileResponse(path, media_type="text/csv", filename=filename)
     elif filename.endswith('.pdf'):
         return FileResponse(path, media_type="application/pdf", filename=filename)
+    elif filename.endswith('.json'):
+        return FileResponse(path, media_type="application/json", filename=filename)
     else:
         return FileResponse(path, filename=filename)
 
@@ -1260,11 +1991,16 @@ def get_user_videos(current_user: str = Depends(get_current_user)):
             cursor.execute("ALTER TABLE videos ADD COLUMN has_metrics BOOLEAN")
         if "share_id" not in columns:
             cursor.execute("ALTER TABLE videos ADD COLUMN share_id TEXT")
+        if "processing_profile" not in columns:
+            cursor.execute("ALTER TABLE videos ADD COLUMN processing_profile TEXT")
+        if "has_video" not in columns:
+            cursor.execute("ALTER TABLE videos ADD COLUMN has_video BOOLEAN")
 
         try:
             cursor.execute(
                 """
-                SELECT filename, timeline_data, upload_date, model_used, has_metrics, share_id
+                SELECT filename, timeline_data, upload_date, model_used, has_metrics, share_id, processing_profile,
+                       has_video
                 FROM videos WHERE email = ? 
                 ORDER BY upload_date DESC
                 """,
@@ -1275,7 +2011,7 @@ def get_user_videos(current_user: str = Depends(get_current_user)):
             # fallback for older dbs without all fields
             cursor.execute("SELECT filename FROM videos WHERE email = ?", (current_user,))
             old_rows = cursor.fetchall()
-            rows = [(row[0], None, None, None, False, None) for row in old_rows]
+            rows = [(row[0], None, None, None, False, None, None, None) for row in old_rows]
 
     videos = []
     for row in rows:
@@ -1284,6 +2020,9 @@ def get_user_videos(current_user: str = Depends(get_current_user)):
         upload_date = row[2] if len(row) > 2 else None
         model_used = row[3] if len(row) > 3 else None
         has_metrics = row[4] if len(row) > 4 else False
+        processing_profile = row[6] if len(row) > 6 else None
+        # NULL for rows from before metrics-only jobs, which all have a video
+        has_video = row[7] is None or bool(row[7]) if len(row) > 7 else True
 
         # Parse timeline data if available
         timeline_data = None
@@ -1293,15 +2032,17 @@ def get_user_videos(current_user: str = Depends(get_current_user)):
             except json.JSONDecodeError:
                 timeline_data = None
 
-        # Find the actual processed file with UUID prefix if it exists
-        processed_file = None
-        processed_dir = os.path.join(PROCESSED_DIR)
-        for f in os.listdir(processed_dir):
-            # Match files that end with the original filename (case-insensitive)
-            if f.lower().endswith(filename.lower()):
-                processed_file = f
-                break
-        processed_url = f"/video/processed/{processed_file}" if processed_file else f"/video/processed/{filename}"
+        # Find the actual processed file with UUID prefix if it exists (metrics-only jobs have none)
+        processed_url = None
+        if has_video:
+            processed_file = None
+            processed_dir = os.path.join(PROCESSED_DIR)
+            for f in os.listdir(processed_dir):
+                # Match files that end with the original filename (case-insensitive)
+                if f.lower().endswith(filename.lower()):
+                    processed_file = f
+                    break
+            processed_url = f"/video/processed/{processed_file}" if processed_file else f"/video/processed/{filename}"
 
         video_info = {
             "filename": filename,
@@ -1309,20 +2050,40 @@ def get_user_videos(current_user: str = Depends(get_current_user)):
             "timeline": timeline_data,
             "upload_date": upload_date,
             "model_used": model_used,
-            "has_metrics": has_metrics
+            "has_metrics": has_metrics,
+            "metrics_only": not has_video,
+            "processing_profile": processing_profile
         }
+        overlay_filename = f"{os.path.splitext(filename)[0]}_overlay.json.gz"
+        if os.path.exists(os.path.join(PROCESSED_DIR, overlay_filename)):
+            video_info["overlay_url"] = f"/video/processed/{overlay_filename}"
+        proxy_filename = f"{os.path.splitext(filename)[0]}_proxy.mp4"
+        if os.path.exists(os.path.join(PROCESSED_DIR, proxy_filename)):
+            video_info["proxy_url"] = f"/video/processed/{proxy_filename}"
+        for key, suffix in (("poster_url", "_poster.jpg"), ("thumbnails_vtt_url", "_sprite.vtt")):
+            preview_filename = f"{os.path.splitext(filename)[0]}{suffix}"
+            if os.path.exists(os.path.join(PROCESSED_DIR, preview_filename)):
+                video_info[key] = f"/video/processed/{preview_filename}"
+        if os.path.exists(os.path.join(HLS_DIR, os.path.splitext(filename)[0], "index.m3u8")):
+            video_info["hls_url"] = f"/video/live/{os.path.splitext(filename)[0]}/index.m3u8"
 
         # Check for report files if has_metrics is True
         if has_metrics:
             base_filename = os.path.splitext(filename)[0]
             csv_path = os.path.join(REPORTS_DIR, f"{base_filename}_metrics.csv")
             pdf_path = os.path.join(REPORTS_DIR, f"{base_filename}_metrics.pdf")
+            json_path = os.path.join(REPORTS_DIR, f"{base_filename}_metrics.json")
 
             reports = {}
             if os.path.exists(csv_path):
                 reports['csv'] = f"/video/reports/{base_filename}_metrics.csv"
             if os.path.exists(pdf_path):
                 reports['pdf'] = f"/video/reports/{base_filename}_metrics.pdf"
+            if os.path.exists(json_path):
+                reports['json'] = f"/video/reports/{base_filename}_metrics.json"
+            objects_path = os.path.join(REPORTS_DIR, f"{base_filename}_objects.csv")
+            if os.path.exists(objects_path):
+                reports['objects_csv'] = f"/video/reports/{base_filename}_objects.csv"
 
             if reports:
                 video_info['reports'] = reports
@@ -1351,15 +2112,14 @@ def clear_user_history(current_user: str = Depends(get_current_user)):
             if os.path.exists(processed_file):
                 os.remove(processed_file)
             
-            # Delete report files
+            # Delete everything published next to the video, reports included
             base_filename = os.path.splitext(filename)[0]
-            csv_file = os.path.join(REPORTS_DIR, f"{base_filename}_metrics.csv")
-            pdf_file = os.path.join(REPORTS_DIR, f"{base_filename}_metrics.pdf")
-            
-            if os.path.exists(csv_file):
-                os.remove(csv_file)
-            if os.path.exists(pdf_file):
-                os.remove(pdf_file)
+            for directory, suffix in VIDEO_ARTIFACTS:
+                path = os.path.join(directory, f"{base_filename}{suffix}")
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
                 
         return {"status": "success"}
     except Exception as e:
@@ -1384,6 +2144,12 @@ def get_available_models():
     
     return {"models": available_models}
 
+
+@router.get("/cache/stats")
+def get_result_cache_stats():
+    """Result cache size and hit rate (see result_cache.py)."""
+    return result_cache.stats()
+
 @router.get("/stats")
 def get_dashboard_stats(current_user: str = Depends(get_current_user)):
     """Get dashboard statistics for the current user"""
@@ -1395,9 +2161,8 @@ def get_dashboard_stats(current_user: str = Depends(get_current_user)):
             cursor.execute("SELECT COUNT(*) FROM videos WHERE email = ?", (current_user,))
             total_videos = cursor.fetchone()[0]
 
-        # Count currently processing videos (jobs in progress)
-        processing_count = sum(1 for status in job_status.values() 
-                             if status.get("status") == "processing")
+        # Count currently processing videos (queued or running jobs)
+        processing_count = job_queue.count_active()
 
         # Calculate total duration of processed videos
         total_duration_seconds = 0
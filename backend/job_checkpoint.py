@@ -0,0 +1,104 @@
+# job_checkpoint.py
+"""Resumable checkpoints for long process_video_job runs.
+
+A job is processed in chunks of CHECKPOINT_INTERVAL_FRAMES frames.  Each
+finished chunk leaves behind its encoded MP4 part, any other per-chunk parts
+(proxy MP4, overlay file) keyed by kind and, for jobs that keep per-frame
+rows, its detection rows (a DetectionBuffer saved as .npz).  state.json
+records how far the job got and the per-object track summaries so far
+(see track_aggregator.py).  When a restarted worker
+picks the same job up again it resumes at the first unfinished chunk;
+the parts are joined with ffmpeg's concat demuxer at the end.
+"""
+import json
+import os
+import shutil
+
+from detection_buffer import DetectionBuffer
+
+CHECKPOINT_DIR = "static/checkpoints"
+CHECKPOINT_INTERVAL_FRAMES = int(os.getenv("CHECKPOINT_INTERVAL_FRAMES", "1800"))  # 0 disables checkpointing
+
+
+class JobCheckpoint:
+    """On-disk progress of one job: finished frame range, encoded parts and object summaries."""
+
+    def __init__(self, job_id, signature):
+        self.dir = os.path.join(CHECKPOINT_DIR, job_id)
+        self.state_path = os.path.join(self.dir, "state.json")
+        self.signature = signature
+        self.state = {"signature": signature, "next_frame": 0, "chunks": [], "counts": {}, "tracks": []}
+
+    def load(self):
+        """Load saved progress if it belongs to the same input; returns next frame to process."""
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path) as f:
+                    saved = json.load(f)
+                if saved.get("signature") == self.signature and all(
+                        (c["video"] is None or os.path.exists(c["video"]))
+                        and (c["rows"] is None or c["rows"].endswith(".npz") and os.path.exists(c["rows"]))
+                        and all(os.path.exists(p) for p in c.get("parts", {}).values())
+                        for c in saved["chunks"]):
+                    self.state = saved
+                    print(f"[CHECKPOINT] Resuming at frame {saved['next_frame']} ({len(saved['chunks'])} chunks done)")
+                else:
+                    print("[CHECKPOINT] Discarding checkpoint that does not match this job")
+                    self.clear()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Unreadable checkpoint, starting over: {e}")
+                self.clear()
+        os.makedirs(self.dir, exist_ok=True)
+        return self.state["next_frame"]
+
+    def next_chunk_path(self):
+        return os.path.join(self.dir, f"chunk_{len(self.state['chunks']):04d}.mp4")
+
+    def next_part_path(self, kind, ext):
+        return os.path.join(self.dir, f"{kind}_{len(self.state['chunks']):04d}{ext}")
+
+    def commit(self, next_frame, video_path, tracks, counts=None, parts=None, rows=None):
+        """Record a finished chunk (`video_path` is None for metrics-only and overlay jobs;
+           `tracks` is the job's TrackAggregator.state() so far; `parts` maps a kind such as
+           "proxy" to that chunk's file, None entries are skipped; `rows` is the chunk's
+           DetectionBuffer when the job keeps per-frame rows).  The state file is replaced atomically."""
+        index = len(self.state["chunks"])
+        rows_path = None
+        if rows is not None:
+            rows_path = os.path.join(self.dir, f"rows_{index:04d}.npz")
+            rows.save(rows_path)
+        parts = {kind: path for kind, path in (parts or {}).items() if path}
+        self.state["chunks"].append({"video": video_path, "rows": rows_path, "parts": parts,
+                                     "end_frame": next_frame})
+        self.state["next_frame"] = next_frame
+        self.state["tracks"] = tracks
+        for key, value in (counts or {}).items():
+            self.state["counts"][key] = self.state["counts"].get(key, 0) + value
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def chunk_videos(self):
+        return [c["video"] for c in self.state["chunks"] if c["video"]]
+
+    def chunk_parts(self, kind):
+        return [c["parts"][kind] for c in self.state["chunks"] if kind in c.get("parts", {})]
+
+    @property
+    def counts(self):
+        return dict(self.state["counts"])
+
+    @property
+    def tracks(self):
+        return self.state.get("tracks", [])
+
+    def rows(self):
+        """Per-frame rows of the finished chunks, or None when the job does not keep them."""
+        if any(c["rows"] is None for c in self.state["chunks"]):
+            return None
+        return DetectionBuffer.concat([DetectionBuffer.load(c["rows"]) for c in self.state["chunks"]])
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
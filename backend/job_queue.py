@@ -0,0 +1,199 @@
+# job_queue.py
+"""Durable SQLite job queue for video processing.
+
+The API process only enqueues jobs and reads their status; worker
+processes (see worker.py) claim queued jobs, run them and write progress
+back here.  Jobs survive restarts: anything left "running" by a dead
+worker is requeued once its heartbeat goes stale, and failed jobs are
+retried with backoff up to max_attempts.
+"""
+import json
+import os
+import sqlite3
+import time
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_S = float(os.getenv("JOB_RETRY_BACKOFF_S", "30"))
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", "120"))  # running job with no heartbeat for this long is requeued
+
+ACTIVE_STATES = ("queued", "running")
+
+
+def _connect():
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def init_db():
+    with _connect() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                worker TEXT,
+                status TEXT,
+                error TEXT,
+                available_at REAL NOT NULL,
+                heartbeat_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, available_at)")
+
+
+def enqueue(job_id, payload, kind="video", max_attempts=None):
+    """Add a job to the queue and publish an initial 'queued' status."""
+    now = time.time()
+    status = {"status": "queued", "frames_processed": 0, "progress_percent": 0}
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, payload, state, max_attempts, status, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), max_attempts or JOB_MAX_ATTEMPTS,
+             json.dumps(status), now, now, now)
+        )
+    return job_id
+
+
+def claim(worker_id, kinds=("video",)):
+    """Atomically take the oldest runnable job of one of `kinds`.
+       Returns (job_id, kind, payload, attempt) or None."""
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            f"SELECT id, kind, payload, attempts FROM jobs WHERE state = 'queued' "
+            f"AND kind IN ({', '.join('?' * len(kinds))}) AND available_at <= ? "
+            "ORDER BY created_at LIMIT 1",
+            (*kinds, now)
+        ).fetchone()
+        if not row:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET state = 'running', worker = ?, attempts = attempts + 1, "
+            "heartbeat_at = ?, updated_at = ? WHERE id = ?",
+            (worker_id, now, now, row[0])
+        )
+        conn.execute("COMMIT")
+        return row[0], row[1], json.loads(row[2]), row[3] + 1
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def complete(job_id):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET state = 'done', error = NULL, updated_at = ? WHERE id = ? AND state = 'running'",
+            (time.time(), job_id)
+        )
+
+
+def record_done(job_id, payload, status, kind="video"):
+    """Add a job that needs no worker (e.g. answered from the result cache) as already done."""
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, payload, state, status, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'done', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), json.dumps(status, default=str), now, now, now)
+        )
+    return job_id
+
+
+def fail(job_id, error):
+    """Record a failed attempt; requeue with backoff or mark the job failed for good."""
+    now = time.time()
+    with _connect() as conn:
+        row = conn.execute("SELECT attempts, max_attempts, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row or row[2] == "cancelled":
+            return False
+        attempts, max_attempts, _ = row
+        if attempts < max_attempts:
+            status = {"status": "queued", "retry_attempt": attempts, "last_error": str(error)}
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', worker = NULL, error = ?, status = ?, "
+                "available_at = ?, updated_at = ? WHERE id = ?",
+                (str(error), json.dumps(status), now + JOB_RETRY_BACKOFF_S * attempts, now, job_id)
+            )
+            return True
+        status = {"status": "error", "detail": str(error)}
+        conn.execute(
+            "UPDATE jobs SET state = 'failed', error = ?, status = ?, updated_at = ? WHERE id = ?",
+            (str(error), json.dumps(status), now, job_id)
+        )
+        return False
+
+
+def cancel(job_id):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET state = 'cancelled', status = ?, updated_at = ? WHERE id = ? AND state IN ('queued', 'running')",
+            (json.dumps({"status": "cancelled"}), time.time(), job_id)
+        )
+
+
+def is_cancelled(job_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return bool(row and row[0] == "cancelled")
+
+
+def heartbeat(job_ids):
+    if not job_ids:
+        return
+    now = time.time()
+    with _connect() as conn:
+        conn.executemany(
+            "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = 'running'",
+            [(now, job_id) for job_id in job_ids]
+        )
+
+
+def requeue_stale(stale_s=None):
+    """Put jobs whose worker stopped heartbeating back in the queue."""
+    cutoff = time.time() - (stale_s if stale_s is not None else JOB_STALE_S)
+    with _connect() as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET state = 'queued', worker = NULL, available_at = ?, updated_at = ? "
+            "WHERE state = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time(), time.time(), cutoff)
+        )
+        return cur.rowcount
+
+
+def save_status(job_id, status):
+    """Persist the job_status dict published by a worker."""
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND state IN ('running', 'done')",
+            (json.dumps(status, default=str), time.time(), job_id)
+        )
+
+
+def load_status(job_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if not row or not row[0]:
+        return None
+    return json.loads(row[0])
+
+
+def count_active():
+    with _connect() as conn:
+        row = conn.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE state IN ({', '.join('?' * len(ACTIVE_STATES))})",
+            ACTIVE_STATES
+        ).fetchone()
+    return row[0]
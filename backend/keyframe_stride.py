@@ -0,0 +1,136 @@
+# keyframe_stride.py
+"""Keyframe-stride inference support for process_video_job.
+
+The model only runs on keyframes.  KeyframeScheduler picks them either
+every N frames or, in adaptive mode, whenever the scene has moved enough
+since the last keyframe (capped at max_stride).  KeyframePropagator fills
+the frames in between by shifting the keyframe's boxes and masks with
+sparse Lucas-Kanade optical flow, producing ordinary ultralytics Results
+so the metrics and drawing code does not need to know the difference.
+"""
+import os
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+INFERENCE_STRIDE = int(os.getenv("INFERENCE_STRIDE", "1"))  # 1 = run the model on every frame
+STRIDE_MOTION_THRESHOLD = float(os.getenv("STRIDE_MOTION_THRESHOLD", "8.0"))  # mean abs diff (0-255) forcing a keyframe
+FLOW_WIDTH = 640  # frames are downscaled to this width for optical flow
+
+
+def motion_thumbnail(frame, size=64):
+    """Small blurred grayscale thumbnail used to measure scene change."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+    return small.astype(np.float32)
+
+
+class KeyframeScheduler:
+    """Decide which frames get full model inference."""
+
+    def __init__(self, stride=INFERENCE_STRIDE, adaptive=False, max_stride=None,
+                 motion_threshold=STRIDE_MOTION_THRESHOLD):
+        self.stride = max(1, int(stride))
+        self.adaptive = adaptive
+        self.max_stride = max(self.stride, int(max_stride or self.stride * 3))
+        self.motion_threshold = motion_threshold
+        self._since_key = None
+        self._key_thumb = None
+
+    def is_keyframe(self, frame):
+        if self.stride == 1 and not self.adaptive:
+            return True
+        if self._since_key is None:
+            return self._mark(frame)
+        self._since_key += 1
+        if self.adaptive:
+            thumb = motion_thumbnail(frame)
+            motion = float(np.mean(np.abs(thumb - self._key_thumb)))
+            if motion > self.motion_threshold or self._since_key >= self.max_stride:
+                return self._mark(frame, thumb)
+            return False
+        if self._since_key >= self.stride:
+            return self._mark(frame)
+        return False
+
+    def _mark(self, frame, thumb=None):
+        self._since_key = 0
+        if self.adaptive:
+            self._key_thumb = thumb if thumb is not None else motion_thumbnail(frame)
+        return True
+
+
+def _flow_gray(frame):
+    scale = min(1.0, FLOW_WIDTH / frame.shape[1])
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+def _shift_mask(mask, dx, dy):
+    """Translate a 2D mask by whole pixels, filling uncovered areas with zeros."""
+    shifted = np.zeros_like(mask)
+    h, w = mask.shape
+    dx, dy = int(round(dx)), int(round(dy))
+    if abs(dx) >= w or abs(dy) >= h:
+        return shifted
+    src = mask[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)]
+    shifted[max(0, dy):max(0, dy) + src.shape[0], max(0, dx):max(0, dx) + src.shape[1]] = src
+    return shifted
+
+
+class KeyframePropagator:
+    """Carry the last keyframe's detections forward to in-between frames."""
+
+    def __init__(self):
+        self.result = None
+        self._gray = None
+        self._scale = 1.0
+        self._points = None
+
+    def set_keyframe(self, frame, result):
+        self.result = result
+        self._gray, self._scale = _flow_gray(frame)
+        self._points = cv2.goodFeaturesToTrack(self._gray, maxCorners=400, qualityLevel=0.01, minDistance=8)
+
+    def propagate(self, frame):
+        """Return a Results object for `frame` derived from the last keyframe, or None."""
+        key = self.result
+        if key is None:
+            return None
+        if key.boxes is None or len(key.boxes) == 0:
+            return Results(orig_img=frame, path=key.path, names=key.names)
+
+        boxes = key.boxes.data.cpu().numpy().copy()
+        offsets = np.zeros((len(boxes), 2), dtype=np.float32)
+
+        if self._points is not None and len(self._points):
+            gray, _ = _flow_gray(frame)
+            moved, found, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None,
+                                                       winSize=(21, 21), maxLevel=3)
+            ok = found.reshape(-1) == 1
+            if ok.any():
+                src = self._points.reshape(-1, 2)[ok] / self._scale
+                flow = moved.reshape(-1, 2)[ok] / self._scale - src
+                global_shift = np.median(flow, axis=0)
+                for i, (x1, y1, x2, y2) in enumerate(boxes[:, :4]):
+                    inside = (src[:, 0] >= x1) & (src[:, 0] <= x2) & (src[:, 1] >= y1) & (src[:, 1] <= y2)
+                    offsets[i] = np.median(flow[inside], axis=0) if inside.sum() >= 3 else global_shift
+
+        boxes[:, [0, 2]] += offsets[:, :1]
+        boxes[:, [1, 3]] += offsets[:, 1:]
+
+        propagated = Results(orig_img=frame, path=key.path, names=key.names)
+        update = {"boxes": torch.from_numpy(boxes)}
+        if key.masks is not None:
+            masks = key.masks.data.cpu().numpy()
+            H, W = frame.shape[:2]
+            sx, sy = masks.shape[2] / W, masks.shape[1] / H
+            update["masks"] = torch.from_numpy(np.stack([
+                _shift_mask(m, dx * sx, dy * sy) for m, (dx, dy) in zip(masks, offsets)
+            ]))
+        propagated.update(**update)
+        return propagated
@@ -10,12 +10,15 @@ from fastapi.responses import JSONResponse
 
 import json
 import os
+import uuid
 from datetime import datetime
 
 # Assuming your routers are in these files
 from auth import router as auth_router
 from inference import router as inference_router
 from auth_utils import get_current_user
+from worker import start_worker_pool, stop_worker_pool
+import job_queue
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -170,6 +173,18 @@ def seed_default_model():
 create_profile_tables()
 seed_default_model()
 
+# Video jobs run in a separate worker pool; the API only enqueues them.
+# Set VIDEO_WORKERS=0 to run workers elsewhere with `python worker.py`.
+@app.on_event("startup")
+def start_video_workers():
+    app.state.video_workers = start_worker_pool()
+
+@app.on_event("shutdown")
+def stop_video_workers():
+    pool = getattr(app.state, "video_workers", None)
+    if pool:
+        stop_worker_pool(pool)
+
 # 4. Define a root endpoint for health checks
 @app.get("/")
 def root():
@@ -458,7 +473,11 @@ def upload_model_file(model_id: int, model_file: UploadFile = File(...), current
             )
             conn.commit()
         
-        return {"status": "success", "message": "Model file uploaded successfully"}
+        # Export to ONNX/OpenVINO once, in a worker, so CPU inference can use the graph backends
+        export_job_id = f"export-{uuid.uuid4()}"
+        job_queue.enqueue(export_job_id, {"model_path": file_path}, kind="export")
+        
+        return {"status": "success", "message": "Model file uploaded successfully", "export_job_id": export_job_id}
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,233 @@
+# metrics_geometry.py
+"""Per-detection mask geometry for the YOLO9 metrics.
+
+Segmentation masks come out of the model at inference resolution (e.g.
+384x640) while metrics are reported in frame pixels.  The "mask" engine
+finds contours, pixel area and centroid on the small mask and scales them
+analytically to the frame, so a 4K frame costs no more than a 640px one.
+The "full" engine is the original path that upsamples every mask to frame
+size with INTER_NEAREST first; it is kept as the reference.
+
+RiverDistanceField is the raster alternative to per-object shapely
+nearest_points for riverbank distances: one distanceTransform over the
+union of the frame's river masks labels every pixel with its nearest river
+pixel, so an object's distance and nearest bank point become an array
+lookup over its own mask pixels.
+
+BufferZoneCache keeps the river buffer zone of a job between frames: the
+river barely moves from one frame to the next, so the expensive
+buffer + unary_union is only redone when the river mask's IoU with the
+one the cached zone was built from drops below BUFFER_REUSE_IOU.
+
+frame_spatial_relations() answers the buffer-zone and nearest-river
+questions for all objects of a frame at once with shapely 2's array API
+and STRtree indexes, instead of one geometry at a time.
+
+Scaled coordinates map each mask pixel to the centre of the block of frame
+pixels it covers, so outlines agree with the full-resolution ones to within
+half a mask pixel (W / mask width / 2 frame pixels, plus half a frame pixel
+when the scale factor is not an integer) and areas to within the rounding
+of the nearest-neighbour upsampling.  test_metrics_geometry.py checks this.
+"""
+import os
+
+import cv2
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon
+from shapely.ops import unary_union
+
+METRICS_GEOMETRY = os.getenv("METRICS_GEOMETRY", "mask")  # "mask" (scaled from mask resolution) or "full"
+RIVER_DISTANCE_ENGINE = os.getenv("RIVER_DISTANCE_ENGINE", "shapely")  # "shapely" (exact polygons) or "raster"
+BUFFER_REUSE_IOU = float(os.getenv("BUFFER_REUSE_IOU", "0.95"))  # river mask IoU needed to reuse the last buffer zone
+BUFFER_SIMPLIFY_PX = float(os.getenv("BUFFER_SIMPLIFY_PX", "0"))  # simplify river outlines before buffering (0 = off)
+
+
+class MaskGeometry:
+    """Area, outline and centroid of one detection mask, in frame pixel coordinates."""
+
+    def __init__(self, mask, frame_size, engine=None):
+        engine = engine or METRICS_GEOMETRY
+        W, H = frame_size
+        mask = mask.astype(np.uint8)
+        mh, mw = mask.shape[:2]
+        if (mw, mh) == (W, H):
+            self._scale = None
+        elif engine == "full":
+            mask = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
+            self._scale = None
+        else:
+            self._scale = np.array([W / mw, H / mh])
+        self.mask = mask
+        self._centroid = None
+        self._polygon = False
+
+        scale_area = 1.0 if self._scale is None else float(self._scale[0] * self._scale[1])
+        self.area_px = np.count_nonzero(mask) * scale_area
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self._largest = max(range(len(contours)), key=lambda k: cv2.contourArea(contours[k])) if contours else None
+        self.contours = [self.to_frame(c.reshape(-1, 2)) for c in contours]
+
+    def to_frame(self, points):
+        """Map (x, y) points from mask pixels to frame pixels."""
+        points = points.astype(np.float64)
+        if self._scale is None:
+            return points
+        return (points + 0.5) * self._scale - 0.5
+
+    def from_frame(self, points):
+        """Inverse of to_frame: frame pixels to (fractional) mask pixels."""
+        points = np.asarray(points, dtype=np.float64)
+        if self._scale is None:
+            return points
+        return (points + 0.5) / self._scale - 0.5
+
+    @property
+    def polygon(self):
+        """Shapely polygon of the largest outer contour, or None (same rule as mask_to_polygon)."""
+        if self._polygon is False:
+            self._polygon = None
+            if self._largest is not None and len(self.contours[self._largest]) >= 3:
+                try:
+                    self._polygon = Polygon(self.contours[self._largest])
+                except Exception:
+                    pass
+        return self._polygon
+
+    @property
+    def draw_contours(self):
+        """Contours as int32 point arrays for cv2.drawContours / fillPoly."""
+        return [c.round().astype(np.int32).reshape(-1, 1, 2) for c in self.contours]
+
+    @property
+    def centroid(self):
+        """(x, y) centre of mass of the mask, or None for an empty mask."""
+        if self._centroid is None:
+            M = cv2.moments(self.mask, binaryImage=True)
+            if M["m00"] == 0:
+                return None
+            self._centroid = tuple(self.to_frame(np.array([M["m10"] / M["m00"], M["m01"] / M["m00"]])))
+        return self._centroid
+
+
+def frame_geometries(masks, frame_size, engine=None):
+    """MaskGeometry for every mask of one frame (masks: N x h x w array)."""
+    return [MaskGeometry(m, frame_size, engine) for m in masks]
+
+
+class BufferZoneCache:
+    """Per-job cache of the river buffer zone, reused while the river mask is stable."""
+
+    def __init__(self, iou_threshold=BUFFER_REUSE_IOU, simplify_px=BUFFER_SIMPLIFY_PX):
+        self.iou_threshold = iou_threshold
+        self.simplify_px = simplify_px
+        self.hits = 0
+        self.misses = 0
+        self._river = None
+        self._buffer_px = None
+        self._zone = None
+
+    def buffer_zone(self, river_geometries, river_polygons, buffer_px):
+        """Union of the river polygons buffered by `buffer_px`, from cache when possible."""
+        river = np.zeros_like(river_geometries[0].mask, dtype=bool)
+        for g in river_geometries:
+            river |= g.mask.astype(bool)
+
+        if (self._zone is not None and self._buffer_px == buffer_px
+                and self._river.shape == river.shape):
+            union = np.count_nonzero(river | self._river)
+            if union and np.count_nonzero(river & self._river) / union >= self.iou_threshold:
+                self.hits += 1
+                return self._zone
+
+        self.misses += 1
+        if self.simplify_px > 0:
+            river_polygons = [p.simplify(self.simplify_px, preserve_topology=True) for p in river_polygons]
+        self._zone = unary_union([p.buffer(buffer_px) for p in river_polygons])
+        self._river = river
+        self._buffer_px = buffer_px
+        return self._zone
+
+    def stats(self):
+        return {"buffer_cache_hits": self.hits, "buffer_cache_misses": self.misses}
+
+
+def frame_spatial_relations(polygons, centers, river_polygons, buffer_zone, want_distance):
+    """Buffer-zone membership and nearest riverbank points for every object of one frame.
+
+    polygons[i] is the object's polygon or None, in which case its centre
+    Point centers[i] is used (as the per-object code did).  Returns
+    (inside_buffer, nearest): a bool per object, and per object either
+    (object_point, bank_point) as Points or None where want_distance[i]
+    is false or there are no rivers."""
+    n = len(polygons)
+    has_poly = np.array([p is not None for p in polygons], dtype=bool)
+    geoms = np.array([p if p is not None else c for p, c in zip(polygons, centers)], dtype=object)
+
+    inside = np.ones(n, dtype=bool)
+    if buffer_zone is not None and not buffer_zone.is_empty and n:
+        inside[:] = False
+        tree = STRtree(shapely.get_parts(buffer_zone))
+        poly_idx = np.flatnonzero(has_poly)
+        point_idx = np.flatnonzero(~has_poly)
+        if len(poly_idx):
+            hits = tree.query(geoms[poly_idx], predicate="intersects")
+            inside[poly_idx[hits[0]]] = True
+        if len(point_idx):
+            hits = tree.query(geoms[point_idx], predicate="within")
+            inside[point_idx[hits[0]]] = True
+
+    nearest = [None] * n
+    wanted = np.flatnonzero(np.asarray(want_distance, dtype=bool))
+    if len(river_polygons) and len(wanted):
+        rivers = np.array(river_polygons, dtype=object)
+        pairs = STRtree(rivers).query_nearest(geoms[wanted], all_matches=False)
+        lines = shapely.shortest_line(geoms[wanted][pairs[0]], rivers[pairs[1]])
+        ends = shapely.get_coordinates(lines).reshape(-1, 2, 2)
+        for k, (start, end) in zip(wanted[pairs[0]], ends):
+            nearest[k] = (shapely.Point(start), shapely.Point(end))
+    return inside.tolist(), nearest
+
+
+class RiverDistanceField:
+    """Nearest river pixel for every mask pixel of one frame, from a single distanceTransform.
+
+    Built from the MaskGeometry of the frame's river detections; all
+    geometries of a frame share the same mask resolution."""
+
+    def __init__(self, river_geometries):
+        self._geom = river_geometries[0]
+        river = np.zeros_like(self._geom.mask)
+        for g in river_geometries:
+            river |= g.mask
+        self.empty = not river.any()
+        if self.empty:
+            return
+        # distanceTransform measures distance to the nearest zero pixel, so rivers are the zeros
+        _, labels = cv2.distanceTransformWithLabels(
+            (river == 0).astype(np.uint8), cv2.DIST_L2, cv2.DIST_MASK_5, labelType=cv2.DIST_LABEL_PIXEL)
+        ys, xs = np.nonzero(river)
+        lut = np.zeros((labels.max() + 1, 2), dtype=np.float64)
+        lut[labels[ys, xs]] = np.column_stack([xs, ys])
+        self._labels = labels
+        self._lut = lut
+
+    def nearest(self, geometry=None, point=None):
+        """Closest (distance_px, object_point, bank_point) in frame pixels for an object mask,
+           or for a single frame `point` when the object has no usable mask."""
+        if self.empty:
+            return None
+        if geometry is not None and geometry.mask.any():
+            ys, xs = np.nonzero(geometry.mask)
+            src = self._geom.to_frame(np.column_stack([xs, ys]))
+        else:
+            h, w = self._labels.shape
+            x, y = np.clip(np.round(self._geom.from_frame(point)), 0, [w - 1, h - 1]).astype(int)
+            xs, ys = np.array([x]), np.array([y])
+            src = np.array([point], dtype=np.float64)
+        dst = self._geom.to_frame(self._lut[self._labels[ys, xs]])
+        dists = np.hypot(dst[:, 0] - src[:, 0], dst[:, 1] - src[:, 1])
+        k = int(np.argmin(dists))
+        return float(dists[k]), tuple(src[k]), tuple(dst[k])
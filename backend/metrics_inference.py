@@ -1,11 +1,11 @@
 # metrics_inference.py
 import cv2
 import numpy as np
-import pandas as pd
 from shapely.geometry import Polygon, Point
 from shapely.ops import nearest_points, unary_union
-from ultralytics import YOLO
 import torch
+from model_registry import get_model
+from detection_buffer import DetectionBuffer, TRACK_COLUMNS
 
 
 # Color map for YOLO9 classes
@@ -66,7 +66,7 @@ def run_yolo9_metrics(video_path, output_video, output_csv,
     print(f"[DEBUG] run_yolo9_metrics called: video_path={video_path}, output_video={output_video}, model_path={model_path}")
     device = "cuda" if torch.cuda.is_available() else "cpu"
     try:
-        model = YOLO(model_path).to(device)
+        model = get_model(model_path, device, half=False)
         print(f"[DEBUG] YOLO model loaded: {model_path}")
     except Exception as e:
         print(f"[DEBUG] Failed to load YOLO model: {e}")
@@ -82,7 +82,7 @@ def run_yolo9_metrics(video_path, output_video, output_csv,
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     writer = cv2.VideoWriter(output_video, fourcc, fps, (W, H))
 
-    rows, seen_ids = [], set()
+    rows, seen_ids = DetectionBuffer(TRACK_COLUMNS), set()
     frame_idx = 0
 
     # ✅ maintain counts for summary bar
@@ -139,19 +139,11 @@ def run_yolo9_metrics(video_path, output_video, output_csv,
                 seen_ids.add(obj_id)
                 summary_counts[cls_name] += 1
 
-            row = {
-                "id": obj_id,
-                "class": cls_name,
-                "frame": frame_idx,
-                "time_s": round(frame_idx / fps, 3),
-                "x1": x1,
-                "y1": y1,
-                "x2": x2,
-                "y2": y2,
-                "summary_counts": dict(summary_counts)  # snapshot
-            }
             print(f"[METRIC] Detection: class={cls_name}, frame={frame_idx}, time={round(frame_idx / fps, 3)}s, bbox=({x1},{y1},{x2},{y2}), id={obj_id}")
-            rows.append(row)
+            rows.append(id=obj_id, frame=frame_idx, time_s=round(frame_idx / fps, 3),
+                        x1=x1, y1=y1, x2=x2, y2=y2,
+                        # running unique count of this class, instead of a snapshot of every class per row
+                        class_count=summary_counts[cls_name], **{"class": cls_name})
 
         # --- Top summary bar ---
         summary_text = " | ".join([f"{cls}: {summary_counts[cls]}" for cls in summary_counts])
@@ -176,13 +168,11 @@ def run_yolo9_metrics(video_path, output_video, output_csv,
     # --- save CSV ---
 
     print(f"[DEBUG] Total rows collected for report: {len(rows)}")
-    if not rows:
+    if not len(rows):
         print("[WARNING] No metrics were collected from the processed video. The CSV will be empty.")
     else:
-        print(f"[DEBUG] Example row: {rows[0]}")
-    df = pd.DataFrame(rows)
-    print(f"[DEBUG] DataFrame columns: {df.columns.tolist()}")
-    df.to_csv(output_csv, index=False)
+        print(f"[DEBUG] Example row: {next(rows.iter_rows())}")
+    rows.to_csv(output_csv)
     print(f"[DEBUG] CSV saved to: {output_csv}")
 
     if job_id and job_status_dict:
@@ -0,0 +1,273 @@
+# model_registry.py
+"""Process-wide cache of loaded YOLO models.
+
+Models are keyed by (weights path, file mtime, device, precision) so a
+re-uploaded weights file is picked up automatically, and the least
+recently used models are evicted once the cache grows past
+MODEL_CACHE_MAX_MB.  Shared by the video job path, the image path and
+metrics_inference.run_yolo9_metrics.
+
+Besides eager PyTorch, models can run on an exported CPU graph
+(INFERENCE_BACKEND=onnx or openvino).  export_model() writes the exported
+artifacts next to the .pt file when a model is uploaded and keeps them
+only if their detections (classes, boxes and masks) match the .pt model
+within tolerance on representative frames: EXPORT_PARITY_SAMPLE (an image
+or video), else frames from the most recent upload.  Frames on which
+neither model detects anything prove nothing; an export with no
+detections on any sample frame is discarded as unverified.  get_model()
+falls back to the .pt weights when no valid export exists.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from ultralytics import YOLO
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+MODEL_CACHE_MAX_MB = float(os.getenv("MODEL_CACHE_MAX_MB", "2048"))
+DEFAULT_MODEL_PATH = "models/best.pt"
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")  # torch | onnx | openvino
+MODEL_EXPORT_FORMATS = [f.strip() for f in os.getenv("MODEL_EXPORT_FORMATS", "onnx").split(",") if f.strip()]
+EXPORT_PARITY_TOLERANCE_PX = float(os.getenv("EXPORT_PARITY_TOLERANCE_PX", "4.0"))
+EXPORT_PARITY_MASK_IOU = float(os.getenv("EXPORT_PARITY_MASK_IOU", "0.85"))  # min IoU of matched masks
+EXPORT_PARITY_SAMPLE = os.getenv("EXPORT_PARITY_SAMPLE", "")  # image or video; empty = latest upload
+EXPORT_PARITY_FRAMES = int(os.getenv("EXPORT_PARITY_FRAMES", "5"))  # frames sampled from a video
+UPLOAD_DIR = "static/uploads"  # as in inference.py
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+_cache = OrderedDict()  # key -> {"model": YOLO, "size_mb": float}
+_lock = threading.RLock()
+_device = None
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def select_device():
+    """Pick CUDA when it actually works, otherwise CPU. Probed once per process."""
+    global _device
+    if _device is None:
+        _device = "cpu"
+        if torch and torch.cuda.is_available():
+            try:
+                _ = torch.tensor([1.0]).cuda() + 1
+                _device = "cuda"
+                print("✅ CUDA available, using GPU")
+            except Exception as e:
+                print(f"⚠️ CUDA test failed, fallback to CPU: {e}")
+    return _device
+
+
+def _model_size_mb(model, path):
+    """Parameter memory of a loaded model, falling back to the weights file size."""
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters()) / 1e6
+    except Exception:
+        return os.path.getsize(path) / 1e6
+
+
+def _evict(budget_mb, keep):
+    total = sum(entry["size_mb"] for entry in _cache.values())
+    while total > budget_mb and len(_cache) > 1:
+        key = next(iter(_cache))
+        if key == keep:
+            break
+        entry = _cache.pop(key)
+        total -= entry["size_mb"]
+        _stats["evictions"] += 1
+        print(f"[MODEL CACHE] Evicted {key[0]} ({key[2]}, {key[3]})")
+
+
+def exported_path(path, backend):
+    """Where ultralytics writes the `backend` export of a .pt file."""
+    stem = os.path.splitext(path)[0]
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+
+def _resolve_backend(path, backend):
+    """Exported artifact for `backend` if present and newer than the weights, else the .pt path."""
+    if backend in (None, "torch"):
+        return path, "torch"
+    candidate = exported_path(path, backend)
+    if os.path.exists(candidate) and os.path.getmtime(candidate) >= os.path.getmtime(path):
+        return candidate, backend
+    print(f"[MODEL CACHE] No current {backend} export for {path}, using PyTorch weights")
+    return path, "torch"
+
+
+def get_model(path=DEFAULT_MODEL_PATH, device=None, half=None, backend=None):
+    """Return a loaded YOLO model for `path`, loading it only on a cache miss."""
+    device = device or select_device()
+    path, backend = _resolve_backend(path, backend or INFERENCE_BACKEND)
+    # Exported graphs keep the precision they were exported with
+    half = (device == "cuda") if half is None else half
+    half = half and backend == "torch"
+    precision = "fp16" if half else "fp32"
+    abs_path = os.path.abspath(path)
+    key = (abs_path, os.path.getmtime(abs_path), device, precision)
+
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return _cache[key]["model"]
+
+        _stats["misses"] += 1
+        # Drop entries for older versions of the same weights file
+        for stale in [k for k in _cache if k[0] == abs_path and k[1] != key[1]]:
+            del _cache[stale]
+
+        if backend == "torch":
+            model = YOLO(path)
+            model.to(device)
+            if half:
+                try:
+                    model.model.half()  # mixed precision for speed
+                    print("⚡ Half precision enabled for GPU inference")
+                except Exception:
+                    pass
+            size_mb = _model_size_mb(model, abs_path)
+        else:
+            model = YOLO(path)  # task comes from the export metadata
+            size_mb = _path_size_mb(abs_path)
+        _cache[key] = {"model": model, "size_mb": size_mb}
+        _evict(MODEL_CACHE_MAX_MB, keep=key)
+        return model
+
+
+def _path_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f))
+                   for root, _, files in os.walk(path) for f in files) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def parity_frames(sample=None, count=EXPORT_PARITY_FRAMES):
+    """BGR frames to compare an export on: `sample` (or EXPORT_PARITY_SAMPLE) when set,
+       else the most recently uploaded video or image.  Videos give `count` frames spread
+       over their length.  Empty when there is nothing to sample."""
+    import cv2
+
+    sample = sample or EXPORT_PARITY_SAMPLE
+    if not sample and os.path.isdir(UPLOAD_DIR):
+        uploads = [os.path.join(UPLOAD_DIR, f) for f in os.listdir(UPLOAD_DIR)]
+        uploads = [p for p in uploads if os.path.isfile(p) and (
+            p.lower().endswith(VIDEO_EXTENSIONS) or p.lower().endswith((".jpg", ".jpeg", ".png")))]
+        sample = max(uploads, key=os.path.getmtime, default=None)
+    if not sample or not os.path.exists(sample):
+        return []
+    if not sample.lower().endswith(VIDEO_EXTENSIONS):
+        image = cv2.imread(sample)
+        return [image] if image is not None else []
+
+    frames = []
+    cap = cv2.VideoCapture(sample)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    for i in range(count):
+        # Spread over the video, away from the (often static) first and last frames
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total * (i + 1) / (count + 1)))
+        ok, frame = cap.read()
+        if ok:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def _masks_match(ref, got, ref_order, got_order, min_iou):
+    if ref.masks is None or got.masks is None:
+        return ref.masks is None and got.masks is None
+    ref_masks = ref.masks.data.cpu().numpy()[ref_order] > 0.5
+    got_masks = got.masks.data.cpu().numpy()[got_order] > 0.5
+    if ref_masks.shape != got_masks.shape:
+        return False
+    inter = (ref_masks & got_masks).sum(axis=(1, 2))
+    union = (ref_masks | got_masks).sum(axis=(1, 2))
+    iou = inter / union.clip(min=1)
+    # Two empty masks agree
+    return bool(((iou >= min_iou) | (union == 0)).all())
+
+
+def check_export_parity(pt_model, exported_model, images, tolerance_px=EXPORT_PARITY_TOLERANCE_PX,
+                        min_mask_iou=EXPORT_PARITY_MASK_IOU):
+    """Compare both models on `images`: True when on every image they find the same
+       classes with boxes within `tolerance_px` and masks overlapping by `min_mask_iou`,
+       False on any mismatch, None (inconclusive) when neither detects anything at all."""
+    kwargs = dict(conf=0.25, iou=0.45, imgsz=640, device="cpu", verbose=False)
+    compared = 0
+    for image in images:
+        ref = pt_model.predict(image, **kwargs)[0]
+        got = exported_model.predict(image, **kwargs)[0]
+        if len(ref.boxes) != len(got.boxes):
+            return False
+        if len(ref.boxes) == 0:
+            continue
+        ref_xyxy, got_xyxy = ref.boxes.xyxy.cpu().numpy(), got.boxes.xyxy.cpu().numpy()
+        ref_order, got_order = ref_xyxy[:, 0].argsort(), got_xyxy[:, 0].argsort()
+        same_classes = (ref.boxes.cls.cpu().numpy()[ref_order] == got.boxes.cls.cpu().numpy()[got_order]).all()
+        max_diff = abs(ref_xyxy[ref_order] - got_xyxy[got_order]).max()
+        if not (same_classes and max_diff <= tolerance_px
+                and _masks_match(ref, got, ref_order, got_order, min_mask_iou)):
+            return False
+        compared += 1
+    return True if compared else None
+
+
+def export_model(path, formats=None, parity_sample=None):
+    """Export a .pt model once to each CPU graph format, keeping only exports that
+       match the PyTorch model within tolerance on parity_frames(`parity_sample`).
+       Returns {format: exported path}."""
+    import shutil
+
+    formats = formats or MODEL_EXPORT_FORMATS
+    frames = parity_frames(parity_sample)
+    if not frames:
+        print(f"⚠️ No parity sample for {path} (set EXPORT_PARITY_SAMPLE or upload a video first), not exporting")
+        return {}
+    pt_model = YOLO(path)
+    exported = {}
+    for fmt in formats:
+        try:
+            # dynamic axes so batched inference keeps working
+            out_path = pt_model.export(format=fmt, imgsz=640, dynamic=True, half=False, verbose=False)
+            candidate = YOLO(out_path, task=pt_model.task)
+            parity = check_export_parity(pt_model, candidate, frames)
+            if not parity:
+                if parity is None:
+                    print(f"⚠️ Neither model detects anything on the parity sample, "
+                          f"cannot verify the {fmt} export of {path}, discarding")
+                else:
+                    print(f"⚠️ {fmt} export of {path} does not match PyTorch output, discarding")
+                if os.path.isdir(out_path):
+                    shutil.rmtree(out_path, ignore_errors=True)
+                elif os.path.exists(out_path):
+                    os.remove(out_path)
+                continue
+            exported[fmt] = str(out_path)
+            print(f"[MODEL EXPORT] {path} → {out_path}")
+        except Exception as e:
+            print(f"⚠️ {fmt} export of {path} failed: {e}")
+    return exported
+
+
+def cache_info():
+    with _lock:
+        return {
+            **_stats,
+            "models": [
+                {"path": k[0], "device": k[2], "precision": k[3], "size_mb": round(v["size_mb"], 1)}
+                for k, v in _cache.items()
+            ],
+            "size_mb": round(sum(v["size_mb"] for v in _cache.values()), 1),
+            "budget_mb": MODEL_CACHE_MAX_MB,
+        }
+
+
+def clear():
+    with _lock:
+        _cache.clear()
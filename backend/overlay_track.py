@@ -0,0 +1,165 @@
+# overlay_track.py
+"""Client-side overlay files: detections stored next to the untouched video.
+
+In overlay output mode a job draws and re-encodes nothing.  The uploaded
+video is published as is under /video/processed/, and the per-frame
+detections, outlines and metrics go to a gzipped JSON file next to it
+(`<name>_overlay.json.gz`).  The frontend draws that over the video at
+playback time, so styling can change without re-running the job.
+
+File layout (version 1):
+
+  {"version": 1, "video": url, "fps": .., "width": .., "height": ..,
+   "frame_count": .., "colors": {class: "#rrggbb"},
+   "frames": [{"f": frame, "t": time_s, "tracked": true, "buffer": [outline, ...],
+               "d": [{"id", "c": class, "conf", "bbox": [x1, y1, x2, y2],
+                      "poly": [outline, ...], "area_m2", "bridge_length_m",
+                      "dist_m", "inside", "bank": [[x, y], [x, y]]}, ...]}, ...]}
+
+Outlines are [[x, y], ...] lists in frame pixels, simplified by
+OVERLAY_SIMPLIFY_PX.  Only frames with detections are listed, and keys
+without a value are left out.
+
+While a job runs, every processed frame range appends its frames to a part
+file (gzipped, one JSON object per line, see OverlayPartWriter);
+build_overlay() joins the parts into the final file.
+"""
+import gzip
+import json
+import os
+
+import cv2
+import numpy as np
+
+from metrics_geometry import frame_geometries
+
+OVERLAY_SIMPLIFY_PX = float(os.getenv("OVERLAY_SIMPLIFY_PX", "1.0"))  # outline simplification tolerance (0 = off)
+OVERLAY_VERSION = 1
+
+_SEPARATORS = (",", ":")
+
+
+def hex_color(bgr):
+    """'#rrggbb' for an OpenCV BGR colour tuple."""
+    b, g, r = (int(c) for c in bgr)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _outline(points):
+    points = np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+    if OVERLAY_SIMPLIFY_PX > 0 and len(points) > 3:
+        points = cv2.approxPolyDP(points, OVERLAY_SIMPLIFY_PX, True)
+    return points.reshape(-1, 2).tolist()
+
+
+def yolo9_frame_entry(record, id_offset=0):
+    """Overlay entry for a compute_metrics_for_yolo9 record (computed with render=True),
+       or None when the frame has no detections."""
+    if not record['detections']:
+        return None
+    tracked = record.get('tracked', False)
+    entry = {"f": record['frame'], "t": record['time_s']}
+    if tracked:
+        entry["tracked"] = True
+    outlines = record.get('render', {}).get('buffer_outlines')
+    if outlines:
+        entry["buffer"] = [_outline(o) for o in outlines]
+
+    detections = []
+    for det in record['detections']:
+        d = {"id": det['id'] + id_offset if tracked else det['id'], "c": det['class'],
+             "conf": det['confidence'], "bbox": det['bbox']}
+        extra = det.get('render') or {}
+        if extra.get('geometry') is not None:
+            d["poly"] = [_outline(c) for c in extra['geometry'].draw_contours if len(c) >= 3]
+        if det['area_m2']:
+            d["area_m2"] = det['area_m2']
+        if det['bridge_length_m']:
+            d["bridge_length_m"] = det['bridge_length_m']
+        if det['dist_from_riverbank_m'] is not None:
+            d["dist_m"] = det['dist_from_riverbank_m']
+        if det['inside_buffer']:
+            d["inside"] = True
+        if extra.get('bank_line') is not None:
+            d["bank"] = [list(p) for p in extra['bank_line']]
+        detections.append(d)
+    entry["d"] = detections
+    return entry
+
+
+def result_frame_entry(result, frame_idx, fps, frame_size, scale_factor=1.0, mask_classes=()):
+    """Overlay entry for a plain ultralytics result (non-YOLO9 models): boxes for every
+       detection, outlines for masks of `mask_classes` ids.  None without detections."""
+    if result is None or result.boxes is None or not len(result.boxes):
+        return None
+    boxes = (result.boxes.xyxy.cpu().numpy() / scale_factor).astype(int)
+    cls_ids = result.boxes.cls.cpu().numpy().astype(int)
+    confidences = result.boxes.conf.cpu().numpy()
+    tracked = result.boxes.id is not None
+    ids = result.boxes.id.cpu().numpy().astype(int) if tracked else range(len(cls_ids))
+    geometries = {}
+    if result.masks is not None:
+        masks = result.masks.data.cpu().numpy()
+        wanted = [i for i, c in enumerate(cls_ids) if c in mask_classes]
+        geometries = dict(zip(wanted, frame_geometries(masks[wanted], frame_size))) if wanted else {}
+
+    entry = {"f": frame_idx, "t": round(frame_idx / fps, 3)}
+    if tracked:
+        entry["tracked"] = True
+    detections = []
+    for i, obj_id in enumerate(ids):
+        d = {"id": int(obj_id), "c": result.names.get(int(cls_ids[i]), f"class_{cls_ids[i]}"),
+             "conf": round(float(confidences[i]), 3), "bbox": boxes[i].tolist()}
+        if i in geometries:
+            d["poly"] = [_outline(c) for c in geometries[i].draw_contours if len(c) >= 3]
+        detections.append(d)
+    entry["d"] = detections
+    return entry
+
+
+class OverlayPartWriter:
+    """Appends overlay frame entries of one processed frame range to a gzipped JSON-lines part."""
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._file = gzip.open(path, "wt", compresslevel=6)
+
+    def add(self, entry):
+        if entry is None:
+            return
+        self._file.write(json.dumps(entry, separators=_SEPARATORS) + "\n")
+        self.frames += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def build_overlay(part_paths, path, header, id_offsets=None):
+    """Join part files (in frame order) into the final gzipped overlay file at `path`.
+       `id_offsets[k]` shifts the track IDs of part k (segments are tracked separately).
+       The file is replaced atomically; returns `path`."""
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", compresslevel=6) as out:
+        head = json.dumps({"version": OVERLAY_VERSION, **header}, separators=_SEPARATORS)
+        out.write(head[:-1] + ',"frames":[')
+        first = True
+        for k, part in enumerate(part_paths):
+            offset = id_offsets[k] if id_offsets else 0
+            with gzip.open(part, "rt") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if not line:
+                        continue
+                    if offset:
+                        entry = json.loads(line)
+                        if entry.get("tracked"):
+                            for d in entry["d"]:
+                                d["id"] += offset
+                        line = json.dumps(entry, separators=_SEPARATORS)
+                    out.write(line if first else "," + line)
+                    first = False
+        out.write("]}")
+    os.replace(tmp_path, path)
+    return path
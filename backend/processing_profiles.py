@@ -0,0 +1,56 @@
+# processing_profiles.py
+"""Named quality/speed presets for video jobs.
+
+A profile bundles the knobs that trade accuracy for throughput:
+
+  imgsz           model input size
+  conf            detection confidence threshold
+  scale_factor    frames are downscaled by this before inference; boxes and
+                  masks are mapped back to full resolution for metrics
+  geometry        mask geometry engine ("mask" / "full", see metrics_geometry)
+  distance_engine riverbank distance engine ("shapely" / "raster")
+  render_detail   overlay detail ("full" / "fast", see frame_render)
+  stride          run the model on every Nth frame (see keyframe_stride)
+
+"fast" is meant for cheap triage passes, "accurate" for flagged surveys.
+"balanced" is what every job used before profiles existed.  A setting of
+None falls back to the server-wide default: "balanced" leaves geometry,
+distance_engine and stride to the METRICS_GEOMETRY / RIVER_DISTANCE_ENGINE /
+INFERENCE_STRIDE env vars.
+"""
+import os
+
+from keyframe_stride import INFERENCE_STRIDE
+from metrics_geometry import METRICS_GEOMETRY, RIVER_DISTANCE_ENGINE
+
+PROCESSING_PROFILES = {
+    "fast": {
+        "imgsz": 480, "conf": 0.25, "scale_factor": 0.5,
+        "geometry": "mask", "distance_engine": "raster",
+        "render_detail": "fast", "stride": 3,
+    },
+    "balanced": {
+        "imgsz": 640, "conf": 0.1, "scale_factor": 1.0,
+        "geometry": None, "distance_engine": None,
+        "render_detail": "full", "stride": None,
+    },
+    "accurate": {
+        "imgsz": 1280, "conf": 0.1, "scale_factor": 1.0,
+        "geometry": "full", "distance_engine": "shapely",
+        "render_detail": "full", "stride": 1,
+    },
+}
+DEFAULT_PROFILE = os.getenv("PROCESSING_PROFILE", "balanced")
+
+
+def get_profile(name=None):
+    """Settings of profile `name` (default DEFAULT_PROFILE), with its name under "name"
+       and unset engines and stride resolved from the env defaults.  Raises ValueError for unknown profiles."""
+    name = name or DEFAULT_PROFILE
+    if name not in PROCESSING_PROFILES:
+        raise ValueError(f"Unknown processing profile '{name}' (choose from {', '.join(PROCESSING_PROFILES)})")
+    profile = {"name": name, **PROCESSING_PROFILES[name]}
+    profile["geometry"] = profile["geometry"] or METRICS_GEOMETRY
+    profile["distance_engine"] = profile["distance_engine"] or RIVER_DISTANCE_ENGINE
+    profile["stride"] = profile["stride"] or INFERENCE_STRIDE
+    return profile
@@ -0,0 +1,277 @@
+# result_cache.py
+"""Content-addressed cache of finished video jobs.
+
+Drone footage is often uploaded more than once (retries, a second user,
+the same flight under another name).  upload_file hashes the video while
+it streams to disk; together with the model file's hash and the processing
+parameters (including the server-side settings that change the output)
+that gives a cache key.  When a job finishes, its outputs
+(processed video, proxy, overlay, poster, sprites, HLS stream, reports) are
+hard-linked into RESULT_CACHE_DIR/<key>/ and its final status is stored
+here.  A later upload with the same key is answered without a worker: the
+cached files are linked back under the new upload's name and the stored
+status is republished with its URLs rewritten.
+
+Hard links mean a cached entry costs no extra disk while the published
+files exist, and stays valid when they are deleted or replaced.  A file
+rewritten in place (a later job of the same name) changes the shared inode;
+the entry's size/mtime signature catches that and the entry is dropped.
+Entries unused for RESULT_CACHE_MAX_AGE_DAYS are evicted, then the least
+recently used ones until the cache fits in RESULT_CACHE_MAX_MB; this runs
+after every store and on lookups at most every RESULT_CACHE_EVICT_INTERVAL_S,
+so old entries go even when no new jobs finish.  Hits and misses are
+counted for stats().
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+RESULT_CACHE_DB_PATH = os.getenv("RESULT_CACHE_DB_PATH", "result_cache.db")
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "result_cache")
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "20000"))  # 0 = cache disabled
+RESULT_CACHE_MAX_AGE_DAYS = float(os.getenv("RESULT_CACHE_MAX_AGE_DAYS", "30"))
+RESULT_CACHE_EVICT_INTERVAL_S = float(os.getenv("RESULT_CACHE_EVICT_INTERVAL_S", "600"))  # eviction pass on lookups, at most this often
+
+HASH_CHUNK_BYTES = 1 << 20
+CACHE_VERSION = 1  # bump when processing changes in a way that invalidates old results
+
+_file_hashes = {}  # (path, size, mtime) -> sha256, for model files
+_last_evict = 0.0
+
+
+def enabled():
+    return RESULT_CACHE_MAX_MB > 0
+
+
+def _connect():
+    conn = sqlite3.connect(RESULT_CACHE_DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def init_db():
+    with _connect() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                base_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                files TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_used ON results (used_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+
+def _count(conn, name, n=1):
+    conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                 "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+
+
+def file_sha256(path):
+    """sha256 of a file, remembered per (path, size, mtime) so model files are read once."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_hashes.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                h.update(chunk)
+        digest = _file_hashes[memo_key] = h.hexdigest()
+    return digest
+
+
+def cache_key(content_hash, model_hash, params):
+    """Key of a job: upload content, model weights and every parameter that changes the output."""
+    blob = json.dumps({"v": CACHE_VERSION, "content": content_hash, "model": model_hash, "params": params},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _link(src, dst):
+    if os.path.isdir(src):
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst, copy_function=_link)
+        return dst
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return dst
+
+
+def _signature(entry_dir):
+    """(size in bytes, digest of every file's path, size and mtime) of a cache entry."""
+    h = hashlib.sha256()
+    size = 0
+    for root, dirs, names in os.walk(entry_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            size += st.st_size
+            h.update(f"{os.path.relpath(path, entry_dir)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return size, h.hexdigest()
+
+
+def store(key, base_name, status, paths):
+    """Cache a finished job.  `paths` are its published files/directories, each named
+       `base_name` + suffix (or, for directories, exactly `base_name`); `status` is its
+       final job status.  Evicts old entries afterwards."""
+    if not enabled() or not key:
+        return False
+    entry_dir = os.path.join(RESULT_CACHE_DIR, key)
+    tmp_dir = entry_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    files = []
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        name = os.path.basename(path.rstrip(os.sep))
+        if not name.startswith(base_name):
+            continue
+        files.append({"dir": os.path.dirname(path.rstrip(os.sep)), "suffix": name[len(base_name):],
+                      "is_dir": os.path.isdir(path)})
+        _link(path, os.path.join(tmp_dir, f"{len(files) - 1}{files[-1]['suffix']}"))
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+
+    size, signature = _signature(entry_dir)
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, base_name, status, files, signature, size_bytes, "
+            "created_at, used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, base_name, json.dumps(status, default=str), json.dumps(files), signature, size, now, now)
+        )
+        _count(conn, "stores")
+    evict()
+    return True
+
+
+def _url_for(entry, name):
+    top = os.path.basename(entry["dir"].rstrip(os.sep))
+    if entry["is_dir"]:
+        return f"/video/live/{name}/"
+    return f"/video/{top}/{name}"
+
+
+def _rewrite(value, mapping):
+    if isinstance(value, str):
+        for old, new in mapping:
+            if value.startswith(old):
+                return new + value[len(old):]
+        return value
+    if isinstance(value, dict):
+        return {k: _rewrite(v, mapping) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rewrite(v, mapping) for v in value]
+    return value
+
+
+def restore(key, base_name):
+    """Publish a cached job's files under `base_name` and return its status with the URLs
+       rewritten to the new names, or None on a miss.  Entries whose files are gone or changed are dropped."""
+    if not enabled() or not key:
+        return None
+    if time.time() - _last_evict >= RESULT_CACHE_EVICT_INTERVAL_S:
+        evict()
+    with _connect() as conn:
+        row = conn.execute("SELECT base_name, status, files, signature FROM results WHERE key = ?",
+                           (key,)).fetchone()
+        entry_dir = os.path.join(RESULT_CACHE_DIR, key)
+        if row and not (os.path.isdir(entry_dir) and _signature(entry_dir)[1] == row[3]):
+            print(f"⚠️ Result cache entry {key[:12]} changed on disk, dropping it")
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            row = None
+        if not row:
+            _count(conn, "misses")
+            return None
+        old_base, status, files = row[0], json.loads(row[1]), json.loads(row[2])
+
+    mapping = []
+    try:
+        for i, entry in enumerate(files):
+            old_name, new_name = old_base + entry["suffix"], base_name + entry["suffix"]
+            _link(os.path.join(entry_dir, f"{i}{entry['suffix']}"), os.path.join(entry["dir"], new_name))
+            if entry["suffix"] == "_sprite.vtt":
+                # The WebVTT cues name the sprite sheet
+                vtt_path = os.path.join(entry["dir"], new_name)
+                with open(vtt_path) as f:
+                    text = f.read()
+                os.remove(vtt_path)  # do not write through the hard link into the cache
+                with open(vtt_path, "w") as f:
+                    f.write(text.replace(f"{old_base}_sprite.jpg", f"{base_name}_sprite.jpg"))
+            mapping.append((_url_for(entry, old_name), _url_for(entry, new_name)))
+    except OSError as e:
+        print(f"⚠️ Result cache entry {key[:12]} is unusable: {e}")
+        with _connect() as conn:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            _count(conn, "misses")
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        return None
+
+    with _connect() as conn:
+        conn.execute("UPDATE results SET hits = hits + 1, used_at = ? WHERE key = ?", (time.time(), key))
+        _count(conn, "hits")
+    # Longest old URL first, so "<name>_proxy.mp4" is not caught by "<name>"
+    mapping.sort(key=lambda m: len(m[0]), reverse=True)
+    return _rewrite(status, mapping)
+
+
+def evict(max_mb=None, max_age_days=None):
+    """Drop entries unused for `max_age_days`, then least recently used ones until the
+       cache is within `max_mb`.  Returns the number of entries removed."""
+    global _last_evict
+    _last_evict = time.time()
+    max_bytes = (RESULT_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    max_age_s = (RESULT_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days) * 86400
+    with _connect() as conn:
+        rows = conn.execute("SELECT key, size_bytes, used_at FROM results ORDER BY used_at").fetchall()
+    total = sum(size for _, size, _ in rows)
+    cutoff = time.time() - max_age_s
+    doomed = []
+    for key, size, used_at in rows:
+        if used_at < cutoff or total > max_bytes:
+            doomed.append(key)
+            total -= size
+    if not doomed:
+        return 0
+    with _connect() as conn:
+        conn.executemany("DELETE FROM results WHERE key = ?", [(k,) for k in doomed])
+        _count(conn, "evictions", len(doomed))
+    for key in doomed:
+        shutil.rmtree(os.path.join(RESULT_CACHE_DIR, key), ignore_errors=True)
+    print(f"🧹 Result cache: evicted {len(doomed)} entries")
+    return len(doomed)
+
+
+def stats():
+    with _connect() as conn:
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results").fetchone()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "enabled": enabled(),
+        "entries": entries,
+        "size_mb": round(size / (1024 * 1024), 1),
+        "max_mb": RESULT_CACHE_MAX_MB,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "stores": counters.get("stores", 0),
+        "evictions": counters.get("evictions", 0),
+    }
@@ -0,0 +1,102 @@
+# test_frame_render.py
+"""Label sprites against drawing the same label straight onto the frame.
+
+Each label is drawn once with the layout's own draw() onto a copy of a
+textured frame, and once through LabelSprite.blit, and the two frames are
+compared.  Besides the shipped layouts (whose alpha is binary under
+OpenCV 4's LINE_8 text but antialiased under OpenCV 5), an antialiased
+layout is registered so the partial-alpha blend is exercised on every
+OpenCV version.  Differences are limited to the rounding of the 8-bit
+alpha and colour, a few levels per channel.
+
+Run with `python -m pytest test_frame_render.py` or as a script.
+"""
+import cv2
+import numpy as np
+
+import frame_render
+from frame_render import FONT, LabelSprite
+
+FRAME_SIZE = (320, 160)  # (w, h)
+MAX_DIFF = 3  # per channel, from 8-bit rounding of alpha and premultiplied colour
+LABELS = [
+    ("text", "Area: 12.34 m2", (48, 145, 145), 0.6, 2),
+    ("id_label", "ID:17 | river | ", (255, 0, 255), 0.6, 2),
+    ("id_label", "0.87", (0, 200, 255), 0.6, 2),
+    ("metric_box", "3.2 m", (0, 255, 0), 1.0, 3),
+    ("aa_text", "Dist: 8.5 m", (48, 145, 145), 0.7, 2),
+    ("aa_text", "W", (250, 250, 250), 1.5, 1),
+]
+
+
+def _aa_text_layout(text, color, scale, thickness):
+    """Like the "text" layout, but always antialiased."""
+    (text_w, text_h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+
+    def draw(img, x, y, paint):
+        cv2.putText(img, text, (x, y), FONT, scale, paint(color), thickness, cv2.LINE_AA)
+    return draw, (thickness + 1, text_h + thickness + 1, text_w + thickness + 1, baseline + thickness + 1)
+
+
+frame_render._LAYOUTS.setdefault("aa_text", _aa_text_layout)
+
+
+def _frame():
+    # Noise over a gradient, so blending errors cannot hide on a flat background
+    rng = np.random.default_rng(0)
+    w, h = FRAME_SIZE
+    gradient = np.linspace(0, 255, w, dtype=np.float32)[None, :, None].repeat(h, axis=0).repeat(3, axis=2)
+    noise = rng.integers(-40, 40, size=(h, w, 3))
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def _direct(frame, kind, text, color, scale, thickness, anchor):
+    draw, _ = frame_render._LAYOUTS[kind](text, color, scale, thickness)
+    img = frame.copy()
+    draw(img, anchor[0], anchor[1], lambda c: c)
+    return img
+
+
+def _sprite(frame, kind, text, color, scale, thickness, anchor):
+    img = frame.copy()
+    LabelSprite(kind, text, color, scale, thickness).blit(img, anchor)
+    return img
+
+
+def _max_diff(a, b):
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+def test_sprite_matches_direct_drawing():
+    frame = _frame()
+    for kind, text, color, scale, thickness in LABELS:
+        for anchor in [(60, 80), (180, 60)]:
+            direct = _direct(frame, kind, text, color, scale, thickness, anchor)
+            sprite = _sprite(frame, kind, text, color, scale, thickness, anchor)
+            diff = _max_diff(direct, sprite)
+            assert diff <= MAX_DIFF, (kind, text, anchor, diff)
+
+
+def test_antialiased_sprite_uses_partial_alpha():
+    sprite = LabelSprite("aa_text", "Dist: 8.5 m", (48, 145, 145), 0.7, 2)
+    alpha = sprite.bgra[..., 3]
+    assert not sprite._binary
+    assert ((alpha > 0) & (alpha < 255)).any()
+
+
+def test_sprite_clipped_at_frame_edges():
+    frame = _frame()
+    w, h = FRAME_SIZE
+    for kind, text, color, scale, thickness in LABELS:
+        for anchor in [(-20, 10), (w - 15, h - 2), (w + 50, h + 50)]:
+            direct = _direct(frame, kind, text, color, scale, thickness, anchor)
+            sprite = _sprite(frame, kind, text, color, scale, thickness, anchor)
+            diff = _max_diff(direct, sprite)
+            assert diff <= MAX_DIFF, (kind, text, anchor, diff)
+
+
+if __name__ == "__main__":
+    for test in (test_sprite_matches_direct_drawing, test_antialiased_sprite_uses_partial_alpha,
+                 test_sprite_clipped_at_frame_edges):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,148 @@
+# test_metrics_geometry.py
+"""Accuracy of the "mask" geometry engine against the "full" reference.
+
+Synthetic low-resolution masks are measured by both engines of MaskGeometry
+and compared at the tolerances metrics_geometry documents: outlines and
+centroids within half a mask pixel (plus half a frame pixel of rounding
+for non-integer scale factors), areas within the rounding of the
+nearest-neighbour upsampling.  With an integer scale factor the upsampling
+is exact, so area and centroid must match exactly.
+
+Run with `python -m pytest test_metrics_geometry.py` or as a script.
+"""
+import math
+
+import cv2
+import numpy as np
+from shapely.geometry import Polygon
+
+from metrics_geometry import MaskGeometry
+
+MASK_SIZE = (80, 48)  # (w, h), like a 640px model input at 1/8 mask stride
+FRAME_SIZES = [(320, 192), (250, 150), (1280, 720)]  # integer, non-integer and 16:9 scale factors
+
+
+def _ellipse():
+    mask = np.zeros(MASK_SIZE[::-1], dtype=np.uint8)
+    cv2.ellipse(mask, (40, 24), (22, 13), 30, 0, 360, 1, -1)
+    return mask
+
+
+def _triangle():
+    mask = np.zeros(MASK_SIZE[::-1], dtype=np.uint8)
+    cv2.fillPoly(mask, [np.array([[5, 40], [60, 6], [74, 44]], dtype=np.int32)], 1)
+    return mask
+
+
+def _two_blobs():
+    mask = np.zeros(MASK_SIZE[::-1], dtype=np.uint8)
+    mask[4:18, 6:25] = 1
+    cv2.circle(mask, (58, 30), 12, 1, -1)
+    return mask
+
+
+MASKS = {"ellipse": _ellipse, "triangle": _triangle, "two_blobs": _two_blobs}
+
+
+def _scale(frame_size):
+    return frame_size[0] / MASK_SIZE[0], frame_size[1] / MASK_SIZE[1]
+
+
+def _is_integer_scale(frame_size):
+    sx, sy = _scale(frame_size)
+    return sx.is_integer() and sy.is_integer()
+
+
+def _outline_tolerance(frame_size):
+    """Half a mask pixel per axis, plus half a frame pixel when blocks are floor(s) or
+       ceil(s) pixels wide; taken along the diagonal since outline corners move both ways."""
+    sx, sy = _scale(frame_size)
+    rounding = 0 if _is_integer_scale(frame_size) else 0.5
+    return math.hypot(sx / 2 + rounding, sy / 2 + rounding)
+
+
+def _engines(mask, frame_size):
+    # Masks come out of the model as float 0/1 arrays
+    mask = mask.astype(np.float32)
+    return MaskGeometry(mask, frame_size, engine="mask"), MaskGeometry(mask, frame_size, engine="full")
+
+
+def _area_tolerance(full):
+    """Nearest-neighbour upsampling gives each mask row/column floor(s) or ceil(s) frame
+       pixels, so the area error is bounded by the outline, not the area: at most one frame
+       pixel per covered frame row plus two per covered frame column."""
+    ys, xs = np.nonzero(full.mask)
+    return (np.ptp(ys) + 1) + 2 * (np.ptp(xs) + 1)
+
+
+def test_area_px():
+    for frame_size in FRAME_SIZES:
+        for name, make in MASKS.items():
+            scaled, full = _engines(make(), frame_size)
+            if _is_integer_scale(frame_size):
+                assert scaled.area_px == full.area_px, (name, frame_size)
+            else:
+                assert abs(scaled.area_px - full.area_px) <= _area_tolerance(full), \
+                    (name, frame_size, scaled.area_px, full.area_px)
+
+
+def test_centroid():
+    for frame_size in FRAME_SIZES:
+        for name, make in MASKS.items():
+            scaled, full = _engines(make(), frame_size)
+            (x, y), (fx, fy) = scaled.centroid, full.centroid
+            if _is_integer_scale(frame_size):
+                assert abs(x - fx) < 1e-6 and abs(y - fy) < 1e-6, (name, frame_size)
+            else:
+                sx, sy = _scale(frame_size)
+                assert abs(x - fx) <= sx / 2 and abs(y - fy) <= sy / 2, (name, frame_size, (x, y), (fx, fy))
+
+
+def test_empty_mask():
+    mask = np.zeros(MASK_SIZE[::-1], dtype=np.uint8)
+    for frame_size in FRAME_SIZES:
+        scaled, full = _engines(mask, frame_size)
+        assert scaled.area_px == full.area_px == 0
+        assert scaled.centroid is None and full.centroid is None
+        assert scaled.polygon is None and full.polygon is None
+        assert scaled.contours == [] and full.contours == []
+
+
+def test_polygon():
+    for frame_size in FRAME_SIZES:
+        tolerance = _outline_tolerance(frame_size)
+        for name, make in MASKS.items():
+            scaled, full = _engines(make(), frame_size)
+            assert scaled.polygon is not None and full.polygon is not None, (name, frame_size)
+            distance = scaled.polygon.hausdorff_distance(full.polygon)
+            assert distance <= tolerance, (name, frame_size, distance, tolerance)
+
+
+def test_contours():
+    for frame_size in FRAME_SIZES:
+        tolerance = _outline_tolerance(frame_size)
+        for name, make in MASKS.items():
+            scaled, full = _engines(make(), frame_size)
+            assert len(scaled.contours) == len(full.contours), (name, frame_size)
+            full_outlines = [Polygon(c) for c in full.contours]
+            for contour in scaled.contours:
+                outline = Polygon(contour)
+                # findContours does not promise the same order at both resolutions
+                distance = min(outline.hausdorff_distance(f) for f in full_outlines)
+                assert distance <= tolerance, (name, frame_size, distance, tolerance)
+            for contour in scaled.draw_contours:
+                assert contour.dtype == np.int32 and contour.shape[1:] == (1, 2)
+
+
+def test_to_frame_round_trip():
+    for frame_size in FRAME_SIZES:
+        scaled, _ = _engines(_ellipse(), frame_size)
+        points = np.array([[0, 0], [12.5, 7.25], [MASK_SIZE[0] - 1, MASK_SIZE[1] - 1]])
+        assert np.allclose(scaled.from_frame(scaled.to_frame(points)), points)
+
+
+if __name__ == "__main__":
+    for test in (test_area_px, test_centroid, test_empty_mask, test_polygon, test_contours,
+                 test_to_frame_round_trip):
+        test()
+        print(f"✅ {test.__name__}")
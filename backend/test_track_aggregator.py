@@ -0,0 +1,77 @@
+# test_track_aggregator.py
+"""Per-object summaries across checkpoints and segment merges.
+
+Segments are tracked independently, so each one's track IDs start at 0 and
+its untracked detections carry no ID at all; merge_segments must shift the
+former and combine the latter per class.
+
+Run with `python -m pytest test_track_aggregator.py` or as a script.
+"""
+from track_aggregator import TrackAggregator, merge_segments
+
+
+def _row(det_id, cls, frame, tracked, area=None):
+    return {"id": det_id, "class": cls, "frame": frame, "time_s": frame / 10, "tracked": tracked,
+            "area_m2": area}
+
+
+def _segment(rows):
+    aggregator = TrackAggregator()
+    for row in rows:
+        aggregator.add(row)
+    return aggregator.state()
+
+
+def test_untracked_rows_are_summarised_per_class():
+    aggregator = TrackAggregator()
+    for row in [_row(0, "car", 1, False), _row(1, "car", 2, False), _row(0, "boat", 2, False)]:
+        aggregator.add(row)
+    assert len(aggregator) == 0
+    assert aggregator.untracked_detections == 3
+    assert aggregator.class_totals() == {}
+    objects = {obj["class"]: obj for obj in aggregator.objects()}
+    assert objects["car"]["id"] is None and not objects["car"]["tracked"]
+    assert objects["car"]["frames_seen"] == 2
+
+
+def test_merge_segments_with_untracked_detections():
+    first = _segment([_row(0, "car", 1, True, 2.0), _row(0, "car", 2, True, 3.0),
+                      _row(1, "boat", 2, True), _row(0, "car", 3, False, 5.0)])
+    second = _segment([_row(0, "car", 11, True), _row(0, "car", 12, False, 1.0),
+                       _row(1, "car", 13, False), _row(0, "boat", 14, False)])
+
+    merged, id_offsets = merge_segments([first, second])
+
+    assert id_offsets == [0, 2]
+    assert sorted(merged.tracks) == [0, 1, 2]
+    assert merged.tracks[2]["first_frame"] == 11
+    assert merged.untracked_detections == 4
+    car = merged.untracked["car"]
+    assert car["frames_seen"] == 3 and car["class_counts"] == {"car": 3}
+    assert (car["first_frame"], car["last_frame"]) == (3, 13)
+    assert car["max_area_m2"] == 5.0
+    assert merged.untracked["boat"]["frames_seen"] == 1
+    assert merged.class_totals() == {"car": 2, "boat": 1}
+
+
+def test_merge_segments_without_tracks():
+    # Tracking disabled: no segment has tracks, so no IDs are shifted
+    segments = [_segment([_row(0, "car", f, False)]) for f in (1, 10, 20)]
+    merged, id_offsets = merge_segments(segments)
+    assert id_offsets == [0, 0, 0]
+    assert len(merged) == 0 and merged.untracked_detections == 3
+
+
+def test_state_round_trip():
+    state = _segment([_row(4, "car", 1, True), _row(0, "boat", 1, False)])
+    restored = TrackAggregator()
+    restored.merge(state)
+    assert restored.state() == state
+    assert restored.next_id() == 5
+
+
+if __name__ == "__main__":
+    for test in (test_untracked_rows_are_summarised_per_class, test_merge_segments_with_untracked_detections,
+                 test_merge_segments_without_tracks, test_state_round_trip):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,172 @@
+# track_aggregator.py
+"""Per-object summaries of tracked detections.
+
+process_video_job runs the model through ultralytics' tracker (ByteTrack by
+default) so a detection's id is the same physical object across frames.
+TrackAggregator folds every tracked detection row into one running summary
+per track: class, first/last frame and time, running max area and bridge
+length, min riverbank distance, buffer membership and the GPS position at
+first and last sighting (from the SRT timeline).  The object report is
+built from these summaries, so it grows with the number of objects rather
+than objects x frames.  state()/merge() carry the summaries across
+checkpoints and out of segment worker processes.
+
+Detections without a track ID (VIDEO_TRACKER="", frames the tracker gave
+no IDs, backends that cannot track) cannot be told apart across frames;
+they are folded into one summary per class instead, with id None and
+tracked False, where frames_seen counts detections.
+"""
+import bisect
+import os
+
+VIDEO_TRACKER = os.getenv("VIDEO_TRACKER", "bytetrack.yaml")  # empty = plain predict, no tracking
+
+
+def reset_tracker(model):
+    """Forget tracks from a previous job on a (cached, shared) model."""
+    predictor = getattr(model, "predictor", None)
+    for tracker in getattr(predictor, "trackers", None) or []:
+        tracker.reset()
+
+
+def _max(current, value):
+    if value is None:
+        return current
+    return value if current is None else max(current, value)
+
+
+def _min(current, value):
+    if value is None:
+        return current
+    return value if current is None else min(current, value)
+
+
+class TrackAggregator:
+    """Running per-track summary, updated one detection row at a time."""
+
+    def __init__(self, timeline=None):
+        self.tracks = {}
+        self.untracked = {}  # class -> summary of its untracked detections
+        self._timeline = sorted(timeline or [], key=lambda loc: loc['start'])
+        self._starts = [loc['start'] for loc in self._timeline]
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def untracked_detections(self):
+        return sum(summary['frames_seen'] for summary in self.untracked.values())
+
+    def add(self, row):
+        """Fold one detection row (as built by process_frame_range) into its track, or
+           into its class's untracked summary when the row has no track ID."""
+        tracked = bool(row.get('tracked'))
+        summaries, key = (self.tracks, row['id']) if tracked else (self.untracked, row['class'])
+        track = summaries.get(key)
+        if track is None:
+            track = summaries[key] = {
+                'id': row['id'] if tracked else None,
+                'tracked': tracked,
+                'class_counts': {},
+                'first_frame': row['frame'],
+                'first_time_s': row['time_s'],
+                'first_distance_from_start_m': row.get('distance_from_start_m'),
+                'last_frame': row['frame'],
+                'last_time_s': row['time_s'],
+                'frames_seen': 0,
+                'max_area_m2': None,
+                'max_bridge_length_m': None,
+                'min_dist_from_riverbank_m': None,
+                'inside_buffer': False,
+                'max_confidence': None,
+            }
+        counts = track['class_counts']
+        counts[row['class']] = counts.get(row['class'], 0) + 1
+        if row['frame'] < track['first_frame']:
+            track.update(first_frame=row['frame'], first_time_s=row['time_s'],
+                         first_distance_from_start_m=row.get('distance_from_start_m'))
+        if row['frame'] > track['last_frame']:
+            track.update(last_frame=row['frame'], last_time_s=row['time_s'])
+        track['frames_seen'] += 1
+        track['max_area_m2'] = _max(track['max_area_m2'], row.get('area_m2'))
+        track['max_bridge_length_m'] = _max(track['max_bridge_length_m'], row.get('bridge_length_m'))
+        track['min_dist_from_riverbank_m'] = _min(track['min_dist_from_riverbank_m'], row.get('dist_from_riverbank_m'))
+        track['inside_buffer'] = track['inside_buffer'] or bool(row.get('inside_buffer'))
+        track['max_confidence'] = _max(track['max_confidence'], row.get('confidence'))
+
+    def state(self):
+        """The track and untracked summaries as JSON-serialisable dicts (see merge)."""
+        return [dict(track, class_counts=dict(track['class_counts']))
+                for track in [*self.tracks.values(), *self.untracked.values()]]
+
+    def merge(self, tracks, id_offset=0):
+        """Add summaries from state(), e.g. of another segment, with IDs shifted by
+           `id_offset`; untracked summaries are combined with this one's per class."""
+        for track in tracks:
+            track = dict(track, class_counts=dict(track['class_counts']))
+            if track['id'] is not None:
+                track['id'] += id_offset
+                self.tracks[track['id']] = track
+                continue
+            cls = next(iter(track['class_counts']))
+            current = self.untracked.get(cls)
+            if current is None:
+                self.untracked[cls] = track
+                continue
+            current['class_counts'][cls] += track['class_counts'][cls]
+            if track['first_frame'] < current['first_frame']:
+                current.update({k: track[k] for k in ('first_frame', 'first_time_s', 'first_distance_from_start_m')})
+            if track['last_frame'] > current['last_frame']:
+                current.update(last_frame=track['last_frame'], last_time_s=track['last_time_s'])
+            current['frames_seen'] += track['frames_seen']
+            for k in ('max_area_m2', 'max_bridge_length_m', 'max_confidence'):
+                current[k] = _max(current[k], track[k])
+            current['min_dist_from_riverbank_m'] = _min(current['min_dist_from_riverbank_m'],
+                                                         track['min_dist_from_riverbank_m'])
+            current['inside_buffer'] = current['inside_buffer'] or track['inside_buffer']
+
+    def next_id(self):
+        """First ID past every track seen so far (0 when there are none)."""
+        return max(self.tracks, default=-1) + 1
+
+
+    def _location(self, time_s):
+        i = bisect.bisect_right(self._starts, time_s) - 1
+        if i >= 0 and time_s <= self._timeline[i]['end']:
+            return self._timeline[i]['lat'], self._timeline[i]['lon']
+        return None, None
+
+    def objects(self):
+        """One summary dict per physical object, ordered by first appearance, followed by
+           the per-class summaries of untracked detections."""
+        objects = []
+        untracked = sorted(self.untracked.values(), key=lambda t: t['first_frame'])
+        for track in sorted(self.tracks.values(), key=lambda t: (t['first_frame'], t['id'])) + untracked:
+            first_lat, first_lon = self._location(track['first_time_s'])
+            last_lat, last_lon = self._location(track['last_time_s'])
+            summary = {k: v for k, v in track.items() if k != 'class_counts'}
+            summary['class'] = max(track['class_counts'].items(), key=lambda kv: kv[1])[0]
+            summary.update(first_latitude=first_lat, first_longitude=first_lon,
+                           last_latitude=last_lat, last_longitude=last_lon)
+            objects.append(summary)
+        return objects
+
+    def class_totals(self):
+        """Number of distinct tracked objects per class."""
+        totals = {}
+        for obj in self.objects():
+            if obj['tracked']:
+                totals[obj['class']] = totals.get(obj['class'], 0) + 1
+        return totals
+
+
+def merge_segments(segment_tracks, timeline=None):
+    """Fold the state() of each segment, in order, into one TrackAggregator.  Every
+       segment's track IDs are shifted past the tracked IDs of the segments before it;
+       untracked summaries are combined per class.  Returns (aggregator, id_offsets)."""
+    merged = TrackAggregator(timeline)
+    id_offsets = []
+    for tracks in segment_tracks:
+        id_offsets.append(merged.next_id())
+        merged.merge(tracks, id_offsets[-1])
+    return merged, id_offsets
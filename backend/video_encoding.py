@@ -0,0 +1,268 @@
+# video_encoding.py
+"""Encoder backends for annotated video output.
+
+FFmpegPipeWriter streams raw BGR frames over stdin into a single ffmpeg
+process that writes the final H.264 faststart MP4 directly.
+TranscodingVideoWriter is the old path kept as a fallback: cv2.VideoWriter
+writes an mp4v AVI which is transcoded to H.264 when the writer is released.
+Both expose the cv2.VideoWriter-style write()/release()/isOpened() API.
+
+Jobs that encode video also write a low-resolution proxy MP4 from the same
+annotated frames (PROXY_VIDEO_HEIGHT lines, cheaper x264 settings) on its
+own encoder process.  It is published as soon as its last frame is in, long
+before the full-resolution file has been flushed, moved to faststart and
+joined; see proxy_size().
+
+HlsLiveWriter encodes a third, preview-quality copy as an fMP4 HLS event
+stream (HLS_SEGMENT_SECONDS segments) while the job runs, so the video can
+be watched during processing; finalize_hls_playlist() turns the playlist
+into a VOD playlist once the job is done.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import cv2
+
+VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "ffmpeg")  # "ffmpeg" (stdin pipe) or "opencv" (AVI + transcode)
+X264_PRESET = os.getenv("X264_PRESET", "veryfast")
+X264_CRF = os.getenv("X264_CRF", "23")
+PROXY_VIDEO_HEIGHT = int(os.getenv("PROXY_VIDEO_HEIGHT", "360"))  # 0 disables the proxy output
+PROXY_X264_PRESET = os.getenv("PROXY_X264_PRESET", "ultrafast")
+PROXY_X264_CRF = os.getenv("PROXY_X264_CRF", "28")
+HLS_VIDEO_HEIGHT = int(os.getenv("HLS_VIDEO_HEIGHT", "720"))  # 0 disables the live HLS output
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+
+
+class FFmpegPipeWriter:
+    """Encode frames to H.264 MP4 in one pass through an ffmpeg stdin pipe."""
+
+    def __init__(self, path, fps, size, preset=X264_PRESET, crf=X264_CRF):
+        self.path = path
+        self.size = (int(size[0]), int(size[1]))
+        self._stderr = tempfile.TemporaryFile()
+        cmd = self._input_args(fps) + self._output_args(path, preset, crf)
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def _input_args(self, fps):
+        return [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{self.size[0]}x{self.size[1]}",
+            "-r", f"{fps or 25}",
+            "-i", "-",
+            "-an",
+            # yuv420p needs even dimensions
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+        ]
+
+    def _output_args(self, path, preset, crf):
+        return [
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            path,
+        ]
+
+    def isOpened(self):
+        return self.proc.poll() is None
+
+    def write(self, frame):
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+        try:
+            self.proc.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"ffmpeg encoder exited early: {self._error_output() or e}")
+
+    def release(self):
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        returncode = self.proc.wait()
+        detail = self._error_output()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg encoder failed ({returncode}): {detail}")
+
+    def _error_output(self):
+        try:
+            self._stderr.seek(0)
+            return self._stderr.read().decode(errors="replace").strip()
+        except (ValueError, OSError):
+            return ""
+
+
+class HlsLiveWriter(FFmpegPipeWriter):
+    """fMP4 HLS event stream (playlist + init.mp4 + seg_NNNNN.m4s) that grows as frames come in.
+
+    With `resume` the segments are appended to an existing playlist after a
+    discontinuity, e.g. when a checkpointed job is picked up again."""
+
+    def __init__(self, playlist_path, fps, size, resume=False):
+        self.playlist_path = playlist_path
+        self.resume = resume
+        os.makedirs(os.path.dirname(playlist_path), exist_ok=True)
+        super().__init__(playlist_path, fps, size, preset=PROXY_X264_PRESET, crf=PROXY_X264_CRF)
+
+    def _output_args(self, path, preset, crf):
+        flags = "independent_segments" + ("+append_list+discont_start" if self.resume else "")
+        return [
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p",
+            # A keyframe at every segment boundary
+            "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+            "-f", "hls", "-hls_time", str(HLS_SEGMENT_SECONDS),
+            "-hls_segment_type", "fmp4", "-hls_playlist_type", "event",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(os.path.dirname(path), "seg_%05d.m4s"),
+            "-hls_flags", flags,
+            path,
+        ]
+
+    @property
+    def ready(self):
+        """True once the playlist lists at least one segment."""
+        return os.path.exists(self.playlist_path)
+
+
+class TranscodingVideoWriter:
+    """cv2.VideoWriter to a temporary AVI, transcoded to H.264 MP4 on release()."""
+
+    def __init__(self, path, fps, size):
+        self.path = path
+        timestamp = str(int(time.time() * 1000))
+        self.temp_path = f"{os.path.splitext(path)[0]}_temp_{timestamp}.avi"
+        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        self.writer = cv2.VideoWriter(self.temp_path, fourcc, fps, size)
+
+    def isOpened(self):
+        return self.writer.isOpened()
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+        try:
+            if not os.path.exists(self.temp_path):
+                raise RuntimeError(f"temp file missing: {self.temp_path}")
+            subprocess.run(
+                ["ffmpeg", "-i", self.temp_path, "-c:v", "libx264",
+                 "-movflags", "+faststart", "-y", self.path],
+                check=True
+            )
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+
+def proxy_size(size, height=None):
+    """(width, height) of the proxy for a `size` video (even dimensions, aspect kept),
+       or None when proxies are off or the video is no taller than the proxy."""
+    height = PROXY_VIDEO_HEIGHT if height is None else height
+    W, H = int(size[0]), int(size[1])
+    if height <= 0 or H <= height:
+        return None
+    return (max(2, int(round(W * height / H / 2)) * 2), height - height % 2)
+
+
+def open_video_writer(path, fps, size, backend=None, preset=X264_PRESET, crf=X264_CRF):
+    """Open the configured encoder backend, falling back to cv2.VideoWriter + transcode."""
+    backend = backend or VIDEO_ENCODER
+    if backend == "ffmpeg" and shutil.which("ffmpeg"):
+        try:
+            writer = FFmpegPipeWriter(path, fps, size, preset=preset, crf=crf)
+            if writer.isOpened():
+                return writer
+            writer.release()
+        except Exception as e:
+            print(f"⚠️ ffmpeg pipe encoder unavailable ({e}), falling back to VideoWriter")
+    return TranscodingVideoWriter(path, fps, size)
+
+
+def open_proxy_writer(path, fps, size):
+    """Encoder for the proxy of a `size` video, or None when no proxy is made.
+       Frames must be resized to `writer.size` before write()."""
+    target = proxy_size(size)
+    if target is None:
+        return None
+    writer = open_video_writer(path, fps, target, preset=PROXY_X264_PRESET, crf=PROXY_X264_CRF)
+    writer.size = target
+    return writer
+
+
+def open_hls_writer(playlist_path, fps, size, resume=False):
+    """Live HLS encoder for a `size` video (at most HLS_VIDEO_HEIGHT lines), or None
+       when live output is off or ffmpeg is missing. Frames must be resized to
+       `writer.size` before write()."""
+    if HLS_VIDEO_HEIGHT <= 0 or not shutil.which("ffmpeg"):
+        return None
+    target = proxy_size(size, HLS_VIDEO_HEIGHT) or (int(size[0]) // 2 * 2, int(size[1]) // 2 * 2)
+    try:
+        writer = HlsLiveWriter(playlist_path, fps, target, resume=resume)
+    except Exception as e:
+        print(f"⚠️ Live HLS encoder unavailable: {e}")
+        return None
+    return writer
+
+
+def finalize_hls_playlist(playlist_path):
+    """Rewrite a finished event playlist as a VOD playlist (type VOD, ENDLIST), atomically."""
+    with open(playlist_path) as f:
+        lines = [line.rstrip("\n") for line in f]
+    lines = [line for line in lines if not line.startswith("#EXT-X-PLAYLIST-TYPE")]
+    lines.insert(1, "#EXT-X-PLAYLIST-TYPE:VOD")
+    if "#EXT-X-ENDLIST" not in lines:
+        lines.append("#EXT-X-ENDLIST")
+    tmp_path = playlist_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, playlist_path)
+    return playlist_path
+
+
+def probe_keyframe_times(path):
+    """Timestamps (seconds) of the video's keyframes via ffprobe, or [] if unavailable."""
+    if not shutil.which("ffprobe"):
+        return []
+    try:
+        proc = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=pts_time", "-of", "csv=p=0", path],
+            capture_output=True, text=True, check=True, timeout=300
+        )
+    except Exception as e:
+        print(f"⚠️ ffprobe keyframe scan failed: {e}")
+        return []
+    times = []
+    for line in proc.stdout.splitlines():
+        line = line.strip().strip(",")
+        try:
+            times.append(float(line))
+        except ValueError:
+            continue
+    return sorted(times)
+
+
+def concat_videos(paths, output_path):
+    """Join identically encoded MP4 parts with ffmpeg's concat demuxer (no re-encode)."""
+    list_path = f"{os.path.splitext(output_path)[0]}_concat.txt"
+    with open(list_path, "w") as f:
+        for p in paths:
+            escaped = os.path.abspath(p).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+             "-c", "copy", "-movflags", "+faststart", output_path],
+            check=True
+        )
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+    return output_path
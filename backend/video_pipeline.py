@@ -0,0 +1,169 @@
+# video_pipeline.py
+"""Threaded producer/consumer pipeline used by process_video_job.
+
+A source iterable (the decoder) feeds a chain of worker stages through
+bounded queues, ending in a sink (the encoder).  Every stage runs on its
+own thread, items stay in order because each queue has exactly one
+producer and one consumer, and a full queue blocks the stage upstream of
+it (backpressure).  OpenCV and torch release the GIL, so decoding,
+inference, annotation and encoding overlap in wall time.
+"""
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy_s = 0.0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, frames, busy_s):
+        with self._lock:
+            self.frames += frames
+            self.busy_s += busy_s
+
+    def snapshot(self):
+        with self._lock:
+            wall_s = max(time.time() - self.started, 1e-6)
+            return {
+                "frames": self.frames,
+                "fps": round(self.frames / self.busy_s, 2) if self.busy_s else 0.0,
+                "busy_percent": min(int(self.busy_s / wall_s * 100), 100),
+            }
+
+
+class PipelineCancelled(Exception):
+    """Raised by run_pipeline when should_cancel() turned true mid-run."""
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    """Blocking get that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.2)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def run_pipeline(source, stages, sink, queue_size=4, size=len,
+                 on_progress=None, progress_interval=0.5, should_cancel=None):
+    """Run `source` → `stages` → `sink` on separate threads.
+
+    source:   (name, iterable) producing items.
+    stages:   list of (name, fn) where fn(item) returns the item for the next stage.
+    sink:     (name, fn) consuming the final items.
+    size:     how many frames an item represents, for throughput stats.
+
+    Returns a dict of per-stage stats.  The first exception raised by any
+    stage stops the whole pipeline and is re-raised here.
+    """
+    stop = threading.Event()
+    errors = []
+    names = [source[0]] + [name for name, _ in stages] + [sink[0]]
+    stats = {name: StageStats(name) for name in names}
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+
+    def fail(exc):
+        errors.append(exc)
+        stop.set()
+
+    def run_source():
+        name, iterable = source
+        try:
+            iterator = iter(iterable)
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats[name].record(size(item), time.perf_counter() - t0)
+                if not _put(queues[0], item, stop):
+                    return
+        except Exception as e:
+            fail(e)
+        finally:
+            _put(queues[0], _END, stop)
+
+    def run_stage(index, name, fn):
+        q_in, q_out = queues[index], queues[index + 1]
+        try:
+            while True:
+                item = _get(q_in, stop)
+                if item is _END:
+                    break
+                t0 = time.perf_counter()
+                out = fn(item)
+                stats[name].record(size(item), time.perf_counter() - t0)
+                if not _put(q_out, out, stop):
+                    return
+        except Exception as e:
+            fail(e)
+        finally:
+            _put(q_out, _END, stop)
+
+    def run_sink():
+        name, fn = sink
+        try:
+            while True:
+                item = _get(queues[-1], stop)
+                if item is _END:
+                    break
+                t0 = time.perf_counter()
+                fn(item)
+                stats[name].record(size(item), time.perf_counter() - t0)
+        except Exception as e:
+            fail(e)
+        finally:
+            # Wake up the sink's upstream neighbours if it died early
+            if errors:
+                stop.set()
+
+    threads = [threading.Thread(target=run_source, name=f"pipeline-{source[0]}", daemon=True)]
+    for i, (name, fn) in enumerate(stages):
+        threads.append(threading.Thread(target=run_stage, args=(i, name, fn),
+                                        name=f"pipeline-{name}", daemon=True))
+    sink_thread = threading.Thread(target=run_sink, name=f"pipeline-{sink[0]}", daemon=True)
+    threads.append(sink_thread)
+
+    for t in threads:
+        t.start()
+
+    cancelled = False
+    while sink_thread.is_alive():
+        sink_thread.join(timeout=progress_interval)
+        if should_cancel and should_cancel():
+            cancelled = True
+            stop.set()
+        if on_progress:
+            on_progress({name: s.snapshot() for name, s in stats.items()})
+
+    stop.set()
+    for t in threads:
+        t.join(timeout=5)
+
+    if errors:
+        raise errors[0]
+    if cancelled:
+        raise PipelineCancelled()
+    return {name: s.snapshot() for name, s in stats.items()}
@@ -0,0 +1,116 @@
+# video_previews.py
+"""Poster image and seek-preview sprite sheet, sampled while a job encodes.
+
+PreviewSampler sits in the encode stage of process_frame_range and sees
+every annotated frame while it is still in memory.  One frame near
+POSTER_POSITION of the video is saved as the poster JPEG, and one frame
+every SPRITE_INTERVAL_S seconds (fewer for very long videos, at most
+SPRITE_MAX_TILES) is saved as a small tile.  Tiles are separate files named
+by their frame index, so segment workers and resumed jobs can all add to
+the same directory.  Once the job is done build_sprite_sheet() packs the
+tiles into one JPEG grid and writes a WebVTT file that maps each time range
+to its tile (`sprite.jpg#xywh=x,y,w,h`), which players use for seek
+previews.
+"""
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+POSTER_POSITION = float(os.getenv("POSTER_POSITION", "0.1"))  # fraction of the video the poster is taken at
+POSTER_WIDTH = int(os.getenv("POSTER_WIDTH", "1280"))
+SPRITE_INTERVAL_S = float(os.getenv("SPRITE_INTERVAL_S", "10"))
+SPRITE_MAX_TILES = int(os.getenv("SPRITE_MAX_TILES", "400"))
+SPRITE_TILE_WIDTH = int(os.getenv("SPRITE_TILE_WIDTH", "160"))
+SPRITE_COLUMNS = int(os.getenv("SPRITE_COLUMNS", "10"))
+JPEG_QUALITY = 80
+
+
+def _resize_to_width(frame, width):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+def _write_jpeg(path, image):
+    tmp_path = path + ".tmp.jpg"
+    cv2.imwrite(tmp_path, image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    os.replace(tmp_path, path)
+
+
+def sprite_interval_frames(fps, total_frames):
+    """Frames between two sprite tiles for a video of `total_frames` at `fps`."""
+    fps = fps or 25
+    duration = total_frames / fps if total_frames else 0
+    interval_s = max(SPRITE_INTERVAL_S, duration / SPRITE_MAX_TILES) if SPRITE_MAX_TILES > 0 else SPRITE_INTERVAL_S
+    return max(1, round(interval_s * fps))
+
+
+class PreviewSampler:
+    """Takes the poster frame and sprite tiles out of the stream of annotated frames."""
+
+    def __init__(self, poster_path, tiles_dir, fps, total_frames):
+        self.poster_path = poster_path
+        self.tiles_dir = tiles_dir
+        self.fps = fps or 25
+        self.interval_frames = sprite_interval_frames(fps, total_frames)
+        self.poster_frame = int(total_frames * POSTER_POSITION)
+        self._poster_done = False
+        os.makedirs(tiles_dir, exist_ok=True)
+
+    def offer(self, frame_idx, frame):
+        """Look at one annotated frame (absolute index); keeps it if it is a poster or tile frame."""
+        # A one-second window, so a dropped frame does not lose the poster
+        if not self._poster_done and self.poster_frame <= frame_idx < self.poster_frame + self.fps:
+            _write_jpeg(self.poster_path, _resize_to_width(frame, POSTER_WIDTH))
+            self._poster_done = True
+        if frame_idx % self.interval_frames == 0:
+            tile = _resize_to_width(frame, SPRITE_TILE_WIDTH)
+            _write_jpeg(os.path.join(self.tiles_dir, f"tile_{frame_idx:08d}.jpg"), tile)
+
+
+def _vtt_time(seconds):
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def build_sprite_sheet(tiles_dir, sprite_path, vtt_path, fps, interval_frames, duration_s=None):
+    """Pack the tiles of `tiles_dir` into `sprite_path` and write the WebVTT index to `vtt_path`.
+       The tiles directory is removed. Returns False when there were no tiles."""
+    fps = fps or 25
+    names = sorted(n for n in os.listdir(tiles_dir) if n.startswith("tile_") and n.endswith(".jpg")) \
+        if os.path.isdir(tiles_dir) else []
+    tiles = []
+    for name in names:
+        image = cv2.imread(os.path.join(tiles_dir, name))
+        if image is not None:
+            tiles.append((int(name[5:-4]), image))
+    shutil.rmtree(tiles_dir, ignore_errors=True)
+    if not tiles:
+        return False
+
+    tile_h, tile_w = tiles[0][1].shape[:2]
+    columns = min(SPRITE_COLUMNS, len(tiles))
+    rows = -(-len(tiles) // columns)
+    sheet = np.zeros((rows * tile_h, columns * tile_w, 3), dtype=np.uint8)
+    sprite_name = os.path.basename(sprite_path)
+    cues = ["WEBVTT", ""]
+    for k, (frame_idx, image) in enumerate(tiles):
+        if image.shape[:2] != (tile_h, tile_w):
+            image = cv2.resize(image, (tile_w, tile_h), interpolation=cv2.INTER_AREA)
+        x, y = (k % columns) * tile_w, (k // columns) * tile_h
+        sheet[y:y + tile_h, x:x + tile_w] = image
+        start = frame_idx / fps
+        end = (frame_idx + interval_frames) / fps
+        if duration_s:
+            end = min(end, duration_s)
+        cues += [f"{_vtt_time(start)} --> {_vtt_time(max(end, start + 0.001))}",
+                 f"{sprite_name}#xywh={x},{y},{tile_w},{tile_h}", ""]
+    _write_jpeg(sprite_path, sheet)
+    tmp_path = vtt_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(cues))
+    os.replace(tmp_path, vtt_path)
+    return True
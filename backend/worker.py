@@ -0,0 +1,137 @@
+# worker.py
+"""Video processing worker pool.
+
+Each worker is a separate process that imports the inference module once
+(so loaded models stay warm between jobs), claims jobs from job_queue and
+runs process_video_job ("video" jobs) or exports uploaded models to the
+CPU graph backends ("export" jobs).  The in-process job_status dict is mirrored to
+the queue database so the API process can serve /video/status.
+
+Run standalone with `python worker.py`, or let main.py start
+VIDEO_WORKERS processes on startup.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+
+import job_queue
+
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", str(max(1, (os.cpu_count() or 2) // 4))))
+JOB_POLL_INTERVAL_S = float(os.getenv("JOB_POLL_INTERVAL_S", "1.0"))
+JOB_STATUS_SYNC_S = float(os.getenv("JOB_STATUS_SYNC_S", "0.5"))
+
+
+def _status_sync_loop(inference, running, stop_event):
+    """Mirror job_status to the queue DB, send heartbeats and forward cancellations."""
+    last_sent = {}
+    while not stop_event.is_set():
+        try:
+            for job_id, status in list(inference.job_status.items()):
+                snapshot = dict(status)
+                if last_sent.get(job_id) != snapshot:
+                    job_queue.save_status(job_id, snapshot)
+                    last_sent[job_id] = snapshot
+            active = list(running)
+            job_queue.heartbeat(active)
+            for job_id in active:
+                if job_queue.is_cancelled(job_id):
+                    inference.job_cancel_flags[job_id] = True
+        except Exception as e:
+            print(f"⚠️ Job status sync failed: {e}")
+        stop_event.wait(JOB_STATUS_SYNC_S)
+
+
+def _run_video_job(inference, job_id, payload):
+    inference.process_video_job(job_id, **payload)
+    status = inference.job_status.get(job_id, {})
+    if job_queue.is_cancelled(job_id) or status.get("status") == "cancelled":
+        return
+    if status.get("status") == "done":
+        job_queue.complete(job_id)
+    else:
+        error = status.get("error") or status.get("detail") or "job ended without output"
+        inference.job_status.pop(job_id, None)
+        job_queue.fail(job_id, error)
+
+
+def _run_export_job(job_id, payload):
+    """Export an uploaded .pt model to the CPU graph backends (see model_registry.export_model)."""
+    from model_registry import export_model
+
+    exported = export_model(payload["model_path"], payload.get("formats"))
+    job_queue.save_status(job_id, {"status": "done", "exported": exported})
+    job_queue.complete(job_id)
+
+
+def worker_main(worker_id, shutdown=None):
+    """Claim and run video jobs until `shutdown` is set."""
+    import inference  # heavy import (torch, ultralytics) happens once per worker
+
+    job_queue.init_db()
+    print(f"[WORKER {worker_id}] ready (pid={os.getpid()})")
+
+    running = set()
+    sync_stop = threading.Event()
+    threading.Thread(target=_status_sync_loop, args=(inference, running, sync_stop), daemon=True).start()
+
+    try:
+        while not (shutdown and shutdown.is_set()):
+            job_queue.requeue_stale()
+            claimed = job_queue.claim(worker_id, kinds=("video", "export"))
+            if not claimed:
+                time.sleep(JOB_POLL_INTERVAL_S)
+                continue
+
+            job_id, kind, payload, attempt = claimed
+            print(f"[WORKER {worker_id}] {kind} job {job_id} attempt {attempt}")
+            running.add(job_id)
+            try:
+                if kind == "export":
+                    _run_export_job(job_id, payload)
+                else:
+                    _run_video_job(inference, job_id, payload)
+            except Exception as e:
+                traceback.print_exc()
+                inference.job_status.pop(job_id, None)
+                job_queue.fail(job_id, e)
+            finally:
+                running.discard(job_id)
+    finally:
+        sync_stop.set()
+
+
+def start_worker_pool(count=None):
+    """Spawn `count` worker processes. Returns (processes, shutdown_event)."""
+    count = VIDEO_WORKERS if count is None else count
+    job_queue.init_db()
+    ctx = multiprocessing.get_context("spawn")
+    shutdown = ctx.Event()
+    processes = []
+    for i in range(count):
+        worker_id = f"{os.getpid()}-{i}-{uuid.uuid4().hex[:6]}"
+        # Not daemonic: workers may start their own child processes
+        p = ctx.Process(target=worker_main, args=(worker_id, shutdown), name=f"video-worker-{i}")
+        p.start()
+        processes.append(p)
+    return processes, shutdown
+
+
+def stop_worker_pool(pool, timeout=10):
+    processes, shutdown = pool
+    shutdown.set()
+    for p in processes:
+        p.join(timeout=timeout)
+        if p.is_alive():
+            p.terminate()
+
+
+if __name__ == "__main__":
+    pool = start_worker_pool()
+    try:
+        for p in pool[0]:
+            p.join()
+    except KeyboardInterrupt:
+        stop_worker_pool(pool)
@@ -169,16 +169,20 @@ export default function HistoryPage() {
                                 </div>
 
                                 <div className={styles.videoSection}>
-                                    <h4>Processed Video</h4>
-                                    <video
-                                        ref={el => videoRefs.current[video.filename] = el}
-                                        controls
-                                        preload="metadata"
-                                        className={styles.videoPlayer}
-                                    >
-                                        <source src={`${API}${video.processed_url}`} type="video/mp4" />
-                                        Your browser does not support the video tag.
-                                    </video>
+                                    <h4>{video.processed_url ? 'Processed Video' : 'Metrics Report'}</h4>
+                                    {video.processed_url && (
+                                        <video
+                                            ref={el => videoRefs.current[video.filename] = el}
+                                            controls
+                                            // With a poster nothing is fetched from the video until it is played
+                                            preload={video.poster_url ? 'none' : 'metadata'}
+                                            poster={video.poster_url ? `${API}${video.poster_url}` : undefined}
+                                            className={styles.videoPlayer}
+                                        >
+                                            <source src={`${API}${video.processed_url}`} type="video/mp4" />
+                                            Your browser does not support the video tag.
+                                        </video>
+                                    )}
                                     <div className={styles.videoInfo}>
                                         <span className={styles.videoLabel}>Video Status</span>
                                         <span className={styles.videoStatus}>Processing Complete</span>
@@ -190,9 +194,9 @@ export default function HistoryPage() {
                                         </div>
                                     )}
                                     {/* Download buttons */}
-                                    {video.reports && video.reports.csv && (
+                                    {video.reports && (video.reports.objects_csv || video.reports.csv) && (
                                         <a
-                                            href={API + video.reports.csv}
+                                            href={API + (video.reports.objects_csv || video.reports.csv)}
                                             className={styles.csvDownloadButton}
                                             download
                                         >
@@ -189,14 +189,16 @@ const DashboardPage = () => {
                       <span className={styles.videoName}>{video.filename}</span>
                       <small className={styles.videoStatus}>Processed</small>
                     </div>
-                    <a 
-                      href={`${API_URL}${video.processed_url}`} 
-                      target="_blank" 
-                      rel="noopener noreferrer"
-                      className={styles.videoLink}
-                    >
-                      View
-                    </a>
+                    {video.processed_url && (
+                      <a 
+                        href={`${API_URL}${video.processed_url}`} 
+                        target="_blank" 
+                        rel="noopener noreferrer"
+                        className={styles.videoLink}
+                      >
+                        View
+                      </a>
+                    )}
                   </div>
                 ))}
                 {recentVideos.length > 3 && (
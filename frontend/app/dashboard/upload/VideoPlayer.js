@@ -1,19 +1,213 @@
 'use client';
 
-import React, { forwardRef } from 'react';
+import React, { forwardRef, useEffect, useRef } from 'react';
 import styles from './upload.module.css';
 
-const VideoPlayer = forwardRef(({ src, status, className }, ref) => {
+// Classes whose area is printed, as in render_yolo9_frame (backend/frame_render.py)
+const AREA_LABEL_CLASSES = new Set([
+  'Natural-drinage', 'Manmade-drinage', 'silts', 'vegitation inside the river', 'potholes',
+]);
+
+function metricText(det) {
+  if (det.bridge_length_m) return `${det.bridge_length_m}m`;
+  if (det.area_m2 > 0 && AREA_LABEL_CLASSES.has(det.c)) return `${det.area_m2}m²`;
+  if (det.dist_m && det.c === 'Building') return `d:${det.dist_m}m`;
+  return null;
+}
+
+// Area-weighted centre of the largest outline, where the metric of a filled mask goes
+function outlineCentroid(outlines) {
+  let best = null;
+  outlines.forEach((points) => {
+    let area = 0;
+    let cx = 0;
+    let cy = 0;
+    points.forEach(([x0, y0], i) => {
+      const [x1, y1] = points[(i + 1) % points.length];
+      const cross = x0 * y1 - x1 * y0;
+      area += cross;
+      cx += (x0 + x1) * cross;
+      cy += (y0 + y1) * cross;
+    });
+    if (area && (!best || Math.abs(area) > Math.abs(best.area))) {
+      best = { area, x: cx / (3 * area), y: cy / (3 * area) };
+    }
+  });
+  return best;
+}
+
+// White text on a black box with a class-coloured border, centred on (x, y)
+function drawMetricBox(ctx, text, x, y, color) {
+  const w = ctx.measureText(text).width;
+  ctx.fillStyle = '#000000';
+  ctx.fillRect(x - w / 2 - 5, y - 11, w + 10, 22);
+  ctx.strokeStyle = color;
+  ctx.strokeRect(x - w / 2 - 5, y - 11, w + 10, 22);
+  ctx.fillStyle = '#ffffff';
+  ctx.fillText(text, x - w / 2, y + 4);
+}
+
+// Black text on a class-coloured box sitting on top of (x, y)
+function drawIdLabel(ctx, text, x, y, color) {
+  ctx.fillStyle = color;
+  ctx.fillRect(x, y - 16, ctx.measureText(text).width + 6, 16);
+  ctx.fillStyle = '#000000';
+  ctx.fillText(text, x + 3, y - 4);
+}
+
+// Draws one frame of an overlay file (see backend/overlay_track.py) onto the canvas
+function drawOverlayFrame(ctx, overlay, entry, scale, offsetX, offsetY) {
+  const toX = (x) => offsetX + x * scale;
+  const toY = (y) => offsetY + y * scale;
+  const tracePath = (points) => {
+    ctx.beginPath();
+    points.forEach(([x, y], i) => (i ? ctx.lineTo(toX(x), toY(y)) : ctx.moveTo(toX(x), toY(y))));
+    ctx.closePath();
+  };
+
+  ctx.lineWidth = 2;
+  ctx.font = '12px sans-serif';
+  ctx.strokeStyle = '#ffff00';
+  (entry.buffer || []).forEach((outline) => { tracePath(outline); ctx.stroke(); });
+
+  entry.d.forEach((det) => {
+    const color = overlay.colors[det.c] || '#ffffff';
+    const [x1, y1, x2, y2] = det.bbox;
+    const metric = metricText(det);
+    if (det.poly) {
+      ctx.fillStyle = color;
+      ctx.globalAlpha = 0.4;
+      det.poly.forEach((outline) => { tracePath(outline); ctx.fill(); });
+      ctx.globalAlpha = 1;
+      if (metric) {
+        const centre = outlineCentroid(det.poly) || { x: (x1 + x2) / 2, y: (y1 + y2) / 2 };
+        drawMetricBox(ctx, metric, toX(centre.x), toY(centre.y), color);
+      }
+    } else {
+      ctx.strokeStyle = color;
+      ctx.strokeRect(toX(x1), toY(y1), (x2 - x1) * scale, (y2 - y1) * scale);
+      if (metric) drawMetricBox(ctx, metric, toX((x1 + x2) / 2), toY((y1 + y2) / 2), color);
+    }
+    drawIdLabel(ctx, `ID:${det.id} | ${det.c} | ${det.conf.toFixed(2)}`, toX(x1), toY(y1), color);
+    if (det.bank && det.dist_m < 30) {
+      const [[ax, ay], [bx, by]] = det.bank;
+      ctx.strokeStyle = '#ffff00';
+      ctx.beginPath();
+      ctx.moveTo(toX(ax), toY(ay));
+      ctx.lineTo(toX(bx), toY(by));
+      ctx.stroke();
+      ctx.fillStyle = '#ffff00';
+      ctx.fillText(`${det.dist_m}m`, toX((ax + bx) / 2), toY((ay + by) / 2));
+    }
+  });
+}
+
+const VideoPlayer = forwardRef(({ src, status, className, overlayUrl }, ref) => {
+  const videoRef = useRef(null);
+  const canvasRef = useRef(null);
+
+  const setVideoRef = (node) => {
+    videoRef.current = node;
+    if (typeof ref === 'function') ref(node);
+    else if (ref) ref.current = node;
+  };
+
+  // HLS playlists play natively in Safari; elsewhere hls.js feeds them through MediaSource
+  const isHls = Boolean(src && src.split('?')[0].endsWith('.m3u8'));
+  useEffect(() => {
+    const video = videoRef.current;
+    if (!isHls || !video) return undefined;
+    if (video.canPlayType('application/vnd.apple.mpegurl')) {
+      video.src = src;
+      return undefined;
+    }
+    let hls = null;
+    let cancelled = false;
+    import('hls.js')
+      .then(({ default: Hls }) => {
+        if (cancelled || !Hls.isSupported()) return;
+        hls = new Hls({ liveDurationInfinity: true });
+        hls.loadSource(src);
+        hls.attachMedia(video);
+      })
+      .catch((err) => console.error('Failed to load hls.js:', err));
+
+    return () => {
+      cancelled = true;
+      if (hls) hls.destroy();
+    };
+  }, [src, isHls]);
+
+  // A growing proxy is republished as <name>?v=N; carry on from where the viewer was
+  const resumeAt = useRef(0);
+  useEffect(() => {
+    const video = videoRef.current;
+    if (!video || isHls) return undefined;
+    const remember = () => {
+      if (video.readyState > 0) resumeAt.current = video.currentTime;
+    };
+    const restore = () => {
+      if (resumeAt.current > 0 && resumeAt.current < video.duration) video.currentTime = resumeAt.current;
+    };
+    video.addEventListener('timeupdate', remember);
+    video.addEventListener('loadedmetadata', restore);
+    return () => {
+      video.removeEventListener('timeupdate', remember);
+      video.removeEventListener('loadedmetadata', restore);
+    };
+  }, [src, isHls]);
+
+  useEffect(() => {
+    if (!overlayUrl) return undefined;
+    let overlay = null;
+    let framesByIndex = null;
+    let animation = null;
+    let cancelled = false;
+
+    const draw = () => {
+      const video = videoRef.current;
+      const canvas = canvasRef.current;
+      if (video && canvas && overlay) {
+        canvas.width = video.clientWidth;
+        canvas.height = video.clientHeight;
+        const ctx = canvas.getContext('2d');
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        // Match the letterboxing of the <video> element (object-fit: contain)
+        const scale = Math.min(canvas.width / overlay.width, canvas.height / overlay.height);
+        const offsetX = (canvas.width - overlay.width * scale) / 2;
+        const offsetY = (canvas.height - overlay.height * scale) / 2;
+        const entry = framesByIndex.get(Math.floor(video.currentTime * overlay.fps));
+        if (entry) drawOverlayFrame(ctx, overlay, entry, scale, offsetX, offsetY);
+      }
+      animation = requestAnimationFrame(draw);
+    };
+
+    fetch(overlayUrl)
+      .then((res) => res.json())
+      .then((data) => {
+        if (cancelled) return;
+        overlay = data;
+        framesByIndex = new Map(data.frames.map((entry) => [entry.f, entry]));
+        animation = requestAnimationFrame(draw);
+      })
+      .catch((err) => console.error('Failed to load overlay:', err));
+
+    return () => {
+      cancelled = true;
+      if (animation) cancelAnimationFrame(animation);
+    };
+  }, [overlayUrl]);
+
   return (
-    <div className={styles.videoContainer}>
+    <div className={styles.videoContainer} style={{ position: 'relative' }}>
       {status === 'processing' && (
         <div className={styles.processingOverlay}>
           <span>Processing...</span>
         </div>
       )}
       <video
-        ref={ref}
-        src={src}
+        ref={setVideoRef}
+        src={isHls ? undefined : src}
         controls
         muted
         className={className}
@@ -21,9 +215,15 @@ const VideoPlayer = forwardRef(({ src, status, className }, ref) => {
       >
         Your browser does not support the video tag.
       </video>
+      {overlayUrl && (
+        <canvas
+          ref={canvasRef}
+          style={{ position: 'absolute', top: 0, left: 0, pointerEvents: 'none' }}
+        />
+      )}
     </div>
   );
 });
 
 VideoPlayer.displayName = 'VideoPlayer';
-export default VideoPlayer;
\ No newline at end of file
+export default VideoPlayer;
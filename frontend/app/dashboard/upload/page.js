@@ -99,6 +99,9 @@ export default function UploadPage() {
   const [srtData, setSrtData] = useState(null);
   const [previewUrl, setPreviewUrl] = useState('');
   const [processedUrl, setProcessedUrl] = useState('');
+  const [overlayUrl, setOverlayUrl] = useState(null);
+  const [proxyUrl, setProxyUrl] = useState(null);
+  const [liveUrl, setLiveUrl] = useState(null);
   const [reports, setReports] = useState(null);
   const [reportProgress, setReportProgress] = useState({
     stepsCompleted: 0,
@@ -130,8 +133,9 @@ export default function UploadPage() {
   
   const savedResult = localStorage.getItem('video_result');
   if (savedResult) {
-   const { processedUrl, srtData, reports } = JSON.parse(savedResult);
+   const { processedUrl, overlayUrl, srtData, reports } = JSON.parse(savedResult);
    setProcessedUrl(processedUrl);
+   setOverlayUrl(overlayUrl || null);
    setSrtData(srtData);
    setReports(reports || null);
    setVideoStatus('done');
@@ -188,6 +192,16 @@ export default function UploadPage() {
     });
     const data = await res.json();
     
+    // Low-resolution proxy can be watched before the full-resolution video is ready
+    if (data.status === 'processing' && data.proxy_video_url) {
+      setProxyUrl(`${API}${data.proxy_video_url}`);
+    }
+    // Live HLS stream while processing: native HLS (Safari) or hls.js over MediaSource
+    if (data.status === 'processing' && data.live_playlist_url &&
+        (document.createElement('video').canPlayType('application/vnd.apple.mpegurl') || window.MediaSource)) {
+      setLiveUrl(`${API}${data.live_playlist_url}`);
+    }
+
     // Update progress if available
     if (data.status === 'processing' && data.frames_processed !== undefined) {
       setProcessingProgress({
@@ -198,12 +212,18 @@ export default function UploadPage() {
     }
     
     if (data.status === 'done') {
-     const finalProcessedUrl = `${API}${data.processed_video_url}`;
+     // Metrics-only jobs have no processed video
+     const finalProcessedUrl = data.processed_video_url ? `${API}${data.processed_video_url}` : null;
      setProcessedUrl(finalProcessedUrl);
+     // Overlay jobs: original video plus detections drawn in the browser
+     const finalOverlayUrl = data.overlay_url ? `${API}${data.overlay_url}` : null;
+     setOverlayUrl(finalOverlayUrl);
+     setProxyUrl(null);
+     setLiveUrl(null);
      setVideoStatus('done');
 
-     if (data.reports && data.reports.csv) {
-  setCsvReportUrl(`${API}${data.reports.csv}`);
+     if (data.reports && (data.reports.objects_csv || data.reports.csv)) {
+  setCsvReportUrl(`${API}${data.reports.objects_csv || data.reports.csv}`);
 }
 
      // Show report progress bar
@@ -243,6 +263,7 @@ export default function UploadPage() {
      // Store report URLs if available
      const resultToSave = { 
        processedUrl: finalProcessedUrl, 
+       overlayUrl: finalOverlayUrl,
        srtData: finalSrtData,
        hasMetrics: data.has_metrics || false,
        modelUsed: data.model_used || '',
@@ -640,6 +661,9 @@ export default function UploadPage() {
     totalFrames: 0,
     progressPercent: 0
   });
+  setOverlayUrl(null);
+  setProxyUrl(null);
+  setLiveUrl(null);
   localStorage.removeItem('video_result');
   localStorage.removeItem('video_job_id');
   localStorage.removeItem('video_preview_url');
@@ -839,9 +863,9 @@ const handleSubmit = async (e) => {
               : <img src={previewUrl} alt="Preview" className={styles.videoPlayer} style={{maxWidth: '100%', maxHeight: 400, borderRadius: 12}} />
            )}
            
-           {previewUrl && videoStatus === 'processing' && (
+           {(previewUrl || proxyUrl || liveUrl) && videoStatus === 'processing' && (
             uploadType === 'video'
-              ? <VideoPlayer src={previewUrl} status={videoStatus} className={styles.videoPlayer} />
+              ? <VideoPlayer src={liveUrl || proxyUrl || previewUrl} status={liveUrl || proxyUrl ? 'preview' : videoStatus} className={styles.videoPlayer} />
               : <img src={previewUrl} alt="Preview" className={styles.videoPlayer} style={{maxWidth: '100%', maxHeight: 400, borderRadius: 12}} />
            )}
 
@@ -917,7 +941,7 @@ const handleSubmit = async (e) => {
      <div className={styles.videoContainer}>
       {processedUrl && (
         uploadType === 'video'
-          ? <VideoPlayer src={processedUrl} status="done" ref={processedVideoRef} className={styles.videoPlayer} />
+          ? <VideoPlayer src={processedUrl} status="done" ref={processedVideoRef} overlayUrl={overlayUrl} className={styles.videoPlayer} />
           : <img src={processedUrl} alt="Processed" className={styles.videoPlayer} style={{maxWidth: '100%', maxHeight: 400, borderRadius: 12}} />
       )}
       {/* ✅ unified CSV button check */}
@@ -968,13 +992,13 @@ const handleSubmit = async (e) => {
    </div>
    
    {/* Reports Section */}
-   {reports && reports.csv && (
+   {reports && (reports.objects_csv || reports.csv) && (
     <div className={styles.reportsSection}>
      <h3>Analysis Reports</h3>
      <p>Download detailed analysis reports with metrics and location data</p>
      <div className={styles.reportsGrid}>
       <button 
-       onClick={() => downloadReport(reports.csv, `${selectedFile?.name || (uploadType === 'video' ? 'video' : 'image')}_metrics.csv`)}
+       onClick={() => downloadReport(reports.objects_csv || reports.csv, `${selectedFile?.name || (uploadType === 'video' ? 'video' : 'image')}${reports.objects_csv ? '_objects' : '_metrics'}.csv`)}
        className={styles.reportButton}
       >
        <DownloadIcon />